@@ -0,0 +1,292 @@
+"""
+Request Coalescing and Admission Control
+
+Protects expensive endpoints (the LangGraph decision cycle) from duplicate and
+excess load:
+
+- SingleFlight: identical requests that arrive while one is already running
+  share that execution and its result instead of running again.
+- AdmissionController: token buckets checked for every request, plus a
+  concurrency gate around actual executions whose waiters are served by
+  lane priority. Interactive requests (clicks) may use the whole bucket and
+  jump ahead of queued bulk requests; bulk requests (background refreshes)
+  must leave a reserve of tokens for interactive use and are shed once the
+  bulk queue is full. Buckets are keyed on the connection address; a
+  self-reported client id only splits an address's allowance between the
+  clients behind it (e.g. a NAT), so rotating ids gains nothing.
+
+Usage:
+    flights = SingleFlight()
+    admission = AdmissionController()
+
+    admission.check(request.client.host, "bulk", client_id=x_client_id)
+
+    async def compute():
+        async with admission.slot("bulk"):
+            return await run_expensive_work()
+
+    result = await flights.run(key, compute)
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple, Type
+
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed by admission control"""
+
+    def __init__(self, lane: str, reason: str):
+        super().__init__(f"{lane} request rejected: {reason}")
+        self.lane = lane
+        self.reason = reason
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+
+    async def run(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        retry_on: Tuple[Type[BaseException], ...] = ()
+    ) -> Any:
+        """
+        Await the in-flight execution for key, starting one if there is none.
+
+        The execution runs as its own task, so a caller that disconnects
+        does not cancel it for the callers sharing it.
+
+        Exceptions listed in ``retry_on`` only reach the caller that started
+        the failed execution; callers that joined it start (or join) a fresh
+        one instead. Used for admission rejections, which apply to the
+        request that asked for a slot and not to the ones sharing its result.
+        """
+        self.calls += 1
+        while True:
+            task = self._inflight.get(key)
+            owner = task is None
+            if owner:
+                self.executions += 1
+                task = asyncio.ensure_future(fn())
+                self._inflight[key] = task
+                task.add_done_callback(lambda done, key=key: self._discard(key, done))
+            try:
+                return await asyncio.shield(task)
+            except retry_on:
+                if owner:
+                    raise
+                self._discard(key, task)
+
+    def _discard(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.calls - self.executions,
+            "coalescing_ratio": (
+                (self.calls - self.executions) / self.calls if self.calls else 0.0
+            ),
+            "in_flight": self.in_flight,
+        }
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def can_take(self, cost: float = 1.0, reserve: float = 0.0) -> bool:
+        """Whether taking cost tokens would leave at least ``reserve``"""
+        self._refill()
+        return self.tokens - cost >= reserve
+
+    def try_take(self, cost: float = 1.0, reserve: float = 0.0) -> bool:
+        """Take cost tokens if at least ``reserve`` tokens would remain"""
+        if not self.can_take(cost, reserve):
+            return False
+        self.tokens -= cost
+        return True
+
+
+class AdmissionController:
+    """
+    Per-address rate limiting and a prioritized concurrency gate.
+
+    Every request is charged to the bucket of its connection address. A
+    request that also names a client id is charged to that client's bucket
+    within the address as well, so one client cannot use up what the
+    address's other clients are owed, while the address as a whole never
+    gets more than ``address_clients`` clients' worth of tokens.
+
+    Args:
+        rate: Tokens refilled per client per second
+        burst: Bucket capacity per client
+        bulk_reserve: Fraction of a bucket bulk requests may not dip into
+        max_concurrent: Executions allowed to run at once
+        max_bulk_waiting: Bulk requests allowed to queue for the gate
+        max_clients: Buckets kept before the least recent is evicted
+        address_clients: Clients' worth of rate and burst one address gets
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: float = 20.0,
+        bulk_reserve: float = 0.5,
+        max_concurrent: int = 8,
+        max_bulk_waiting: int = 32,
+        max_clients: int = 10000,
+        address_clients: float = 4.0
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.bulk_reserve = bulk_reserve
+        self.address_clients = address_clients
+        self.max_concurrent = max_concurrent
+        self.max_bulk_waiting = max_bulk_waiting
+        self.max_clients = max_clients
+
+        # Keyed by address, or by (address, client id) for sub-buckets
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self._active = 0
+        self._waiting: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+
+        self.admitted = {lane: 0 for lane in LANES}
+        self.shed: Dict[Tuple[str, str], int] = {}
+
+    def _bucket(self, key: Hashable, share: float = 1.0) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate * share, self.burst * share)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _reject(self, lane: str, reason: str):
+        self.shed[(lane, reason)] = self.shed.get((lane, reason), 0) + 1
+        raise AdmissionRejected(lane, reason)
+
+    def _can_start(self, lane: str) -> bool:
+        if self._active >= self.max_concurrent:
+            return False
+        # Nobody may overtake queued requests of the same or a higher lane
+        for other in LANES[:LANES.index(lane) + 1]:
+            if self._waiting[other]:
+                return False
+        return True
+
+    async def _acquire(self, lane: str):
+        if self._can_start(lane):
+            self._active += 1
+            return
+
+        if lane == BULK and len(self._waiting[BULK]) >= self.max_bulk_waiting:
+            self._reject(lane, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting[lane].append(waiter)
+        try:
+            # The releasing request hands its slot over (_active unchanged)
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just before cancellation
+                self._release()
+            else:
+                try:
+                    self._waiting[lane].remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def _release(self):
+        for lane in LANES:
+            queue = self._waiting[lane]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self._active -= 1
+
+    def check(self, address: str, lane: str = INTERACTIVE, client_id: Optional[str] = None):
+        """
+        Charge one request or raise AdmissionRejected.
+
+        ``address`` must identify the caller reliably (the connection
+        address, or an authenticated identity); ``client_id`` is what the
+        caller says about itself and only selects a sub-bucket. Interactive
+        requests may drain a bucket; bulk requests must leave the reserve
+        untouched. Nothing is charged unless every bucket has the tokens.
+        """
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane {lane!r}; expected one of {LANES}")
+
+        buckets = [self._bucket(address, share=self.address_clients)]
+        if client_id is not None:
+            buckets.append(self._bucket((address, client_id)))
+        reserve = self.bulk_reserve if lane == BULK else 0.0
+        if not all(bucket.can_take(reserve=reserve * bucket.capacity) for bucket in buckets):
+            self._reject(lane, "rate_limited")
+        for bucket in buckets:
+            bucket.tokens -= 1
+        self.admitted[lane] += 1
+
+    @asynccontextmanager
+    async def slot(self, lane: str = INTERACTIVE):
+        """
+        Hold one of the ``max_concurrent`` execution slots.
+
+        Waiters are served interactive first; raises AdmissionRejected for
+        bulk work when the bulk queue is full.
+        """
+        await self._acquire(lane)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        shed_by_lane = {lane: 0 for lane in LANES}
+        for (lane, _), count in self.shed.items():
+            shed_by_lane[lane] += count
+        return {
+            "admitted": dict(self.admitted),
+            "shed": shed_by_lane,
+            "shed_by_reason": {f"{lane}:{reason}": count for (lane, reason), count in self.shed.items()},
+            "active": self._active,
+            "waiting": {lane: len(queue) for lane, queue in self._waiting.items()},
+            "clients": len(self._buckets),
+        }
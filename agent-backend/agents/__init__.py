@@ -2,24 +2,47 @@
 Agent Backend Package
 
 Contains LangGraph agent engine and related modules.
+
+Exports are resolved lazily so that importing a lightweight submodule
+(e.g. ``agents.store``) does not pull in LangGraph.
 """
 
-from .engine import (
-    AgentState,
-    AgentStatus,
-    create_agent_graph,
-    run_agent_cycle,
-    perceive_node,
-    reason_node,
-    act_node,
-)
+import importlib
+
+_EXPORTS = {
+    "AgentState": ".engine",
+    "AgentStatus": ".engine",
+    "create_agent_graph": ".engine",
+    "run_agent_cycle": ".engine",
+    "get_compiled_graph": ".engine",
+    "get_checkpointer": ".engine",
+    "agent_thread_id": ".engine",
+    "reset_agent_state": ".engine",
+    "perceive_node": ".engine",
+    "reason_node": ".engine",
+    "act_node": ".engine",
+    "SpatialGrid": ".spatial",
+    "AgentStore": ".store",
+    "RecomputeStats": ".store",
+    "NEIGHBOR_RADIUS": ".store",
+    "SharedWorld": ".world",
+    "RecordTable": ".world",
+    "StampedValue": ".world",
+    "ShardedSimulation": ".sharding",
+    "WorldRecorder": ".recording",
+    "WorldReplay": ".recording",
+    "FieldCounts": ".aggregates",
+    "MessageBus": ".messaging",
+    "Message": ".messaging",
+    "get_message_bus": ".messaging",
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    "AgentState",
-    "AgentStatus", 
-    "create_agent_graph",
-    "run_agent_cycle",
-    "perceive_node",
-    "reason_node",
-    "act_node",
-]
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,108 @@
+"""
+Incremental Aggregates
+
+Value counts over a keyed collection of records (agents by state, tasks by
+status, ...) kept up to date on every mutation, so reading a histogram never
+scans the records.
+
+Usage:
+    counts = FieldCounts(("status", "priority"))
+    counts.set("t1", {"status": "created", "priority": 1})
+    counts.set("t1", {"status": "done", "priority": 1})
+    counts.to_dict()  # {"total": 1, "status": {"done": 1}, "priority": {"1": 1}}
+"""
+
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class FieldCounts:
+    """
+    Per-field histograms over records identified by key.
+
+    Only the counted field values are remembered per key, so replacing or
+    removing a record adjusts the histograms without seeing the old record.
+    Values are counted by their string form to stay JSON-friendly.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = tuple(fields)
+        self._values: Dict[Hashable, Tuple[str, ...]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {name: {} for name in self.fields}
+        # Total of histograms taken from ``load``, which come without the keys
+        self._loaded_total: Optional[int] = None
+
+    @classmethod
+    def from_records(cls, fields: Iterable[str], records: Iterable[Tuple[Hashable, Dict[str, Any]]]) -> "FieldCounts":
+        """Build counts from (key, record) pairs"""
+        counts = cls(fields)
+        for key, record in records:
+            counts.set(key, record)
+        return counts
+
+    def __len__(self) -> int:
+        if self._loaded_total is not None:
+            return self._loaded_total
+        return len(self._values)
+
+    def _bump(self, values: Tuple[str, ...], delta: int):
+        for name, value in zip(self.fields, values):
+            histogram = self._counts[name]
+            count = histogram.get(value, 0) + delta
+            if count:
+                histogram[value] = count
+            else:
+                del histogram[value]
+
+    def set(self, key: Hashable, record: Dict[str, Any]):
+        """Count a new record or replace the counted values of an existing one"""
+        values = tuple(str(record.get(name)) for name in self.fields)
+        old = self._values.get(key)
+        if old == values:
+            return
+        if old is not None:
+            self._bump(old, -1)
+        self._values[key] = values
+        self._bump(values, 1)
+
+    def remove(self, key: Hashable):
+        """Stop counting a record; unknown keys are ignored"""
+        old = self._values.pop(key, None)
+        if old is not None:
+            self._bump(old, -1)
+
+    def sync(self, records: Dict[Hashable, Dict[str, Any]]):
+        """
+        Make the counts match a full set of records.
+
+        Only keys that appeared, disappeared or changed values touch the
+        histograms; meant for sources that are polled as a whole. After
+        ``load`` there are no per-key values to compare with, so the counts
+        are rebuilt once.
+        """
+        if self._loaded_total is not None:
+            self._loaded_total = None
+            self._counts = {name: {} for name in self.fields}
+        for key in [key for key in self._values if key not in records]:
+            self.remove(key)
+        for key, record in records.items():
+            self.set(key, record)
+
+    def load(self, summary: Dict[str, Any]):
+        """
+        Take the histograms from another process's ``to_dict``.
+
+        Lets a process that only serves the counts skip recounting records
+        it did not change. Only ``sync`` may follow to count records again.
+        """
+        self._values = {}
+        self._counts = {name: dict(summary.get(name, {})) for name in self.fields}
+        self._loaded_total = summary.get("total", 0)
+
+    def count(self, name: str, value: Any) -> int:
+        return self._counts[name].get(str(value), 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": len(self),
+            **{name: dict(histogram) for name, histogram in self._counts.items()},
+        }
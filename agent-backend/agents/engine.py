@@ -2,11 +2,19 @@
 LangGraph Agent Engine for Multi-Agent System
 
 This module implements the agent state machine with perceive, reason, and act nodes.
+
+Agent cycles can be checkpointed per agent: when a ``thread_id`` is passed to
+``run_agent_cycle`` the graph resumes from the agent's previous state and skips
+the perceive/reason stages whose inputs have not changed since the last cycle.
 """
 
-from typing import TypedDict, List, Optional
+import threading
+from typing import TypedDict, Dict, List, Optional, Any
 from enum import Enum
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.memory import MemorySaver
+
+from .messaging import get_message_bus
 
 
 class AgentState(TypedDict):
@@ -17,6 +25,8 @@ class AgentState(TypedDict):
     reasoning: str
     action: str
     nearby_agents: List[int]
+    perceived_inputs: Optional[str]
+    reasoned_inputs: Optional[str]
 
 
 class AgentStatus(str, Enum):
@@ -26,6 +36,20 @@ class AgentStatus(str, Enum):
     THINKING = "thinking"
 
 
+def _perception_inputs(state: AgentState) -> str:
+    """Fingerprint of everything perceive_node reads from the state"""
+    return repr((
+        list(state["position"]),
+        sorted(state["nearby_agents"]),
+        state.get("action", "idle"),
+    ))
+
+
+def _reasoning_inputs(state: AgentState) -> str:
+    """Fingerprint of everything reason_node reads from the state"""
+    return repr(len(state["nearby_agents"]))
+
+
 def perceive_node(state: AgentState) -> AgentState:
     """
     Perceive the environment and update observations.
@@ -37,7 +61,7 @@ def perceive_node(state: AgentState) -> AgentState:
         observations = [
             f"Detected {len(state['nearby_agents'])} nearby agents",
             f"Current position: {state['position']}",
-            f"Current state: {state['action']}"
+            f"Current state: {state.get('action', 'idle')}"
         ]
     else:
         observations = [
@@ -48,7 +72,8 @@ def perceive_node(state: AgentState) -> AgentState:
     
     return {
         **state,
-        "observations": observations
+        "observations": observations,
+        "perceived_inputs": _perception_inputs(state)
     }
 
 
@@ -75,7 +100,8 @@ def reason_node(state: AgentState) -> AgentState:
     return {
         **state,
         "reasoning": reasoning,
-        "action": action
+        "action": action,
+        "reasoned_inputs": _reasoning_inputs(state)
     }
 
 
@@ -88,12 +114,15 @@ def act_node(state: AgentState) -> AgentState:
     # In a real system, this would update the agent's position or state
     # in the shared environment
     
-    action = state["action"]
+    action = state.get("action", "idle")
     
     # Simulate action execution
     if action == "communicating":
-        # Agent would send message to nearby agents
-        pass
+        # Broadcast to nearby agents; delivered with the bus's next tick
+        get_message_bus().broadcast(
+            state["agent_id"],
+            f"Agent {state['agent_id']} coordinating with {len(state['nearby_agents'])} nearby agents"
+        )
     elif action == "working":
         # Agent would perform work on a task
         pass
@@ -101,11 +130,31 @@ def act_node(state: AgentState) -> AgentState:
     return state
 
 
+def route_entry(state: AgentState) -> str:
+    """
+    Pick the first stage to run for this cycle.
+    
+    Stages whose inputs match the fingerprint stored by the previous
+    (checkpointed) cycle are skipped; their outputs are still in the state.
+    """
+    if state.get("perceived_inputs") != _perception_inputs(state):
+        return "perceive"
+    return route_after_perceive(state)
+
+
+def route_after_perceive(state: AgentState) -> str:
+    """Skip reasoning when the inputs it depends on are unchanged"""
+    if state.get("reasoned_inputs") != _reasoning_inputs(state):
+        return "reason"
+    return "act"
+
+
 def create_agent_graph() -> StateGraph:
     """
     Create the agent state machine graph.
     
-    Returns a StateGraph with perceive -> reason -> act flow.
+    Returns a StateGraph with perceive -> reason -> act flow. Perceive and
+    reason are entered conditionally so unchanged stages can be skipped.
     """
     # Create the state graph
     graph = StateGraph(AgentState)
@@ -116,34 +165,139 @@ def create_agent_graph() -> StateGraph:
     graph.add_node("act", act_node)
     
     # Set up the flow
-    graph.set_entry_point("perceive")
-    graph.add_edge("perceive", "reason")
+    graph.set_conditional_entry_point(
+        route_entry,
+        {"perceive": "perceive", "reason": "reason", "act": "act"}
+    )
+    graph.add_conditional_edges(
+        "perceive",
+        route_after_perceive,
+        {"reason": "reason", "act": "act"}
+    )
     graph.add_edge("reason", "act")
     graph.add_edge("act", END)
     
     return graph
 
 
-def run_agent_cycle(initial_state: AgentState) -> AgentState:
+# Checkpointer holding the last state of every agent thread
+_checkpointer: Optional[MemorySaver] = None
+
+# Cycles on the same thread must not interleave: both would resume from and
+# write to its checkpoints, and pruning to the latest checkpoint would race
+# with the other cycle's writes. An entry lives as long as the thread's
+# checkpoint and is dropped with it by ``reset_agent_state``.
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+# Compiled graphs, built once and reused across cycles
+_compiled_graph: Optional[Any] = None
+_compiled_checkpointed_graph: Optional[Any] = None
+
+
+def get_checkpointer() -> MemorySaver:
+    """Get or create the shared agent state checkpointer"""
+    global _checkpointer
+    if _checkpointer is None:
+        _checkpointer = MemorySaver()
+    return _checkpointer
+
+
+def get_compiled_graph(checkpointed: bool = False):
+    """
+    Get the compiled agent graph, compiling it on first use.
+    
+    Args:
+        checkpointed: Compile with the shared checkpointer so cycles
+            resume from the agent's previous state
+    """
+    global _compiled_graph, _compiled_checkpointed_graph
+    if checkpointed:
+        if _compiled_checkpointed_graph is None:
+            _compiled_checkpointed_graph = create_agent_graph().compile(
+                checkpointer=get_checkpointer()
+            )
+        return _compiled_checkpointed_graph
+    
+    if _compiled_graph is None:
+        _compiled_graph = create_agent_graph().compile()
+    return _compiled_graph
+
+
+def _thread_lock(thread_id: str) -> threading.Lock:
+    with _thread_locks_guard:
+        lock = _thread_locks.get(thread_id)
+        if lock is None:
+            lock = _thread_locks[thread_id] = threading.Lock()
+        return lock
+
+
+def agent_thread_id(agent_id: int) -> str:
+    """Checkpoint thread id used for an agent's persistent state"""
+    return f"agent-{agent_id}"
+
+
+def reset_agent_state(thread_id: str):
+    """Drop the checkpointed history of an agent thread"""
+    with _thread_lock(thread_id):
+        get_checkpointer().delete_thread(thread_id)
+    with _thread_locks_guard:
+        _thread_locks.pop(thread_id, None)
+
+
+def _keep_latest_checkpoint(thread_id: str):
+    """
+    Drop every checkpoint of a thread but the latest.
+    
+    MemorySaver keeps one checkpoint per graph step forever; cycles only
+    resume from the latest, so the rest is dropped after each cycle. Only
+    the public saver API is used (``get_tuple``, ``delete_thread``, ``put``
+    with the checkpoint's own channel versions); the re-put relies on
+    ``get_tuple`` returning channel values inline, as langgraph-checkpoint 4
+    does, which requirements.txt pins.
+    """
+    saver = get_checkpointer()
+    latest = saver.get_tuple({"configurable": {"thread_id": thread_id}})
+    if latest is None:
+        return
+    saver.delete_thread(thread_id)
+    saver.put(
+        {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": latest.config["configurable"].get("checkpoint_ns", "")
+        }},
+        latest.checkpoint,
+        latest.metadata,
+        latest.checkpoint["channel_versions"]
+    )
+
+
+def run_agent_cycle(
+    initial_state: AgentState,
+    thread_id: Optional[str] = None
+) -> AgentState:
     """
     Run a single agent decision cycle.
     
     Args:
-        initial_state: The starting state for the agent
+        initial_state: The starting state for the agent. With a thread_id
+            this may be partial; missing keys are taken from the previous cycle.
+        thread_id: Checkpoint thread to resume from and save to. Without
+            one the cycle starts from scratch and nothing is persisted.
+            Cycles on the same thread run one at a time.
         
     Returns:
         The updated state after one cycle
     """
-    # Create the graph
-    graph = create_agent_graph()
-    
-    # Compile the graph (creates a runnable)
-    app = graph.compile()
+    if thread_id is None:
+        return get_compiled_graph().invoke(initial_state)
     
-    # Run one cycle
-    result = app.invoke(initial_state)
-    
-    return result
+    app = get_compiled_graph(checkpointed=True)
+    config = {"configurable": {"thread_id": thread_id}}
+    with _thread_lock(thread_id):
+        result = app.invoke(initial_state, config)
+        _keep_latest_checkpoint(thread_id)
+        return result
 
 
 if __name__ == "__main__":
@@ -162,3 +316,8 @@ if __name__ == "__main__":
     print(f"  Action: {result['action']}")
     print(f"  Reasoning: {result['reasoning']}")
     print(f"  Observations: {result['observations']}")
+    
+    # Resume the same agent: unchanged inputs skip perceive and reason
+    run_agent_cycle(test_state, thread_id=agent_thread_id(1))
+    result = run_agent_cycle({"agent_id": 1, "position": [0.0, 0.0], "nearby_agents": [2, 3]}, thread_id=agent_thread_id(1))
+    print(f"  Resumed action: {result['action']}")
@@ -0,0 +1,314 @@
+"""
+Inter-Agent Message Bus
+
+In-process messaging for communicating agents:
+
+- Every agent has a fixed-size ring-buffer mailbox. When it is full the
+  oldest message is overwritten and counted as dropped, so memory stays
+  bounded however much agents talk.
+- Sends and broadcasts go to an outbox and are delivered in one batch per
+  tick by ``deliver``, so agents acting in the same tick see each other's
+  messages on the next one.
+- Broadcasts are routed to the sender's neighbors as reported by the
+  ``neighbors`` callable (the agent store's spatial-grid neighborhoods).
+  Messages that reach nobody (unknown recipients, broadcasts from unknown
+  senders or without neighbors) are counted as undeliverable.
+- With ``track_changes`` the bus remembers which mailboxes changed, so
+  several worker processes can share them: one publishes
+  ``mailbox_record``s, the others load them with ``apply_mailboxes``.
+
+Usage:
+    bus = MessageBus(neighbors=lambda agent_id: agents_db[agent_id]["nearby_agents"])
+    bus.broadcast(1, "Anyone free to help?")
+    bus.deliver()
+    messages = bus.receive(2)
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+
+@dataclass
+class Message:
+    """A message as stored in a mailbox"""
+    sender: int
+    recipient: int
+    body: str
+    tick: int
+    broadcast: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Message":
+        return cls(**data)
+
+
+class Mailbox:
+    """Fixed-capacity ring buffer that drops the oldest message on overflow"""
+
+    __slots__ = ("_slots", "_head", "_count", "dropped")
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._slots: List[Optional[Message]] = [None] * capacity
+        self._head = 0
+        self._count = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def capacity(self) -> int:
+        return len(self._slots)
+
+    def push(self, message: Message) -> bool:
+        """Store a message; returns False if the oldest one was dropped for it"""
+        capacity = len(self._slots)
+        tail = (self._head + self._count) % capacity
+        self._slots[tail] = message
+        if self._count < capacity:
+            self._count += 1
+            return True
+        self._head = (self._head + 1) % capacity
+        self.dropped += 1
+        return False
+
+    def peek(self) -> List[Message]:
+        """Messages oldest first, without removing them"""
+        capacity = len(self._slots)
+        return [self._slots[(self._head + i) % capacity] for i in range(self._count)]
+
+    def drain(self, limit: Optional[int] = None) -> List[Message]:
+        """Remove and return up to ``limit`` messages, oldest first"""
+        count = self._count if limit is None else min(limit, self._count)
+        capacity = len(self._slots)
+        messages = []
+        for _ in range(count):
+            messages.append(self._slots[self._head])
+            self._slots[self._head] = None
+            self._head = (self._head + 1) % capacity
+        self._count -= count
+        return messages
+
+
+class MessageBus:
+    """
+    Mailboxes plus a per-tick outbox.
+
+    Args:
+        mailbox_capacity: Messages kept per agent before the oldest is dropped
+        max_pending: Outbox size; older undelivered messages are dropped
+        neighbors: Returns the ids a broadcast from an agent reaches
+        exists: Returns whether an agent id may receive mail (defaults to
+            any id reachable as a neighbor or addressed directly)
+        track_changes: Remember changed and removed mailboxes for
+            ``take_changes``
+    """
+
+    def __init__(
+        self,
+        mailbox_capacity: int = 32,
+        max_pending: int = 100_000,
+        neighbors: Optional[Callable[[int], Iterable[int]]] = None,
+        exists: Optional[Callable[[int], bool]] = None,
+        track_changes: bool = False
+    ):
+        self.mailbox_capacity = mailbox_capacity
+        self.neighbors = neighbors or (lambda agent_id: ())
+        self.exists = exists or (lambda agent_id: True)
+        self._mailboxes: Dict[int, Mailbox] = {}
+        self._outbox: Deque[tuple] = deque(maxlen=max_pending)
+        # Agents may act on executor threads while the loop delivers
+        self._outbox_lock = threading.Lock()
+        # Mailboxes changed and removed since the last take_changes()
+        self.track_changes = track_changes
+        self._changed: Set[int] = set()
+        self._removed: Set[int] = set()
+
+        self.tick = 0
+        self.sent = 0
+        self.delivered = 0
+        self.dropped_overflow = 0
+        self.dropped_pending = 0
+        self.undeliverable = 0
+        self.last_delivery_ms = 0.0
+        self.last_delivered = 0
+
+    def _enqueue(self, item: tuple):
+        with self._outbox_lock:
+            if len(self._outbox) == self._outbox.maxlen:
+                self.dropped_pending += 1
+            self._outbox.append(item)
+            self.sent += 1
+
+    def send(self, sender: int, recipient: int, body: str):
+        """Queue a direct message for the next delivery"""
+        self._enqueue((sender, recipient, body))
+
+    def broadcast(self, sender: int, body: str):
+        """Queue a message to every neighbor of the sender at delivery time"""
+        self._enqueue((sender, None, body))
+
+    @property
+    def pending(self) -> int:
+        """Messages queued for the next delivery"""
+        return len(self._outbox)
+
+    def take_outbox(self) -> List[tuple]:
+        """
+        Remove the queued messages without delivering them, as
+        ``(sender, recipient, body)`` with recipient None for broadcasts,
+        e.g. to hand them to the bus of another process.
+        """
+        with self._outbox_lock:
+            pending = list(self._outbox)
+            self._outbox.clear()
+        return pending
+
+    def _mailbox(self, agent_id: int) -> Mailbox:
+        mailbox = self._mailboxes.get(agent_id)
+        if mailbox is None:
+            mailbox = Mailbox(self.mailbox_capacity)
+            self._mailboxes[agent_id] = mailbox
+        return mailbox
+
+    def _push(self, message: Message):
+        if not self._mailbox(message.recipient).push(message):
+            self.dropped_overflow += 1
+        self.delivered += 1
+        self._touch(message.recipient)
+
+    def _touch(self, agent_id: int):
+        if self.track_changes:
+            self._changed.add(agent_id)
+            self._removed.discard(agent_id)
+
+    def deliver(self) -> int:
+        """Deliver everything queued since the last tick; returns messages placed"""
+        start = time.perf_counter()
+        self.tick += 1
+        with self._outbox_lock:
+            pending = self._outbox
+            self._outbox = deque(maxlen=pending.maxlen)
+
+        delivered_before = self.delivered
+        for sender, recipient, body in pending:
+            if recipient is None:
+                reached = 0
+                for neighbor in self.neighbors(sender):
+                    if neighbor != sender:
+                        self._push(Message(sender, neighbor, body, self.tick, broadcast=True))
+                        reached += 1
+                if not reached:
+                    # Unknown sender, or nobody in range
+                    self.undeliverable += 1
+            elif self.exists(recipient):
+                self._push(Message(sender, recipient, body, self.tick))
+            else:
+                self.undeliverable += 1
+
+        self.last_delivered = self.delivered - delivered_before
+        self.last_delivery_ms = (time.perf_counter() - start) * 1000
+        return self.last_delivered
+
+    def receive(self, agent_id: int, limit: Optional[int] = None) -> List[Message]:
+        """Take messages from an agent's mailbox, oldest first"""
+        mailbox = self._mailboxes.get(agent_id)
+        if mailbox is None or not len(mailbox):
+            return []
+        self._touch(agent_id)
+        return mailbox.drain(limit)
+
+    def peek(self, agent_id: int) -> List[Message]:
+        """Read an agent's mailbox without removing messages"""
+        mailbox = self._mailboxes.get(agent_id)
+        return mailbox.peek() if mailbox is not None else []
+
+    def remove_agent(self, agent_id: int):
+        """Free an agent's mailbox"""
+        if self._mailboxes.pop(agent_id, None) is not None and self.track_changes:
+            self._changed.discard(agent_id)
+            self._removed.add(agent_id)
+
+    # Sharing mailboxes with other processes
+
+    @property
+    def has_changes(self) -> bool:
+        """Whether take_changes() would return anything"""
+        return bool(self._changed or self._removed)
+
+    def take_changes(self) -> Tuple[Set[int], Set[int]]:
+        """
+        Ids of mailboxes changed and removed since the last call.
+
+        Only filled with ``track_changes``.
+        """
+        changed, removed = self._changed, self._removed
+        self._changed, self._removed = set(), set()
+        return changed, removed
+
+    def mailbox_record(self, agent_id: int) -> Optional[Dict[str, Any]]:
+        """JSON-serializable contents of an agent's mailbox, if it has one"""
+        mailbox = self._mailboxes.get(agent_id)
+        if mailbox is None:
+            return None
+        return {"messages": [message.to_dict() for message in mailbox.peek()], "dropped": mailbox.dropped}
+
+    def apply_mailboxes(self, records: Dict[int, Dict[str, Any]], removed: Iterable[int] = ()):
+        """
+        Replace mailboxes with ``mailbox_record`` output from another
+        process's bus. Nothing applied here counts as a local change.
+        """
+        for agent_id in removed:
+            self._mailboxes.pop(agent_id, None)
+        for agent_id, record in records.items():
+            mailbox = Mailbox(self.mailbox_capacity)
+            for message in record["messages"]:
+                mailbox.push(Message.from_dict(message))
+            mailbox.dropped = record["dropped"]
+            self._mailboxes[agent_id] = mailbox
+
+    @property
+    def mailbox_ids(self) -> Set[int]:
+        return set(self._mailboxes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tick": self.tick,
+            "sent": self.sent,
+            "delivered": self.delivered,
+            "pending": self.pending,
+            "mailboxes": len(self._mailboxes),
+            "queued_in_mailboxes": sum(len(m) for m in self._mailboxes.values()),
+            "mailbox_capacity": self.mailbox_capacity,
+            "dropped_overflow": self.dropped_overflow,
+            "dropped_pending": self.dropped_pending,
+            "undeliverable": self.undeliverable,
+            "last_delivered": self.last_delivered,
+            "last_delivery_ms": self.last_delivery_ms,
+        }
+
+
+# Process-wide bus used by the agent engine's act node
+_bus: Optional[MessageBus] = None
+
+
+def get_message_bus() -> MessageBus:
+    """Get or create the message bus singleton"""
+    global _bus
+    if _bus is None:
+        _bus = MessageBus()
+    return _bus
+
+
+def set_message_bus(bus: MessageBus):
+    """Replace the message bus singleton (e.g. with one wired to a store)"""
+    global _bus
+    _bus = bus
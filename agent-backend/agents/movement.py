@@ -0,0 +1,325 @@
+"""
+Vectorized Agent Movement
+
+Server-side movement stage: every agent's position, velocity and target live
+in NumPy arrays and one ``step`` advances all of them at once:
+
+    1. Steering: accelerate toward the target, slowing down inside the
+       arrival radius (agents without a target brake to a stop).
+    2. Separation: agents closer than the separation radius push apart.
+       Candidate pairs come from a uniform grid with cells the size of the
+       separation radius (the array form of ``SpatialGrid``), built by
+       sorting agents by cell key, so only the 3x3 cells around each agent
+       are checked.
+    3. Integration: velocities are clamped to the maximum speed and
+       positions advanced; agents within tolerance of their target snap to
+       it and stop.
+
+The same cell sort finds the neighborhoods that moving agents changed
+(``relink``), so writing a tick back to the store does not query the grid
+once per moved agent.
+
+Usage:
+    movement = MovementSystem()
+    movement.load(agents_db.values())
+    before = movement.positions.copy()
+    moved, arrived = movement.step(1 / 60)
+    links, nearby = relink(
+        movement.ids, np.flatnonzero(moved), before, movement.positions, agents_db.neighbor_radius
+    )
+    agents_db.move_many(
+        movement.positions_for(moved),
+        arrived=movement.ids[arrived].tolist(),
+        links=links,
+        nearby=nearby
+    )
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# Cell coordinates are packed into one int64 key: (cx + _BIAS) * _STRIDE + (cy + _BIAS)
+_BIAS = 1 << 30
+_STRIDE = 1 << 31
+
+
+def _neighbor_pairs(
+    positions: np.ndarray,
+    rows: np.ndarray,
+    radius: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Every (row, other) pair with ``other`` within radius of a row in ``rows``.
+
+    Candidates come from the 3x3 cells around each row, which in cell-key
+    order are three contiguous runs, one per column.
+    """
+    cells = np.floor(positions / radius).astype(np.int64) + _BIAS
+    keys = cells[:, 0] * _STRIDE + cells[:, 1]
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    query = keys[rows]
+
+    columns = (-_STRIDE, 0, _STRIDE)
+    lows = np.concatenate([np.searchsorted(sorted_keys, query + column - 1) for column in columns])
+    highs = np.concatenate([
+        np.searchsorted(sorted_keys, query + column + 1, side="right") for column in columns
+    ])
+    sizes = highs - lows
+    total = int(sizes.sum())
+    pair_i = np.repeat(np.tile(rows, len(columns)), sizes)
+    pair_j = order[np.arange(total) - np.repeat(np.cumsum(sizes) - sizes - lows, sizes)]
+
+    # Gathering single columns is much cheaper than gathering (n, 2) rows
+    xs = np.ascontiguousarray(positions[:, 0])
+    ys = np.ascontiguousarray(positions[:, 1])
+    dx = xs[pair_i] - xs[pair_j]
+    dy = ys[pair_i] - ys[pair_j]
+    close = (pair_i != pair_j) & (dx * dx + dy * dy <= radius * radius)
+    return pair_i[close], pair_j[close]
+
+
+def relink(
+    ids: np.ndarray,
+    rows: np.ndarray,
+    before: np.ndarray,
+    after: np.ndarray,
+    radius: float
+) -> Tuple[Dict[int, List[int]], List[int]]:
+    """
+    Neighbor lists changed by moving ``rows`` from ``before`` to ``after``.
+
+    ``ids`` and the two position arrays cover every agent of the store, and
+    ``before`` holds the positions it has. Returns ``(links, nearby)`` as
+    ``AgentStore.move_many`` takes them: ``links`` maps the moved agents and
+    every other agent whose neighborhood one of them entered or left to its
+    sorted neighbor ids, and ``nearby`` lists the agents that had a moved
+    agent as a neighbor before or after.
+    """
+    count = len(ids)
+    rows = np.asarray(rows, dtype=np.int64)
+    moved = np.zeros(count, dtype=bool)
+    moved[rows] = True
+    # A pair is packed into one int64, row * count + the neighbor's rank by
+    # id, so a single sort orders each row's neighbors by id
+    by_id = np.argsort(ids)
+    rank = np.empty(count, dtype=np.int64)
+    rank[by_id] = np.arange(count)
+
+    old_i, old_j = _neighbor_pairs(before, rows, radius)
+    new_i, new_j = _neighbor_pairs(after, rows, radius)
+    flipped = np.setxor1d(
+        old_i * count + rank[old_j], new_i * count + rank[new_j], assume_unique=True
+    )
+    others = np.unique(by_id[flipped % count])
+    others = others[~moved[others]]
+
+    query = np.concatenate((rows, others))
+    other_i, other_j = _neighbor_pairs(after, others, radius)
+    pairs = np.sort(np.concatenate((
+        new_i * count + rank[new_j], other_i * count + rank[other_j]
+    )))
+    owners = pairs // count
+    neighbor_ids = ids[by_id[pairs % count]].tolist()
+    starts = np.searchsorted(owners, query).tolist()
+    ends = np.searchsorted(owners, query, side="right").tolist()
+    links = {
+        agent_id: neighbor_ids[start:end]
+        for agent_id, start, end in zip(ids[query].tolist(), starts, ends)
+    }
+    nearby = ids[np.unique(np.concatenate((old_j, new_j)))].tolist()
+    return links, nearby
+
+
+class MovementSystem:
+    """
+    Struct-of-arrays kinematics for all agents.
+
+    Args:
+        max_speed: Speed limit in world units per second
+        max_accel: Steering acceleration limit
+        arrive_radius: Distance at which agents start slowing for their target
+        tolerance: Distance at which a target counts as reached
+        separation_radius: Agents closer than this push each other apart
+        separation_strength: Acceleration at zero distance from a neighbor
+    """
+
+    def __init__(
+        self,
+        max_speed: float = 2.0,
+        max_accel: float = 8.0,
+        arrive_radius: float = 1.0,
+        tolerance: float = 0.1,
+        separation_radius: float = 0.8,
+        separation_strength: float = 12.0
+    ):
+        self.max_speed = max_speed
+        self.max_accel = max_accel
+        self.arrive_radius = arrive_radius
+        self.tolerance = tolerance
+        self.separation_radius = separation_radius
+        self.separation_strength = separation_strength
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.positions = np.zeros((0, 2))
+        self.velocities = np.zeros((0, 2))
+        self.targets = np.zeros((0, 2))
+        self.has_target = np.zeros(0, dtype=bool)
+        self._rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def load(self, records: Iterable[Dict[str, Any]]):
+        """
+        Replace the arrays with the given agent records.
+
+        Velocities of agents already known are kept, so reloading after an
+        external change does not stop agents in their tracks.
+        """
+        records = list(records)
+        count = len(records)
+        ids = np.fromiter((record["id"] for record in records), dtype=np.int64, count=count)
+        positions = np.array([record["position"][:2] for record in records], dtype=float).reshape(count, 2)
+        targets = np.zeros((count, 2))
+        has_target = np.zeros(count, dtype=bool)
+        velocities = np.zeros((count, 2))
+
+        for row, record in enumerate(records):
+            target = record.get("target")
+            if target is not None:
+                targets[row] = target[:2]
+                has_target[row] = True
+            old_row = self._rows.get(record["id"])
+            if old_row is not None:
+                velocities[row] = self.velocities[old_row]
+
+        self.ids = ids
+        self.positions = positions
+        self.velocities = velocities
+        self.targets = targets
+        self.has_target = has_target
+        self._rows = {int(agent_id): row for row, agent_id in enumerate(ids)}
+
+    def set_target(self, agent_id: int, target: Optional[List[float]]):
+        """Set or clear (None) an agent's target"""
+        row = self._rows[agent_id]
+        if target is None:
+            self.has_target[row] = False
+        else:
+            self.targets[row] = target[:2]
+            self.has_target[row] = True
+
+    def separation(self) -> np.ndarray:
+        """Separation acceleration for every agent, shape (n, 2)"""
+        count = len(self.ids)
+        accel = np.zeros((count, 2))
+        if count < 2 or self.separation_radius <= 0:
+            return accel
+
+        radius = self.separation_radius
+        cells = np.floor(self.positions / radius).astype(np.int64) + _BIAS
+        keys = cells[:, 0] * _STRIDE + cells[:, 1]
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        positions = self.positions[order]
+
+        # In key order the cells (cx, cy - 1..cy + 1) of one column are a
+        # contiguous run, so each agent needs two ranges of candidates: the
+        # rest of its own column (cy..cy + 1, after itself) and the 3 cells of
+        # the next column. Every pair is seen once and applied to both agents.
+        rows = np.arange(count)
+        lows = np.concatenate((
+            rows + 1,
+            np.searchsorted(sorted_keys, sorted_keys + _STRIDE - 1),
+        ))
+        highs = np.concatenate((
+            np.searchsorted(sorted_keys, sorted_keys + 2),
+            np.searchsorted(sorted_keys, sorted_keys + _STRIDE + 2),
+        ))
+        sizes = highs - lows
+        total = int(sizes.sum())
+        if total == 0:
+            return accel
+
+        pair_i = np.repeat(np.concatenate((rows, rows)), sizes)
+        pair_j = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes - lows, sizes)
+
+        delta = positions[pair_i] - positions[pair_j]
+        dist_sq = np.einsum("ij,ij->i", delta, delta)
+        close = dist_sq < radius * radius
+        pair_i, pair_j, delta = pair_i[close], pair_j[close], delta[close]
+        if not len(pair_i):
+            return accel
+
+        dist = np.sqrt(dist_sq[close])
+        # Coincident agents: push apart at full strength along a fixed axis
+        stacked = dist < 1e-9
+        delta[stacked] = (1.0, 0.0)
+        push = self.separation_strength * (radius - dist) / radius / np.where(stacked, 1.0, dist)
+        force_x = delta[:, 0] * push
+        force_y = delta[:, 1] * push
+
+        accel[order, 0] = (
+            np.bincount(pair_i, weights=force_x, minlength=count)
+            - np.bincount(pair_j, weights=force_x, minlength=count)
+        )
+        accel[order, 1] = (
+            np.bincount(pair_i, weights=force_y, minlength=count)
+            - np.bincount(pair_j, weights=force_y, minlength=count)
+        )
+        return accel
+
+    def step(self, dt: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Advance every agent by dt seconds.
+
+        Returns:
+            (moved, arrived) boolean masks over the rows; ``arrived`` agents
+            reached their target this step and had it cleared
+        """
+        count = len(self.ids)
+        if count == 0:
+            empty = np.zeros(0, dtype=bool)
+            return empty, empty
+
+        # Steering toward targets with arrival slowdown; masks are applied
+        # as multipliers to keep every operation a full-array one
+        to_target = self.targets - self.positions
+        distance = np.sqrt(np.einsum("ij,ij->i", to_target, to_target))
+        desired_speed = self.max_speed * np.minimum(1.0, distance / self.arrive_radius)
+        scale = np.where(self.has_target, desired_speed / np.maximum(distance, 1e-12), 0.0)
+        desired = to_target * scale[:, None]
+
+        steer = (desired - self.velocities) / dt
+        steer_norm = np.sqrt(np.einsum("ij,ij->i", steer, steer))
+        steer *= np.minimum(1.0, self.max_accel / np.maximum(steer_norm, 1e-12))[:, None]
+
+        self.velocities += (steer + self.separation()) * dt
+
+        speed = np.sqrt(np.einsum("ij,ij->i", self.velocities, self.velocities))
+        clamp = np.minimum(1.0, self.max_speed / np.maximum(speed, 1e-12))
+        # Settle idle agents instead of drifting forever
+        clamp[~self.has_target & (speed < 1e-3)] = 0.0
+        self.velocities *= clamp[:, None]
+
+        step = self.velocities * dt
+        self.positions += step
+        moved = (step[:, 0] != 0.0) | (step[:, 1] != 0.0)
+
+        # Snap agents that reached their target
+        remaining = self.targets - self.positions
+        arrived = self.has_target & (np.einsum("ij,ij->i", remaining, remaining) <= self.tolerance ** 2)
+        if arrived.any():
+            self.positions[arrived] = self.targets[arrived]
+            self.velocities[arrived] = 0.0
+            self.has_target[arrived] = False
+            moved |= arrived
+
+        return moved, arrived
+
+    def positions_for(self, mask: np.ndarray) -> Dict[int, List[float]]:
+        """Map of agent id to position for the selected rows"""
+        return dict(zip(self.ids[mask].tolist(), self.positions[mask].tolist()))
@@ -0,0 +1,461 @@
+"""
+World Recording and Replay
+
+Records each tick's agent positions and states (local agents and agents
+sourced from OpenClaw) so past world states can be looked at again.
+
+A recording is a directory with two append-only files:
+
+    frames.bin  compressed chunks, each holding ``frames_per_chunk`` ticks
+                stored column by column (times, row offsets, source,
+                agent id, x, y, state code, OpenClaw identity) and
+                zlib-compressed
+    index.bin   one fixed-size record per chunk:
+                [t_start: f64][t_end: f64][offset: u64][length: u64]
+                [frames: u32][rows: u32]
+
+OpenClaw agents are told apart by (session, Gateway id), since their numeric
+``id`` is a hash that collides; each chunk keeps a table of those pairs and
+rows refer to it. A chunk is indexed only after it is written, so a crash
+can at worst leave a partial index record or chunk bytes without a record;
+opening the recorder cuts both off.
+
+Replay memory-maps the index, binary-searches it for a timestamp and only
+reads and decompresses the chunks it needs, so seeking and streaming never
+load the whole recording.
+
+Usage:
+    recorder = WorldRecorder("recordings/world")
+    recorder.record(time.time(), agents_db.values(), openclaw_agents)
+    recorder.close()
+
+    replay = WorldReplay("recordings/world")
+    frame = replay.frame_at(timestamp)
+    async for frame in replay.stream(start=timestamp, speed=2.0):
+        ...
+"""
+
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+FRAMES_FILE = "frames.bin"
+INDEX_FILE = "index.bin"
+LOCK_FILE = ".lock"
+
+# Chunk index record: t_start, t_end, offset, length, frames, rows
+_INDEX_RECORD = struct.Struct("<ddQQII")
+_CHUNK_HEADER = struct.Struct("<I")
+
+SOURCES = ("local", "openclaw")
+
+
+def _column(typecode: str, values: Iterable = ()) -> array:
+    return array(typecode, values)
+
+
+def _to_bytes(column: array) -> bytes:
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_bytes(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+# Column layout of a chunk after the JSON header: (name, typecode, per)
+# where per is "frame", "offsets" (frames + 1) or "row". Chunks recorded
+# before OpenClaw identities were kept end without the "agent_keys" column
+_COLUMNS = (
+    ("times", "d", "frame"),
+    ("offsets", "I", "offsets"),
+    ("source", "B", "row"),
+    ("ids", "q", "row"),
+    ("xs", "f", "row"),
+    ("ys", "f", "row"),
+    ("states", "B", "row"),
+    ("agent_keys", "I", "row"),
+)
+
+# "agent_keys" value of rows without an OpenClaw identity
+_NO_AGENT = 0xFFFFFFFF
+
+
+class _ChunkBuilder:
+    """Accumulates frames column by column until the chunk is written"""
+
+    def __init__(self):
+        self.columns = {name: _column(typecode) for name, typecode, _ in _COLUMNS}
+        self.columns["offsets"].append(0)
+        self.vocabulary: List[str] = []
+        self._codes: Dict[str, int] = {}
+        # (session, Gateway id) of the OpenClaw agents in this chunk
+        self.agent_keys: List[Tuple[str, str]] = []
+        self._agent_codes: Dict[Tuple[str, str], int] = {}
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.columns["times"])
+
+    def _code(self, state: str) -> int:
+        code = self._codes.get(state)
+        if code is None:
+            if len(self.vocabulary) == 255:
+                raise ValueError("More than 255 distinct agent states in one chunk")
+            code = len(self.vocabulary)
+            self._codes[state] = code
+            self.vocabulary.append(state)
+        return code
+
+    def _agent_code(self, agent: Dict[str, Any]) -> int:
+        if agent.get("openclaw_id") is None:
+            return _NO_AGENT
+        key = (str(agent.get("session") or ""), str(agent["openclaw_id"]))
+        code = self._agent_codes.get(key)
+        if code is None:
+            code = len(self.agent_keys)
+            self._agent_codes[key] = code
+            self.agent_keys.append(key)
+        return code
+
+    def add(self, t: float, rows: Iterable[Tuple[int, Dict[str, Any]]]):
+        columns = self.columns
+        for source, agent in rows:
+            position = agent.get("position") or [0.0, 0.0]
+            columns["source"].append(source)
+            columns["ids"].append(int(agent["id"]))
+            columns["xs"].append(float(position[0]))
+            columns["ys"].append(float(position[1]) if len(position) > 1 else 0.0)
+            columns["states"].append(self._code(str(agent.get("state", "idle"))))
+            columns["agent_keys"].append(self._agent_code(agent) if source == 1 else _NO_AGENT)
+        columns["times"].append(t)
+        columns["offsets"].append(len(columns["ids"]))
+
+    def encode(self) -> bytes:
+        header = json.dumps({"states": self.vocabulary, "agent_keys": self.agent_keys}).encode()
+        parts = [_CHUNK_HEADER.pack(len(header)), header]
+        parts.extend(_to_bytes(self.columns[name]) for name, _, _ in _COLUMNS)
+        return zlib.compress(b"".join(parts), 6)
+
+
+def _decode_chunk(data: bytes, frames: int, rows: int) -> Dict[str, Any]:
+    raw = zlib.decompress(data)
+    (header_length,) = _CHUNK_HEADER.unpack_from(raw, 0)
+    position = _CHUNK_HEADER.size
+    header = json.loads(raw[position:position + header_length])
+    position += header_length
+
+    counts = {"frame": frames, "offsets": frames + 1, "row": rows}
+    chunk: Dict[str, Any] = {"vocabulary": header["states"], "keys": header.get("agent_keys")}
+    for name, typecode, per in _COLUMNS:
+        if name == "agent_keys" and chunk["keys"] is None:
+            continue
+        size = counts[per] * array(typecode).itemsize
+        chunk[name] = _from_bytes(typecode, raw[position:position + size])
+        position += size
+    return chunk
+
+
+def _frame_from_chunk(chunk: Dict[str, Any], index: int) -> Dict[str, Any]:
+    start, end = chunk["offsets"][index], chunk["offsets"][index + 1]
+    vocabulary = chunk["vocabulary"]
+    agents = []
+    for row in range(start, end):
+        agent = {
+            "id": chunk["ids"][row],
+            "position": [chunk["xs"][row], chunk["ys"][row]],
+            "state": vocabulary[chunk["states"][row]],
+            "source": SOURCES[chunk["source"][row]],
+        }
+        code = chunk["agent_keys"][row] if "agent_keys" in chunk else _NO_AGENT
+        if code != _NO_AGENT:
+            agent["session"], agent["openclaw_id"] = chunk["keys"][code]
+        agents.append(agent)
+    return {"t": chunk["times"][index], "agents": agents}
+
+
+class WorldRecorder:
+    """
+    Appends ticks to a recording directory.
+
+    Only one process may record into a directory at a time; opening a
+    recording held by another process raises RuntimeError.
+    """
+
+    def __init__(self, path: str, frames_per_chunk: int = 30):
+        if frames_per_chunk < 1:
+            raise ValueError("frames_per_chunk must be at least 1")
+        self.path = path
+        self.frames_per_chunk = frames_per_chunk
+        os.makedirs(path, exist_ok=True)
+
+        self._lock_fd = os.open(os.path.join(path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise RuntimeError(f"Recording {path} is already open by another process")
+
+        self._repair()
+        self._frames = open(os.path.join(path, FRAMES_FILE), "ab")
+        self._index = open(os.path.join(path, INDEX_FILE), "ab")
+        self._last_time = self._read_last_time()
+        self._chunk = _ChunkBuilder()
+        self.frames_recorded = 0
+
+    def _repair(self):
+        """
+        Cut off what an interrupted write left behind: a partial index
+        record, index records whose chunk is not (fully) in frames.bin,
+        and frames.bin bytes past the end of the last indexed chunk.
+        """
+        index_path = os.path.join(self.path, INDEX_FILE)
+        frames_path = os.path.join(self.path, FRAMES_FILE)
+        if not os.path.exists(index_path) or not os.path.exists(frames_path):
+            # A new recording; also drop a stray file from an earlier attempt
+            for stale in (index_path, frames_path):
+                if os.path.exists(stale):
+                    os.truncate(stale, 0)
+            return
+
+        index_size = os.path.getsize(index_path)
+        frames_size = os.path.getsize(frames_path)
+        records = index_size // _INDEX_RECORD.size
+        frames_end = 0
+        with open(index_path, "rb") as index:
+            while records:
+                index.seek((records - 1) * _INDEX_RECORD.size)
+                _, _, offset, length, _, _ = _INDEX_RECORD.unpack(index.read(_INDEX_RECORD.size))
+                if offset + length <= frames_size:
+                    frames_end = offset + length
+                    break
+                records -= 1
+
+        if index_size != records * _INDEX_RECORD.size:
+            os.truncate(index_path, records * _INDEX_RECORD.size)
+        if frames_size != frames_end:
+            os.truncate(frames_path, frames_end)
+
+    def _read_last_time(self) -> Optional[float]:
+        size = self._index.tell()
+        if size < _INDEX_RECORD.size:
+            return None
+        with open(os.path.join(self.path, INDEX_FILE), "rb") as index:
+            index.seek(size - _INDEX_RECORD.size)
+            return _INDEX_RECORD.unpack(index.read(_INDEX_RECORD.size))[1]
+
+    def record(
+        self,
+        t: float,
+        local_agents: Iterable[Dict[str, Any]],
+        openclaw_agents: Iterable[Dict[str, Any]] = ()
+    ):
+        """
+        Append one tick.
+
+        Timestamps must not go backwards. The tick becomes visible to
+        replays once its chunk is full or ``flush`` is called.
+        """
+        if self._last_time is not None and t < self._last_time:
+            raise ValueError(f"Timestamp {t} is before the last recorded tick {self._last_time}")
+
+        rows = [(0, agent) for agent in local_agents]
+        rows.extend((1, agent) for agent in openclaw_agents)
+        self._chunk.add(t, rows)
+        self._last_time = t
+        self.frames_recorded += 1
+
+        if self._chunk.frame_count >= self.frames_per_chunk:
+            self.flush()
+
+    def flush(self):
+        """Write the pending partial chunk, if any"""
+        chunk = self._chunk
+        if chunk.frame_count == 0:
+            return
+
+        data = chunk.encode()
+        offset = self._frames.tell()
+        self._frames.write(data)
+        self._frames.flush()
+
+        times = chunk.columns["times"]
+        self._index.write(_INDEX_RECORD.pack(
+            times[0], times[-1], offset, len(data),
+            chunk.frame_count, len(chunk.columns["ids"])
+        ))
+        self._index.flush()
+        self._chunk = _ChunkBuilder()
+
+    def close(self):
+        """Flush and release the recording"""
+        self.flush()
+        self._frames.close()
+        self._index.close()
+        fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        os.close(self._lock_fd)
+
+
+class WorldReplay:
+    """
+    Seekable reader for a recording directory.
+
+    Safe to use while the recording is still being written: call
+    ``refresh`` (``stream`` does so automatically) to pick up new chunks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._frames = open(os.path.join(path, FRAMES_FILE), "rb")
+        self._index_file = open(os.path.join(path, INDEX_FILE), "rb")
+        self._index: Optional[mmap.mmap] = None
+        self._chunk_count = 0
+        self._cached_chunk: Optional[Tuple[int, Dict[str, Any]]] = None
+        self.refresh()
+
+    def refresh(self):
+        """Re-map the index if the recorder appended chunks"""
+        size = os.fstat(self._index_file.fileno()).st_size
+        count = size // _INDEX_RECORD.size
+        if count == self._chunk_count and self._index is not None:
+            return
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        if count:
+            self._index = mmap.mmap(
+                self._index_file.fileno(), count * _INDEX_RECORD.size, access=mmap.ACCESS_READ
+            )
+        self._chunk_count = count
+
+    def _entry(self, chunk: int) -> Tuple[float, float, int, int, int, int]:
+        return _INDEX_RECORD.unpack_from(self._index, chunk * _INDEX_RECORD.size)
+
+    @property
+    def chunk_count(self) -> int:
+        return self._chunk_count
+
+    @property
+    def start_time(self) -> Optional[float]:
+        return self._entry(0)[0] if self._chunk_count else None
+
+    @property
+    def end_time(self) -> Optional[float]:
+        return self._entry(self._chunk_count - 1)[1] if self._chunk_count else None
+
+    def info(self) -> Dict[str, Any]:
+        frames = sum(self._entry(i)[4] for i in range(self._chunk_count))
+        return {
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "chunks": self._chunk_count,
+            "frames": frames,
+            "compressed_bytes": sum(self._entry(i)[3] for i in range(self._chunk_count)),
+        }
+
+    def _find_chunk(self, t: float) -> int:
+        """Index of the first chunk whose last frame is at or after t"""
+        low, high = 0, self._chunk_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[1] < t:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _load_chunk(self, chunk: int) -> Dict[str, Any]:
+        if self._cached_chunk is not None and self._cached_chunk[0] == chunk:
+            return self._cached_chunk[1]
+        _, _, offset, length, frames, rows = self._entry(chunk)
+        self._frames.seek(offset)
+        decoded = _decode_chunk(self._frames.read(length), frames, rows)
+        self._cached_chunk = (chunk, decoded)
+        return decoded
+
+    def frame_at(self, t: float) -> Optional[Dict[str, Any]]:
+        """The last frame recorded at or before t (the first frame if t is earlier)"""
+        if not self._chunk_count:
+            return None
+        chunk_index = min(self._find_chunk(t), self._chunk_count - 1)
+        if self._entry(chunk_index)[0] > t and chunk_index > 0:
+            chunk_index -= 1
+        chunk = self._load_chunk(chunk_index)
+
+        times = chunk["times"]
+        frame = 0
+        while frame + 1 < len(times) and times[frame + 1] <= t:
+            frame += 1
+        return _frame_from_chunk(chunk, frame)
+
+    def frames(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Frames with start <= t <= end, decoding one chunk at a time"""
+        chunk_index = self._find_chunk(start) if start is not None else 0
+        while chunk_index < self._chunk_count:
+            if end is not None and self._entry(chunk_index)[0] > end:
+                return
+            chunk = self._load_chunk(chunk_index)
+            for frame, t in enumerate(chunk["times"]):
+                if start is not None and t < start:
+                    continue
+                if end is not None and t > end:
+                    return
+                yield _frame_from_chunk(chunk, frame)
+            chunk_index += 1
+
+    async def stream(
+        self,
+        start: Optional[float] = None,
+        speed: float = 1.0,
+        end: Optional[float] = None,
+        follow: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield frames paced by their recorded timestamps divided by speed.
+
+        With ``follow`` the stream keeps waiting for new chunks once it
+        reaches the end of the recording instead of stopping.
+        """
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+
+        previous: Optional[float] = None
+        cursor = start
+        while True:
+            for frame in self.frames(start=cursor, end=end):
+                if previous is not None:
+                    if frame["t"] <= previous:
+                        continue
+                    await asyncio.sleep((frame["t"] - previous) / speed)
+                previous = frame["t"]
+                yield frame
+            if not follow or (end is not None and previous is not None and previous >= end):
+                return
+            await asyncio.sleep(1.0)
+            self.refresh()
+            cursor = previous
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        self._frames.close()
+        self._index_file.close()
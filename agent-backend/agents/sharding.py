@@ -0,0 +1,471 @@
+"""
+Spatially Sharded Simulation
+
+Partitions the world into vertical strips along x and advances each strip in
+its own worker process, so a tick of decision cycles uses every core. The
+server runs it as its simulation stage (``AGENT_SIM_HZ``), fed from and
+written back to the agent store.
+
+Each tick:
+    1. Every shard reports its border agents (those within the neighbor
+       radius of its strip edges).
+    2. The coordinator sends each shard the border agents of the other
+       shards that lie within the radius of its strip (its halo), so
+       ``nearby_agents`` near strip edges is the same as in one process.
+    3. Shards run the checkpointed agent cycle (perceive -> reason -> act)
+       for the agents they own in parallel and return the changed states,
+       the messages ``act`` sent and their new borders.
+
+Checkpoints live in the shard process that owns the agent. Agents whose
+position update moves them into another strip migrate to that shard, which
+starts their checkpoint afresh (the old shard drops it); that only costs one
+full cycle, as a fresh cycle reaches the same decision. When agents cluster and one shard owns far more than its share, the
+strip boundaries are recomputed from x quantiles and agents are redistributed,
+as long as the new strips actually shrink the busiest shard. Agents sharing
+one x cannot be split, so a crowd at a single x stays in one strip and the
+rebalance is not retried until positions change.
+
+Usage:
+    sim = ShardedSimulation(agents, shards=4)
+    sim.step()
+    sim.apply_updates({7: {"position": [12.0, 3.0]}})
+    sim.add([{"id": 8, "position": [0.0, 0.0]}])
+    sim.remove([3])
+    agents = sim.snapshot()
+    sim.close()
+"""
+
+import bisect
+import multiprocessing as mp
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .messaging import get_message_bus
+from .spatial import SpatialGrid
+from .store import NEIGHBOR_RADIUS
+
+
+# Rebalance when the busiest shard owns this many times the mean
+REBALANCE_THRESHOLD = 1.5
+
+
+def decide_agent(record: Dict[str, Any], nearby: List[int]) -> str:
+    """
+    Run the checkpointed agent cycle for a record and return its action.
+
+    Messages sent by ``act`` queue on this process's message bus; a shard
+    takes them after each tick and hands them to the coordinator.
+    """
+    from .engine import agent_thread_id, run_agent_cycle
+
+    result = run_agent_cycle(
+        {"agent_id": record["id"], "position": record["position"], "nearby_agents": nearby},
+        thread_id=agent_thread_id(record["id"])
+    )
+    return result["action"]
+
+
+def _release(agent_ids: Iterable[int]):
+    """Drop the checkpoints this process holds for agents it handed off"""
+    if "agents.engine" not in sys.modules:
+        return
+    from .engine import agent_thread_id, reset_agent_state
+
+    for agent_id in agent_ids:
+        reset_agent_state(agent_thread_id(agent_id))
+
+
+def strip_edges(xs: List[float], count: int) -> List[float]:
+    """
+    Strictly increasing strip edges splitting sorted ``xs`` into ``count``
+    strips of about equal size.
+
+    Equal x values always land in the same strip, so when many agents share
+    one x the remaining ones are split evenly across the remaining strips.
+    Strips that cannot get any agents are given an edge of +inf (empty).
+    """
+    edges: List[float] = []
+    start = 0
+    for i in range(1, count):
+        if start >= len(xs):
+            break
+        cut = start + (len(xs) - start) // (count - i + 1)
+        if cut >= len(xs):
+            break
+        edge = xs[cut]
+        if edge <= xs[start]:
+            # Everything up to the cut shares one x; close the strip after it
+            cut = bisect.bisect_right(xs, xs[start])
+            if cut >= len(xs):
+                break
+            edge = xs[cut]
+        edges.append(edge)
+        start = bisect.bisect_left(xs, edge)
+    return edges + [float("inf")] * (count - 1 - len(edges))
+
+
+def _in_strip(x: float, bounds: Tuple[float, float]) -> bool:
+    return bounds[0] <= x < bounds[1]
+
+
+class _Shard:
+    """State owned by one worker process"""
+
+    def __init__(self, neighbor_radius: float):
+        self.neighbor_radius = neighbor_radius
+        self.bounds = (float("-inf"), float("inf"))
+        self.owned: Dict[int, Dict[str, Any]] = {}
+
+    def border(self) -> List[Dict[str, Any]]:
+        left = self.bounds[0] + self.neighbor_radius
+        right = self.bounds[1] - self.neighbor_radius
+        return [
+            record for record in self.owned.values()
+            if record["position"][0] < left or record["position"][0] >= right
+        ]
+
+    def take_migrants(self) -> List[Dict[str, Any]]:
+        migrants = [
+            record for record in self.owned.values()
+            if not _in_strip(record["position"][0], self.bounds)
+        ]
+        for record in migrants:
+            del self.owned[record["id"]]
+        _release(record["id"] for record in migrants)
+        return migrants
+
+    def step(self, halo: List[Dict[str, Any]]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        grid = SpatialGrid(cell_size=self.neighbor_radius)
+        for record in self.owned.values():
+            grid.insert(record["id"], record["position"])
+        for record in halo:
+            grid.insert(record["id"], record["position"])
+
+        states = {}
+        for agent_id, record in self.owned.items():
+            nearby = sorted(grid.query_radius(
+                record["position"], self.neighbor_radius, exclude=agent_id
+            ))
+            record["nearby_agents"] = nearby
+            action = decide_agent(record, nearby)
+            if action != record["state"]:
+                record["state"] = action
+                states[agent_id] = action
+
+        return {
+            "owned": len(self.owned),
+            "halo": len(halo),
+            "changed": len(states),
+            "states": states,
+            "messages": get_message_bus().take_outbox(),
+            "step_ms": (time.perf_counter() - start) * 1000,
+        }
+
+
+def _shard_worker(conn, neighbor_radius: float):
+    """Worker process loop; every command is answered with one reply"""
+    shard = _Shard(neighbor_radius)
+    while True:
+        command, payload = conn.recv()
+
+        if command == "load":
+            records, shard.bounds = payload
+            owned = {record["id"]: record for record in records}
+            _release(agent_id for agent_id in shard.owned if agent_id not in owned)
+            shard.owned = owned
+            conn.send({"border": shard.border()})
+
+        elif command == "adopt":
+            for record in payload:
+                shard.owned[record["id"]] = record
+            conn.send({"border": shard.border()})
+
+        elif command == "remove":
+            removed = [agent_id for agent_id in payload if shard.owned.pop(agent_id, None) is not None]
+            _release(removed)
+            conn.send({"border": shard.border()})
+
+        elif command == "update":
+            for agent_id, changes in payload.items():
+                record = shard.owned.get(agent_id)
+                if record is None:
+                    continue
+                if changes.get("position") is not None:
+                    record["position"] = list(changes["position"])
+                if changes.get("state") is not None:
+                    record["state"] = changes["state"]
+            conn.send({"migrants": shard.take_migrants(), "border": shard.border()})
+
+        elif command == "step":
+            stats = shard.step(payload)
+            conn.send({
+                "stats": stats,
+                "states": stats.pop("states"),
+                "messages": stats.pop("messages"),
+                "border": shard.border()
+            })
+
+        elif command == "dump":
+            records = list(shard.owned.values())
+            if payload:
+                shard.owned = {}
+            conn.send({"agents": records})
+
+        elif command == "stop":
+            conn.close()
+            return
+
+
+@dataclass
+class ShardingStats:
+    """Counters across ticks"""
+    ticks: int = 0
+    rebalances: int = 0
+    migrations: int = 0
+    last_tick_ms: float = 0.0
+    shard_sizes: List[int] = field(default_factory=list)
+    halo_sizes: List[int] = field(default_factory=list)
+
+
+class ShardedSimulation:
+    """
+    Coordinator for a world split across shard worker processes.
+
+    Commands are sent to every shard before any reply is read, so the
+    shards work in parallel.
+    """
+
+    def __init__(
+        self,
+        agents: Iterable[Dict[str, Any]],
+        shards: int = 2,
+        neighbor_radius: float = NEIGHBOR_RADIUS,
+        rebalance_threshold: Optional[float] = REBALANCE_THRESHOLD
+    ):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.neighbor_radius = neighbor_radius
+        self.rebalance_threshold = rebalance_threshold
+        self.stats = ShardingStats()
+
+        # Spawn rather than fork: the server process may hold threads
+        ctx = mp.get_context("spawn")
+        self._conns = []
+        self._procs = []
+        for _ in range(shards):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_shard_worker, args=(child, neighbor_radius), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+        self._edges: List[float] = []
+        self._owner: Dict[int, int] = {}
+        self._borders: List[List[Dict[str, Any]]] = [[] for _ in range(shards)]
+        self._sizes: List[int] = [0] * shards
+        # Set when a rebalance could not improve on the current strips;
+        # cleared once positions change
+        self._balanced = False
+        records = [self._normalize(agent) for agent in agents]
+        self._load(*self._partition(records))
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._conns)
+
+    @staticmethod
+    def _normalize(agent: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **agent,
+            "position": list(agent["position"]),
+            "state": agent.get("state", "idle"),
+            "nearby_agents": list(agent.get("nearby_agents", [])),
+        }
+
+    def _bounds(self, index: int) -> Tuple[float, float]:
+        left = self._edges[index - 1] if index > 0 else float("-inf")
+        right = self._edges[index] if index < len(self._edges) else float("inf")
+        return (left, right)
+
+    def _shard_for(self, x: float) -> int:
+        return bisect.bisect_right(self._edges, x)
+
+    def _broadcast(self, messages: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+        for conn, message in zip(self._conns, messages):
+            conn.send(message)
+        return [conn.recv() for conn in self._conns]
+
+    def _partition(self, records: List[Dict[str, Any]]) -> Tuple[List[float], List[List[Dict[str, Any]]]]:
+        """Strip edges and the records falling in each strip"""
+        edges = strip_edges(sorted(record["position"][0] for record in records), self.shard_count)
+        buckets: List[List[Dict[str, Any]]] = [[] for _ in range(self.shard_count)]
+        for record in records:
+            buckets[bisect.bisect_right(edges, record["position"][0])].append(record)
+        return edges, buckets
+
+    def _load(self, edges: List[float], buckets: List[List[Dict[str, Any]]]):
+        """Send every shard its strip and records"""
+        self._edges = edges
+        self._owner = {
+            record["id"]: index for index, bucket in enumerate(buckets) for record in bucket
+        }
+        self._sizes = [len(bucket) for bucket in buckets]
+        replies = self._broadcast([
+            ("load", (bucket, self._bounds(i))) for i, bucket in enumerate(buckets)
+        ])
+        self._borders = [reply["border"] for reply in replies]
+
+    def _halo(self, index: int) -> List[Dict[str, Any]]:
+        left, right = self._bounds(index)
+        left -= self.neighbor_radius
+        right += self.neighbor_radius
+        return [
+            record
+            for other, border in enumerate(self._borders) if other != index
+            for record in border
+            if left <= record["position"][0] <= right
+        ]
+
+    def step(self) -> Dict[str, Any]:
+        """
+        Advance every shard by one tick and rebalance if needed.
+
+        The result holds the new state of every agent whose state changed
+        (``states``) and the ``(sender, recipient, body)`` messages their
+        cycles sent (``messages``, recipient None for a broadcast).
+        """
+        start = time.perf_counter()
+        halos = [self._halo(i) for i in range(self.shard_count)]
+        replies = self._broadcast([("step", halo) for halo in halos])
+        self._borders = [reply["border"] for reply in replies]
+
+        shard_stats = [reply["stats"] for reply in replies]
+        states = {}
+        for reply in replies:
+            states.update(reply["states"])
+        self._sizes = [stats["owned"] for stats in shard_stats]
+        self.stats.ticks += 1
+        self.stats.shard_sizes = list(self._sizes)
+        self.stats.halo_sizes = [stats["halo"] for stats in shard_stats]
+
+        rebalanced = self._maybe_rebalance()
+        self.stats.last_tick_ms = (time.perf_counter() - start) * 1000
+        return {
+            "tick": self.stats.ticks,
+            "tick_ms": self.stats.last_tick_ms,
+            "changed": len(states),
+            "states": states,
+            "messages": [message for reply in replies for message in reply["messages"]],
+            "rebalanced": rebalanced,
+            "shards": shard_stats,
+        }
+
+    def apply_updates(self, updates: Dict[int, Dict[str, Any]]):
+        """
+        Apply position/state changes, migrating agents that left their strip.
+
+        ``updates`` maps agent id to ``{"position": [...], "state": ...}``;
+        unknown ids are ignored.
+        """
+        per_shard: List[Dict[int, Dict[str, Any]]] = [{} for _ in range(self.shard_count)]
+        for agent_id, changes in updates.items():
+            if agent_id in self._owner:
+                per_shard[self._owner[agent_id]][agent_id] = changes
+                if changes.get("position") is not None:
+                    self._balanced = False
+
+        replies = self._broadcast([("update", batch) for batch in per_shard])
+        self._borders = [reply["border"] for reply in replies]
+
+        arrivals: List[List[Dict[str, Any]]] = [[] for _ in range(self.shard_count)]
+        for source, reply in enumerate(replies):
+            for record in reply["migrants"]:
+                target = self._shard_for(record["position"][0])
+                arrivals[target].append(record)
+                self._owner[record["id"]] = target
+                self._sizes[source] -= 1
+                self._sizes[target] += 1
+                self.stats.migrations += 1
+
+        if any(arrivals):
+            replies = self._broadcast([("adopt", batch) for batch in arrivals])
+            self._borders = [reply["border"] for reply in replies]
+        self._maybe_rebalance()
+
+    def add(self, agents: Iterable[Dict[str, Any]]):
+        """Hand new agents (or replace known ones) to the shards owning their x"""
+        records = [self._normalize(agent) for agent in agents]
+        self.remove([record["id"] for record in records if record["id"] in self._owner])
+        arrivals: List[List[Dict[str, Any]]] = [[] for _ in range(self.shard_count)]
+        for record in records:
+            target = self._shard_for(record["position"][0])
+            arrivals[target].append(record)
+            self._owner[record["id"]] = target
+            self._sizes[target] += 1
+        if records:
+            self._balanced = False
+            replies = self._broadcast([("adopt", batch) for batch in arrivals])
+            self._borders = [reply["border"] for reply in replies]
+
+    def remove(self, agent_ids: Iterable[int]):
+        """Drop agents (and their checkpoints) from the shards; unknown ids are ignored"""
+        per_shard: List[List[int]] = [[] for _ in range(self.shard_count)]
+        for agent_id in agent_ids:
+            index = self._owner.pop(agent_id, None)
+            if index is not None:
+                per_shard[index].append(agent_id)
+                self._sizes[index] -= 1
+        if any(per_shard):
+            replies = self._broadcast([("remove", batch) for batch in per_shard])
+            self._borders = [reply["border"] for reply in replies]
+
+    def _maybe_rebalance(self) -> bool:
+        if self.rebalance_threshold is None or self.shard_count == 1 or self._balanced:
+            return False
+        total = sum(self._sizes)
+        if total == 0 or max(self._sizes) <= self.rebalance_threshold * total / self.shard_count:
+            return False
+        return self.rebalance()
+
+    def rebalance(self) -> bool:
+        """
+        Recompute strip boundaries from agent x positions and redistribute.
+
+        Returns False (and keeps the current strips) when the new strips
+        would not make the busiest shard any smaller.
+        """
+        edges, buckets = self._partition(self.snapshot())
+        if max(len(bucket) for bucket in buckets) >= max(self._sizes):
+            self._balanced = True
+            return False
+        self._load(edges, buckets)
+        self.stats.rebalances += 1
+        return True
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """All agent records across shards"""
+        replies = self._broadcast([("dump", False)] * self.shard_count)
+        return [record for reply in replies for record in reply["agents"]]
+
+    def close(self):
+        """Stop the shard worker processes"""
+        for conn in self._conns:
+            try:
+                conn.send(("stop", None))
+                conn.close()
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._conns = []
+        self._procs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
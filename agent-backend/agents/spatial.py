@@ -0,0 +1,178 @@
+"""
+Spatial Index for Agent Positions
+
+A uniform hash grid mapping agent ids to the cells their positions fall in.
+Radius and bounding-box queries only visit the cells that overlap the query,
+so neighbor lookups cost O(agents nearby) instead of O(population).
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+Cell = Tuple[int, int]
+
+
+def cell_of(position: Iterable[float], cell_size: float) -> Cell:
+    """Grid cell containing a 2D position"""
+    x, y = list(position)[:2]
+    return (math.floor(x / cell_size), math.floor(y / cell_size))
+
+
+class SpatialGrid:
+    """
+    Uniform grid spatial index over 2D agent positions.
+
+    Usage:
+        grid = SpatialGrid(cell_size=5.0)
+        grid.insert(1, [0.0, 0.0])
+        grid.move(1, [3.0, 1.0])
+        nearby = grid.query_radius([0.0, 0.0], 5.0, exclude=1)
+    """
+
+    def __init__(self, cell_size: float = 5.0):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._cells: Dict[Cell, Set[int]] = {}
+        self._positions: Dict[int, Tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._positions
+
+    def position(self, item_id: int) -> Tuple[float, float]:
+        """Indexed position of an item"""
+        return self._positions[item_id]
+
+    def insert(self, item_id: int, position: Iterable[float]):
+        """Add an item, replacing any previous entry with the same id"""
+        if item_id in self._positions:
+            self.remove(item_id)
+        x, y = list(position)[:2]
+        self._positions[item_id] = (float(x), float(y))
+        self._cells.setdefault(cell_of((x, y), self.cell_size), set()).add(item_id)
+
+    def move(self, item_id: int, position: Iterable[float]):
+        """Update an item's position, touching the cell sets only on cell change"""
+        if item_id not in self._positions:
+            self.insert(item_id, position)
+            return
+        x, y = list(position)[:2]
+        old_cell = cell_of(self._positions[item_id], self.cell_size)
+        new_cell = cell_of((x, y), self.cell_size)
+        self._positions[item_id] = (float(x), float(y))
+        if old_cell != new_cell:
+            self._discard(old_cell, item_id)
+            self._cells.setdefault(new_cell, set()).add(item_id)
+
+    def crossings(self, positions: Dict[int, Tuple[float, float]]) -> List[Tuple[int, Cell, Cell]]:
+        """
+        Items that moving to ``positions`` would take to another cell, with
+        their old and new cells. Only reads the grid.
+        """
+        size = self.cell_size
+        result = []
+        for item_id, (x, y) in positions.items():
+            old = self._positions.get(item_id)
+            if old is None:
+                continue
+            old_cell = (math.floor(old[0] / size), math.floor(old[1] / size))
+            new_cell = (math.floor(x / size), math.floor(y / size))
+            if old_cell != new_cell:
+                result.append((item_id, old_cell, new_cell))
+        return result
+
+    def move_many(
+        self,
+        positions: Dict[int, Tuple[float, float]],
+        crossings: Optional[Iterable[Tuple[int, Cell, Cell]]] = None
+    ):
+        """
+        Move indexed items to float (x, y) ``positions``.
+
+        ``crossings`` may be passed from an earlier ``crossings`` call on the
+        unchanged grid, so only those items touch the cell sets here.
+        """
+        if crossings is None:
+            crossings = self.crossings(positions)
+        self._positions.update(positions)
+        for item_id, old_cell, new_cell in crossings:
+            self._discard(old_cell, item_id)
+            self._cells.setdefault(new_cell, set()).add(item_id)
+
+    def remove(self, item_id: int):
+        """Remove an item if present"""
+        position = self._positions.pop(item_id, None)
+        if position is not None:
+            self._discard(cell_of(position, self.cell_size), item_id)
+
+    def _discard(self, cell: Cell, item_id: int):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(item_id)
+            if not members:
+                del self._cells[cell]
+
+    def _cells_in_box(self, min_x: float, min_y: float, max_x: float, max_y: float):
+        # Unbounded (infinite) sides have no cell index: test occupied cells
+        if not all(math.isfinite(v) for v in (min_x, min_y, max_x, max_y)):
+            size = self.cell_size
+            for (cx, cy), members in self._cells.items():
+                if ((cx + 1) * size >= min_x and cx * size <= max_x
+                        and (cy + 1) * size >= min_y and cy * size <= max_y):
+                    yield members
+            return
+
+        min_cx, min_cy = cell_of((min_x, min_y), self.cell_size)
+        max_cx, max_cy = cell_of((max_x, max_y), self.cell_size)
+
+        # Sparse worlds: walk the occupied cells instead of a huge empty box
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(self._cells):
+            for cell, members in self._cells.items():
+                if min_cx <= cell[0] <= max_cx and min_cy <= cell[1] <= max_cy:
+                    yield members
+            return
+
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                members = self._cells.get((cx, cy))
+                if members:
+                    yield members
+
+    def query_box(
+        self,
+        min_x: float,
+        min_y: float,
+        max_x: float,
+        max_y: float
+    ) -> List[int]:
+        """Ids of all items inside an axis-aligned bounding box (inclusive)"""
+        result = []
+        for members in self._cells_in_box(min_x, min_y, max_x, max_y):
+            for item_id in members:
+                x, y = self._positions[item_id]
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    result.append(item_id)
+        return result
+
+    def query_radius(
+        self,
+        position: Iterable[float],
+        radius: float,
+        exclude: Optional[int] = None
+    ) -> List[int]:
+        """Ids of all items within radius of a position"""
+        px, py = list(position)[:2]
+        radius_sq = radius * radius
+        result = []
+        for members in self._cells_in_box(px - radius, py - radius, px + radius, py + radius):
+            for item_id in members:
+                if item_id == exclude:
+                    continue
+                x, y = self._positions[item_id]
+                if (x - px) ** 2 + (y - py) ** 2 <= radius_sq:
+                    result.append(item_id)
+        return result
@@ -0,0 +1,581 @@
+"""
+Agent Store with Dirty Tracking
+
+Holds the server-side agent records, keeps each agent's ``nearby_agents`` in
+sync with positions through a spatial grid, and tracks which agents need a new
+decision. An agent becomes dirty when its own position or state changes, or
+when the same happens to an agent in its (old or new) neighborhood, so a world
+update only re-runs decision cycles for the dirty set. A histogram of agent
+states is maintained alongside every mutation.
+
+With ``track_changes`` the store also remembers which records changed (an
+agent, or a neighbor whose ``nearby_agents`` it touched) so only those are
+published to other worker processes, which apply them with ``apply_changes``.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Any
+
+from .aggregates import FieldCounts
+from .spatial import Cell, SpatialGrid
+
+
+# Agents within this distance of each other are neighbors
+NEIGHBOR_RADIUS = 5.0
+
+# Record fields counted by ``AgentStore.counts``
+COUNTED_FIELDS = ("state",)
+
+
+@dataclass
+class MoveBatch:
+    """
+    Store changes for a batch of moves, from ``AgentStore.prepare_moves``.
+
+    Holds replacement records rather than edits to the live ones.
+    """
+    records: Dict[int, Dict[str, Any]]
+    positions: Dict[int, Tuple[float, float]]
+    crossings: List[Tuple[int, Cell, Cell]]
+    dirty: Set[int]
+
+
+@dataclass
+class RecomputeStats:
+    """Dirty-set size versus population across recompute passes"""
+    passes: int = 0
+    last_dirty: int = 0
+    last_population: int = 0
+    total_recomputed: int = 0
+    total_population: int = 0
+
+    def record(self, dirty: int, population: int):
+        self.passes += 1
+        self.last_dirty = dirty
+        self.last_population = population
+        self.total_recomputed += dirty
+        self.total_population += population
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "passes": self.passes,
+            "last_dirty": self.last_dirty,
+            "last_population": self.last_population,
+            "last_dirty_ratio": (
+                self.last_dirty / self.last_population if self.last_population else 0.0
+            ),
+            "total_recomputed": self.total_recomputed,
+            "total_population": self.total_population,
+            "overall_dirty_ratio": (
+                self.total_recomputed / self.total_population if self.total_population else 0.0
+            ),
+        }
+
+
+class AgentStore:
+    """
+    Dict-like store of agent records keyed by agent id.
+
+    Records are plain dicts with ``id``, ``position``, ``state`` and
+    ``nearby_agents``. Mutate them through ``add``/``update``/``remove`` so
+    neighborhoods and the dirty set stay correct.
+
+    Usage:
+        store = AgentStore([{"id": 1, "position": [0, 0], "state": "idle"}])
+        store.update(1, position=[1.0, 0.0])
+        stats = store.recompute_dirty(lambda agent: "working")
+    """
+
+    def __init__(
+        self,
+        agents: Optional[Iterable[Dict[str, Any]]] = None,
+        neighbor_radius: float = NEIGHBOR_RADIUS,
+        on_remove: Optional[Callable[[int], None]] = None,
+        track_changes: bool = False
+    ):
+        self.neighbor_radius = neighbor_radius
+        # Called with the id of every agent that leaves the store, so per-agent
+        # state kept elsewhere (checkpoints, mailboxes) can be released
+        self.on_remove = on_remove
+        self.grid = SpatialGrid(cell_size=neighbor_radius)
+        self.stats = RecomputeStats()
+        self.counts = FieldCounts(COUNTED_FIELDS)
+        self._agents: Dict[int, Dict[str, Any]] = {}
+        self._dirty: Set[int] = set()
+        # Records changed and removed since the last take_changes()
+        self.track_changes = track_changes
+        self._changed: Set[int] = set()
+        self._removed: Set[int] = set()
+
+        for agent in agents or []:
+            self.add(agent)
+
+    # Read access mirrors a dict of agent records
+
+    def __contains__(self, agent_id: int) -> bool:
+        return agent_id in self._agents
+
+    def __getitem__(self, agent_id: int) -> Dict[str, Any]:
+        return self._agents[agent_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._agents)
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def get(self, agent_id: int, default=None):
+        return self._agents.get(agent_id, default)
+
+    def items(self):
+        return self._agents.items()
+
+    def values(self):
+        return self._agents.values()
+
+    @property
+    def dirty(self) -> Set[int]:
+        """Ids of agents waiting for a new decision"""
+        return set(self._dirty)
+
+    # Mutations
+
+    def add(self, agent: Dict[str, Any]):
+        """Insert an agent and link it into its neighborhood"""
+        agent_id = agent["id"]
+        if agent_id in self._agents:
+            self._unlink(agent_id)
+
+        record = {
+            **agent,
+            "position": list(agent["position"]),
+            "state": agent.get("state", "idle"),
+            "nearby_agents": [],
+        }
+        self._agents[agent_id] = record
+        self.counts.set(agent_id, record)
+        self.grid.insert(agent_id, record["position"])
+        self._relink(agent_id)
+        self._dirty.add(agent_id)
+        self._touch(agent_id)
+
+    def remove(self, agent_id: int):
+        """Remove an agent, unlinking it from its neighbors"""
+        if self._unlink(agent_id) and self.on_remove is not None:
+            self.on_remove(agent_id)
+
+    def _unlink(self, agent_id: int) -> bool:
+        record = self._agents.pop(agent_id, None)
+        if record is None:
+            return False
+        self.grid.remove(agent_id)
+        self.counts.remove(agent_id)
+        for other_id in record["nearby_agents"]:
+            other = self._agents.get(other_id)
+            if other is not None and agent_id in other["nearby_agents"]:
+                other["nearby_agents"].remove(agent_id)
+                self._dirty.add(other_id)
+                self._touch(other_id)
+        self._dirty.discard(agent_id)
+        if self.track_changes:
+            self._changed.discard(agent_id)
+            self._removed.add(agent_id)
+        return True
+
+    def update(
+        self,
+        agent_id: int,
+        position: Optional[List[float]] = None,
+        state: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Change an agent's position and/or state.
+
+        Marks the agent and every old and new neighbor dirty when something
+        actually changed. Raises KeyError for unknown agents.
+        """
+        record = self._agents[agent_id]
+        changed = False
+
+        if position is not None and list(position) != record["position"]:
+            record["position"] = list(position)
+            self.grid.move(agent_id, record["position"])
+            self._relink(agent_id)
+            changed = True
+
+        if state is not None and state != record["state"]:
+            record["state"] = state
+            self.counts.set(agent_id, record)
+            changed = True
+
+        if changed:
+            self._mark_neighborhood(agent_id)
+            self._touch(agent_id)
+        return record
+
+    def move_many(
+        self,
+        positions: Dict[int, List[float]],
+        arrived: Iterable[int] = (),
+        links: Optional[Dict[int, List[int]]] = None,
+        nearby: Optional[Iterable[int]] = None
+    ):
+        """
+        Apply a batch of positions from the movement stage.
+
+        Agents in ``arrived`` reached their target, which is cleared.
+        Neighborhoods, dirty marks and changes end up as after an ``update``
+        per agent, but every record's links are rewritten once per batch
+        instead of once per moved neighbor.
+
+        ``links`` maps each moved agent, and each other agent whose
+        neighborhood gained or lost one of them, to its sorted neighbor ids
+        after the move (``agents.movement.relink``); see ``prepare_moves``.
+        Without it the moved agents' neighborhoods come from the grid.
+        """
+        if links is not None:
+            self.commit_moves(self.prepare_moves(positions, links, arrived, nearby))
+            return
+
+        moved = {}
+        for agent_id, position in positions.items():
+            record = self._agents.get(agent_id)
+            if record is not None and list(position) != record["position"]:
+                record["position"] = list(position)
+                self.grid.move(agent_id, record["position"])
+                # Old neighbors saw a change too
+                self._dirty.update(record["nearby_agents"])
+                moved[agent_id] = record
+        self._dirty.update(moved)
+        if self.track_changes:
+            self._changed.update(moved)
+        self._relink_moved(moved)
+
+        for agent_id in arrived:
+            record = self._agents.get(agent_id)
+            if record is not None:
+                record["target"] = None
+                self._touch(agent_id)
+
+    def prepare_moves(
+        self,
+        positions: Dict[int, List[float]],
+        links: Dict[int, List[int]],
+        arrived: Iterable[int] = (),
+        nearby: Optional[Iterable[int]] = None
+    ) -> MoveBatch:
+        """
+        Work out what ``move_many`` with ``links`` would change, without
+        changing anything.
+
+        Only reads the store, so it can run on a worker thread while the
+        event loop serves requests; the batch is only valid to commit if the
+        store has not been mutated since. ``links`` is taken as-is, like the
+        records in ``apply_changes``. ``nearby``, the agents that had a moved
+        agent as a neighbor before or after, saves walking every moved
+        agent's old and new neighbor lists to find who to mark dirty.
+        """
+        records: Dict[int, Dict[str, Any]] = {}
+        grid_positions: Dict[int, Tuple[float, float]] = {}
+        dirty: Set[int] = set()
+        for agent_id, position in positions.items():
+            record = self._agents.get(agent_id)
+            if record is None or list(position) == record["position"]:
+                continue
+            records[agent_id] = {**record, "position": list(position)}
+            grid_positions[agent_id] = (float(position[0]), float(position[1]))
+            if nearby is None:
+                dirty.update(record["nearby_agents"])
+        dirty.update(records)
+
+        for agent_id, neighbors in links.items():
+            record = records.get(agent_id)
+            if record is not None:
+                record["nearby_agents"] = neighbors
+                if nearby is None:
+                    dirty.update(neighbors)
+            elif agent_id in self._agents:
+                records[agent_id] = {**self._agents[agent_id], "nearby_agents": neighbors}
+        if nearby is not None:
+            dirty.update(nearby)
+
+        for agent_id in arrived:
+            record = records.get(agent_id) or self._agents.get(agent_id)
+            if record is not None:
+                records[agent_id] = {**record, "target": None}
+
+        return MoveBatch(
+            records=records,
+            positions=grid_positions,
+            crossings=self.grid.crossings(grid_positions),
+            dirty=dirty
+        )
+
+    def commit_moves(self, batch: MoveBatch):
+        """
+        Apply a batch from ``prepare_moves``.
+
+        Costs a few bulk dict and set updates plus one grid update per agent
+        that changed cells, so it stays cheap on the event loop.
+        """
+        self._agents.update(batch.records)
+        self.grid.move_many(batch.positions, batch.crossings)
+        self._dirty |= batch.dirty
+        if self.track_changes:
+            self._changed.update(batch.records)
+
+    def set_target(self, agent_id: int, target: Optional[List[float]]):
+        """
+        Set or clear the point an agent should move to.
+
+        A target alone changes nothing the agent perceives, so it does
+        not dirty the neighborhood. Raises KeyError for unknown agents.
+        """
+        self._agents[agent_id]["target"] = list(target) if target is not None else None
+        self._touch(agent_id)
+
+    def _relink(self, agent_id: int):
+        """Recompute an agent's neighbors and patch the reverse links"""
+        record = self._agents[agent_id]
+        old = set(record["nearby_agents"])
+        new = set(self.grid.query_radius(
+            record["position"], self.neighbor_radius, exclude=agent_id
+        ))
+        record["nearby_agents"] = sorted(new)
+
+        for other_id in old - new:
+            other = self._agents[other_id]
+            if agent_id in other["nearby_agents"]:
+                other["nearby_agents"].remove(agent_id)
+        for other_id in new - old:
+            other = self._agents[other_id]
+            other["nearby_agents"].append(agent_id)
+            other["nearby_agents"].sort()
+
+        # Agents that left the neighborhood saw a change too
+        self._dirty.update(old - new)
+        if self.track_changes:
+            self._changed.update(old ^ new)
+
+    def _relink_moved(self, moved: Dict[int, Dict[str, Any]]):
+        """Relink agents already moved in the grid, patching each reverse link list once"""
+        gained: Dict[int, List[int]] = {}
+        lost: Dict[int, List[int]] = {}
+        for agent_id, record in moved.items():
+            old = record["nearby_agents"]
+            new = sorted(self.grid.query_radius(
+                record["position"], self.neighbor_radius, exclude=agent_id
+            ))
+            record["nearby_agents"] = new
+            self._dirty.update(new)
+            if new == old:
+                continue
+            old, new = set(old), set(new)
+            # Links between two moved agents are rebuilt from both ends
+            for other_id in old - new:
+                if other_id not in moved:
+                    lost.setdefault(other_id, []).append(agent_id)
+            for other_id in new - old:
+                if other_id not in moved:
+                    gained.setdefault(other_id, []).append(agent_id)
+            if self.track_changes:
+                self._changed.update(old ^ new)
+
+        for other_id in lost.keys() | gained.keys():
+            other = self._agents[other_id]
+            nearby = set(other["nearby_agents"]).difference(lost.get(other_id, ()))
+            other["nearby_agents"] = sorted(nearby.union(gained.get(other_id, ())))
+
+    def _mark_neighborhood(self, agent_id: int):
+        self._dirty.add(agent_id)
+        self._dirty.update(self._agents[agent_id]["nearby_agents"])
+
+    def mark_dirty(self, agent_id: int):
+        """Force an agent to be recomputed on the next pass"""
+        if agent_id in self._agents:
+            self._dirty.add(agent_id)
+
+    def _touch(self, agent_id: int):
+        if self.track_changes:
+            self._changed.add(agent_id)
+
+    # Publishing to other processes
+
+    def take_changes(self) -> Tuple[Set[int], Set[int]]:
+        """
+        Ids of records changed and of agents removed since the last call.
+
+        Only filled with ``track_changes``. A changed record may be a
+        neighbor whose ``nearby_agents`` moved, not just a mutated agent.
+        """
+        changed, removed = self._changed, self._removed
+        self._changed, self._removed = set(), set()
+        return changed, removed
+
+    def apply_changes(self, records: Iterable[Dict[str, Any]], removed: Iterable[int] = ()):
+        """
+        Apply records published by another process's store.
+
+        Records replace the local ones as they are, neighborhoods included
+        (the publisher already relinked them), so this costs a grid update
+        and a count adjustment per record. Removed agents are reported to
+        ``on_remove``. Nothing applied here counts as a local change.
+        """
+        for agent_id in removed:
+            record = self._agents.pop(agent_id, None)
+            if record is None:
+                continue
+            self.grid.remove(agent_id)
+            self.counts.remove(agent_id)
+            self._dirty.discard(agent_id)
+            if self.on_remove is not None:
+                self.on_remove(agent_id)
+
+        for record in records:
+            agent_id = record["id"]
+            old = self._agents.get(agent_id)
+            if old is None:
+                self.grid.insert(agent_id, record["position"])
+            elif old["position"] != record["position"]:
+                self.grid.move(agent_id, record["position"])
+            self._agents[agent_id] = record
+            self.counts.set(agent_id, record)
+
+    def marks(self) -> Dict[str, Any]:
+        """JSON-serializable dirty set and recompute stats"""
+        return {"dirty": sorted(self._dirty), "stats": asdict(self.stats)}
+
+    def load_marks(self, marks: Dict[str, Any]):
+        """Replace the dirty set and recompute stats with ``marks()`` output"""
+        self._dirty = set(marks.get("dirty", []))
+        self.stats = RecomputeStats(**marks.get("stats", {}))
+
+    # Snapshots
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable copy of the store, including the dirty set"""
+        return {
+            "agents": [
+                {**record, "position": list(record["position"]),
+                 "nearby_agents": list(record["nearby_agents"])}
+                for record in self._agents.values()
+            ],
+            "dirty": sorted(self._dirty),
+            "stats": asdict(self.stats),
+        }
+
+    def load_snapshot(self, snapshot: Dict[str, Any]):
+        """
+        Replace the store contents with a snapshot from ``to_snapshot``.
+
+        Neighborhoods are taken from the snapshot as-is instead of being
+        re-derived, so loading costs one grid insert per agent. Agents missing
+        from the snapshot are reported to ``on_remove``.
+        """
+        removed = set(self._agents)
+        self._agents = {}
+        self.grid = SpatialGrid(cell_size=self.neighbor_radius)
+        for record in snapshot.get("agents", []):
+            record = {**record, "position": list(record["position"]),
+                      "nearby_agents": list(record["nearby_agents"])}
+            self._agents[record["id"]] = record
+            self.grid.insert(record["id"], record["position"])
+        self._dirty = set(snapshot.get("dirty", []))
+        self.counts = FieldCounts.from_records(COUNTED_FIELDS, self._agents.items())
+        self.stats = RecomputeStats(**snapshot.get("stats", {}))
+
+        removed -= set(self._agents)
+        if self.track_changes:
+            self._changed = set(self._agents)
+            self._removed |= removed
+        if self.on_remove is not None:
+            for agent_id in removed:
+                self.on_remove(agent_id)
+
+    # Recompute
+
+    def take_dirty(self) -> List[Dict[str, Any]]:
+        """
+        Claim the dirty set for deciding outside the store.
+
+        Returns copies of the dirty agents' records and clears the set, so
+        decisions can run without holding whatever guards the store. Hand
+        the results to ``apply_decisions``.
+        """
+        batch = [
+            {**record, "position": list(record["position"]),
+             "nearby_agents": list(record["nearby_agents"])}
+            for record in (self._agents.get(agent_id) for agent_id in self._dirty)
+            if record is not None
+        ]
+        self._dirty = set()
+        return batch
+
+    def apply_decisions(
+        self,
+        batch: List[Dict[str, Any]],
+        decisions: Dict[int, Optional[str]]
+    ) -> Dict[str, Any]:
+        """
+        Apply new states for a batch from ``take_dirty``.
+
+        ``decisions`` maps agent id to its new state (or None to keep it).
+        Agents of the batch without a decision (e.g. deciding failed part
+        way) are marked dirty again. A state change dirties the agent's
+        neighbors for the next pass.
+
+        Returns:
+            Dirty-set metrics for this pass and cumulatively
+        """
+        population = len(self._agents)
+        changed = 0
+        for agent in batch:
+            agent_id = agent["id"]
+            if agent_id not in decisions:
+                self.mark_dirty(agent_id)
+                continue
+            record = self._agents.get(agent_id)
+            new_state = decisions[agent_id]
+            if record is None or new_state is None or new_state == record["state"]:
+                continue
+            record["state"] = new_state
+            self.counts.set(agent_id, record)
+            self._dirty.update(record["nearby_agents"])
+            self._touch(agent_id)
+            changed += 1
+
+        recomputed = len(decisions)
+        self.stats.record(recomputed, population)
+        return {
+            "recomputed": recomputed,
+            "population": population,
+            "dirty_ratio": recomputed / population if population else 0.0,
+            "state_changes": changed,
+            "pending_dirty": len(self._dirty),
+            "totals": self.stats.to_dict(),
+        }
+
+    def recompute_dirty(
+        self,
+        decide: Callable[[Dict[str, Any]], Optional[str]]
+    ) -> Dict[str, Any]:
+        """
+        Run ``decide`` for the dirty agents only and apply the new states.
+
+        ``decide`` receives the agent record and returns its new state (or
+        None to keep it). A state change dirties the agent's neighbors for the
+        next pass, so decisions settle once neighborhoods stop changing. If
+        ``decide`` raises, the decisions made so far are applied and the
+        remaining agents stay dirty.
+
+        Returns:
+            Dirty-set metrics for this pass and cumulatively
+        """
+        batch = self.take_dirty()
+        decisions: Dict[int, Optional[str]] = {}
+        try:
+            for agent in batch:
+                decisions[agent["id"]] = decide(agent)
+        finally:
+            result = self.apply_decisions(batch, decisions)
+        return result
@@ -0,0 +1,138 @@
+"""
+Viewport Queries
+
+Helpers for serving only what a client can see:
+
+- ``parse_fields`` / ``project`` trim records to the requested fields so
+  heavy ones (``reasoning``, neighbor lists) can be left out.
+- ``cluster`` aggregates records into grid cells (count, centroid, state
+  histogram) for zoomed-out views.
+- ``build_view`` picks individual agents or clusters for a level of detail.
+
+Culling to a bounding box is done by the caller with ``SpatialGrid.query_box``.
+
+Usage:
+    ids = agents_db.grid.query_box(0, 0, 100, 100)
+    view = build_view([agents_db[i] for i in ids], lod="auto", bbox=(0, 0, 100, 100))
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .spatial import cell_of
+
+
+LOD_AGENTS = "agents"
+LOD_CLUSTERS = "clusters"
+LOD_AUTO = "auto"
+LODS = (LOD_AGENTS, LOD_CLUSTERS, LOD_AUTO)
+
+# "auto" switches to clusters above this many agents in view
+MAX_VIEW_AGENTS = 2000
+
+# Cells along the longer side of the view when no cluster size is given
+CLUSTER_GRID = 32
+
+BBox = Tuple[float, float, float, float]
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """
+    Parse a comma-separated ``fields=`` value.
+
+    Returns None when no projection was asked for. ``id`` is always kept.
+    Raises ValueError for unknown field names.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}; expected any of {list(allowed)}")
+    if "id" not in names:
+        names.insert(0, "id")
+    return names
+
+
+def project(record: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    """Copy of a record with only the given fields"""
+    return {name: record.get(name) for name in fields}
+
+
+def _bounds(records: Sequence[Dict[str, Any]]) -> BBox:
+    xs = [record["position"][0] for record in records]
+    ys = [record["position"][1] for record in records]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def cluster_size_for(bbox: BBox) -> float:
+    """Cell size giving about ``CLUSTER_GRID`` cells across a view"""
+    min_x, min_y, max_x, max_y = bbox
+    return max(max_x - min_x, max_y - min_y, 1e-9) / CLUSTER_GRID
+
+
+def cluster(records: Iterable[Dict[str, Any]], cell_size: float) -> List[Dict[str, Any]]:
+    """Aggregate records into grid cells of ``cell_size``"""
+    cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for record in records:
+        x, y = record["position"][:2]
+        key = cell_of((x, y), cell_size)
+        entry = cells.get(key)
+        if entry is None:
+            entry = cells[key] = {"count": 0, "sum_x": 0.0, "sum_y": 0.0, "states": {}}
+        entry["count"] += 1
+        entry["sum_x"] += x
+        entry["sum_y"] += y
+        state = record.get("state")
+        entry["states"][state] = entry["states"].get(state, 0) + 1
+
+    return [
+        {
+            "cell": [cx, cy],
+            "bounds": [cx * cell_size, cy * cell_size, (cx + 1) * cell_size, (cy + 1) * cell_size],
+            "center": [entry["sum_x"] / entry["count"], entry["sum_y"] / entry["count"]],
+            "count": entry["count"],
+            "states": entry["states"],
+        }
+        for (cx, cy), entry in cells.items()
+    ]
+
+
+def build_view(
+    records: Sequence[Dict[str, Any]],
+    lod: str = LOD_AUTO,
+    fields: Optional[Sequence[str]] = None,
+    bbox: Optional[BBox] = None,
+    cluster_size: Optional[float] = None,
+    max_agents: int = MAX_VIEW_AGENTS
+) -> Dict[str, Any]:
+    """
+    Agents or cluster aggregates for the records in view.
+
+    With ``lod="auto"`` clusters are returned once more than ``max_agents``
+    records are in view. The cluster size defaults to a fraction of the
+    view (or of the records' extent when there is no bounding box).
+    """
+    if lod not in LODS:
+        raise ValueError(f"Unknown lod {lod!r}; expected one of {LODS}")
+    if lod == LOD_AUTO:
+        lod = LOD_CLUSTERS if len(records) > max_agents else LOD_AGENTS
+
+    if lod == LOD_AGENTS:
+        return {
+            "lod": LOD_AGENTS,
+            "count": len(records),
+            "agents": [project(record, fields) for record in records] if fields else list(records),
+        }
+
+    if cluster_size is None:
+        cluster_size = cluster_size_for(bbox) if bbox is not None else math.inf
+        if not math.isfinite(cluster_size):
+            # No or unbounded view: size clusters to what is actually there
+            cluster_size = cluster_size_for(_bounds(records) if records else (0, 0, 1, 1))
+    return {
+        "lod": LOD_CLUSTERS,
+        "count": len(records),
+        "cluster_size": cluster_size,
+        "clusters": cluster(records, cluster_size),
+    }
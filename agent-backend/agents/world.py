@@ -0,0 +1,364 @@
+"""
+Shared-Memory World Store
+
+Publishes the world (agents, tasks, OpenClaw data) into a
+``multiprocessing.shared_memory`` segment so several server worker processes
+serve the same world.
+
+Layout of the segment:
+    [version: u64][length: u64][payload: length bytes]
+
+Writes are serialized by a file lock, so there is a single writer at a time.
+Reads take no lock: the version works as a seqlock (odd while a write is in
+progress), and a reader retries when the version moved while it copied the
+payload.
+
+The payload is a set of named sections. Keyed collections are published as a
+``RecordTable``: every record is JSON-encoded once when it changes and stamped
+with the version that changed it, so a writer only encodes what it touched and
+a reader that is at version ``v`` only decodes records stamped after ``v``.
+Small values (dirty marks, the OpenClaw snapshot) go in a ``StampedValue``,
+re-encoded and decoded only when they change.
+"""
+
+import fcntl
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from contextlib import contextmanager
+from itertools import accumulate
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+# Default segment size; /dev/shm pages are only backed once written
+DEFAULT_WORLD_SIZE = 64 * 1024 * 1024
+
+# Environment variable carrying the segment name to worker processes
+WORLD_SHM_ENV = "AGENT_WORLD_SHM"
+
+_HEADER = struct.Struct("<QQ")
+_VERSION = struct.Struct("<Q")
+# Section framing: [name length u16][name][data length u64][data]
+_SECTION_NAME = struct.Struct("<H")
+_SECTION_LENGTH = struct.Struct("<Q")
+# RecordTable header: members version, keys length, record count
+_TABLE_HEADER = struct.Struct("<QQQ")
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class SharedWorld:
+    """
+    Versioned world snapshot in shared memory.
+
+    Usage:
+        world = SharedWorld.create()            # owner process
+        world.write(encode_sections({"agents": table.encode()}))
+
+        reader = SharedWorld.attach(world.name)  # any other process
+        version, payload = reader.read_raw()
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._buf = shm.buf
+        self.owner = owner
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{shm.name}.lock")
+        self._lock_fd: Optional[int] = None
+        self._claims: List[int] = []
+
+    @classmethod
+    def create(cls, name: Optional[str] = None, size: int = DEFAULT_WORLD_SIZE) -> "SharedWorld":
+        """Create a new segment; the creating process owns and unlinks it"""
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedWorld":
+        """Attach to an existing segment created by another process"""
+        # Only the owner may unlink the segment, so attached segments must not
+        # be registered with the resource tracker (which unlinks them at exit,
+        # or drops the owner's registration when the tracker is shared)
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            register = resource_tracker.register
+            resource_tracker.register = lambda *args, **kwargs: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def capacity(self) -> int:
+        """Maximum payload size in bytes"""
+        return self._shm.size - _HEADER.size
+
+    @property
+    def version(self) -> int:
+        """Current version; odd while a write is in progress"""
+        return _VERSION.unpack_from(self._buf, 0)[0]
+
+    def read_raw(self) -> Tuple[int, bytes]:
+        """
+        Copy out a consistent (version, payload) pair without locking.
+
+        The payload is empty before the first write.
+        """
+        while True:
+            before, length = _HEADER.unpack_from(self._buf, 0)
+            if before & 1:
+                time.sleep(0)
+                continue
+            payload = bytes(self._buf[_HEADER.size:_HEADER.size + length])
+            if self.version == before:
+                return before, payload
+
+    @contextmanager
+    def writer(self):
+        """Hold the cross-process writer lock"""
+        if self._lock_fd is not None:
+            # Re-entrant within one process
+            yield self
+            return
+
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._lock_fd = fd
+            yield self
+        finally:
+            self._lock_fd = None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def claim(self, role: str) -> bool:
+        """
+        Try to become the one process performing a role (e.g. the movement
+        stage) for this world; held until the process exits.
+        """
+        path = os.path.join(tempfile.gettempdir(), f"{self.name}.{role}.lock")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._claims.append(fd)
+        return True
+
+    def write(self, payload: bytes) -> int:
+        """
+        Publish a new payload and return its version.
+
+        The version a write will get is ``version + 2``, which writers use to
+        stamp what they publish while holding ``writer()``. Raises ValueError
+        if the payload does not fit the segment.
+        """
+        if len(payload) > self.capacity:
+            raise ValueError(
+                f"World payload ({len(payload)} bytes) exceeds shared memory "
+                f"capacity ({self.capacity} bytes)"
+            )
+
+        with self.writer():
+            version = self.version
+            _VERSION.pack_into(self._buf, 0, version + 1)
+            self._buf[_HEADER.size:_HEADER.size + len(payload)] = payload
+            _HEADER.pack_into(self._buf, 0, version + 1, len(payload))
+            _VERSION.pack_into(self._buf, 0, version + 2)
+        return version + 2
+
+    def close(self):
+        """Detach from the segment; the owner also unlinks it"""
+        self._buf = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+            try:
+                os.unlink(self._lock_path)
+            except FileNotFoundError:
+                pass
+
+
+def attach_from_env(env: str = WORLD_SHM_ENV) -> Optional[SharedWorld]:
+    """Attach to the segment named in an environment variable (AGENT_WORLD_SHM), if set"""
+    name = os.environ.get(env)
+    if not name:
+        return None
+    return SharedWorld.attach(name)
+
+
+def encode_sections(sections: Dict[str, bytes]) -> bytes:
+    """Frame named sections into one payload"""
+    parts = []
+    for name, data in sections.items():
+        encoded = name.encode()
+        parts += [_SECTION_NAME.pack(len(encoded)), encoded, _SECTION_LENGTH.pack(len(data)), data]
+    return b"".join(parts)
+
+
+def decode_sections(payload: bytes) -> Dict[str, memoryview]:
+    """Split a payload from ``encode_sections`` into views of its sections"""
+    view = memoryview(payload)
+    sections = {}
+    offset = 0
+    while offset < len(view):
+        (name_length,) = _SECTION_NAME.unpack_from(view, offset)
+        offset += _SECTION_NAME.size
+        name = bytes(view[offset:offset + name_length]).decode()
+        offset += name_length
+        (length,) = _SECTION_LENGTH.unpack_from(view, offset)
+        offset += _SECTION_LENGTH.size
+        sections[name] = view[offset:offset + length]
+        offset += length
+    return sections
+
+
+class RecordTable:
+    """
+    Keyed JSON records, each encoded once per change and stamped with the
+    world version that changed it.
+
+    Writers ``put``/``discard`` the records they touched and publish
+    ``encode()``; readers pass the published section to ``apply`` with the
+    version they are at and get back only the records changed since. Keys
+    must survive a JSON round trip (ints or strings). Every process keeps
+    its own table mirroring the published one, so any of them can write.
+
+    Section layout:
+        [members version u64][keys length u64][count u64]
+        [stamps: count x u64][offsets: (count + 1) x u64]
+        [keys: JSON list][records: concatenated JSON]
+    """
+
+    def __init__(self):
+        # key -> (stamp, encoded record), in publishing order
+        self._records: Dict[Hashable, Tuple[int, bytes]] = {}
+        # Version of the last insert or removal; keys are only re-sent and
+        # re-read when it moves
+        self.members_version = 0
+        self._keys: Optional[bytes] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._records
+
+    def put(self, key: Hashable, record: Any, stamp: int):
+        """Encode a new or changed record"""
+        if key not in self._records:
+            self.members_version = stamp
+            self._keys = None
+        self._records[key] = (stamp, _encode(record))
+
+    def discard(self, key: Hashable, stamp: int):
+        """Drop a record; unknown keys are ignored"""
+        if self._records.pop(key, None) is not None:
+            self.members_version = stamp
+            self._keys = None
+
+    def encode(self) -> bytes:
+        """The table as a section, without re-encoding any record"""
+        if self._keys is None:
+            self._keys = _encode(list(self._records))
+        entries = self._records.values()
+        stamps = array("Q", [stamp for stamp, _ in entries])
+        records = [data for _, data in entries]
+        offsets = array("Q", [0])
+        offsets.extend(accumulate(len(data) for data in records))
+        return b"".join([
+            _TABLE_HEADER.pack(self.members_version, len(self._keys), len(records)),
+            stamps.tobytes(),
+            offsets.tobytes(),
+            self._keys,
+            *records,
+        ])
+
+    def apply(self, section: memoryview, since: int) -> Tuple[Dict[Hashable, Any], Optional[List[Hashable]]]:
+        """
+        Update this table from a published section.
+
+        Returns the records stamped after version ``since``, decoded and
+        keyed, and the full list of keys when records were inserted or
+        removed after ``since`` (None otherwise), so the caller can find
+        removals against its own store.
+        """
+        members_version, keys_length, count = _TABLE_HEADER.unpack_from(section, 0)
+        offset = _TABLE_HEADER.size
+        stamps = array("Q")
+        stamps.frombytes(section[offset:offset + 8 * count])
+        offset += 8 * count
+        offsets = array("Q")
+        offsets.frombytes(section[offset:offset + 8 * (count + 1)])
+        offset += 8 * (count + 1)
+        keys_data = bytes(section[offset:offset + keys_length])
+        blob = bytes(section[offset + keys_length:])
+
+        keys = None
+        if members_version > since or members_version != self.members_version:
+            keys = json.loads(keys_data)
+            old = self._records
+            self._records = {key: old.get(key, (0, b"")) for key in keys}
+            self.members_version = members_version
+            self._keys = keys_data
+        table_keys = keys if keys is not None else list(self._records)
+
+        changed = {}
+        for index in [index for index, stamp in enumerate(stamps) if stamp > since]:
+            key = table_keys[index]
+            data = blob[offsets[index]:offsets[index + 1]]
+            self._records[key] = (stamps[index], data)
+            changed[key] = json.loads(data)
+        return changed, keys
+
+
+class StampedValue:
+    """
+    A JSON value published as a section, re-encoded (and decoded by
+    readers) only when it changes. Replace the value rather than mutating
+    it in place, or ``set`` will not see the change.
+
+    Section layout:
+        [stamp u64][JSON]
+    """
+
+    def __init__(self, value: Any = None):
+        self.value = value
+        self.stamp = 0
+        self._data = _encode(value)
+
+    def set(self, value: Any, stamp: int):
+        """Publish a value at ``stamp`` unless it equals the current one"""
+        if value is self.value or value == self.value:
+            return
+        self.value = value
+        self.stamp = stamp
+        self._data = _encode(value)
+
+    def encode(self) -> bytes:
+        return _VERSION.pack(self.stamp) + self._data
+
+    def apply(self, section: memoryview, since: int) -> bool:
+        """Load a published value; returns whether it changed after ``since``"""
+        (stamp,) = _VERSION.unpack_from(section, 0)
+        if stamp <= since and stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        self._data = bytes(section[_VERSION.size:])
+        self.value = json.loads(self._data)
+        return True
@@ -0,0 +1 @@
+"""Benchmarks for the Agent Marketplace Backend (run with ``python -m benchmarks.<name>``)"""
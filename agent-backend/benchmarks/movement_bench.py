@@ -0,0 +1,87 @@
+"""
+Movement Stage Benchmark
+
+Times ``MovementSystem.step`` for a large population steering toward random
+targets with separation on, and reports whether it fits a 60 Hz tick budget
+on one core. Optionally also times writing the moved positions back into an
+AgentStore: finding the neighborhoods the tick changed (``relink``) and
+preparing the store changes (``prepare_moves``), which the server runs off
+the event loop, and committing them (``commit_moves``), which it runs on it.
+
+Usage:
+    python -m benchmarks.movement_bench --agents 50000 --ticks 120
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from agents.movement import MovementSystem, relink
+from agents.store import AgentStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=50000)
+    parser.add_argument("--ticks", type=int, default=120)
+    parser.add_argument("--density", type=float, default=0.3, help="Agents per square unit")
+    parser.add_argument("--hz", type=float, default=60.0)
+    parser.add_argument("--write-back", action="store_true", help="Also apply positions to an AgentStore")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    side = (args.agents / args.density) ** 0.5
+    records = [
+        {"id": i, "position": rng.uniform(0, side, 2).tolist(), "target": rng.uniform(0, side, 2).tolist()}
+        for i in range(args.agents)
+    ]
+    movement = MovementSystem()
+    movement.load(records)
+    store = AgentStore(records) if args.write_back else None
+
+    dt = 1.0 / args.hz
+    for _ in range(5):
+        movement.step(dt)
+
+    step_times = []
+    relink_times = []
+    prepare_times = []
+    write_times = []
+    for _ in range(args.ticks):
+        before = movement.positions.copy()
+        start = time.perf_counter()
+        moved, arrived = movement.step(dt)
+        step_times.append(time.perf_counter() - start)
+        if store is not None:
+            start = time.perf_counter()
+            links, nearby = relink(
+                movement.ids, np.flatnonzero(moved), before, movement.positions, store.neighbor_radius
+            )
+            positions = movement.positions_for(moved)
+            relink_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            batch = store.prepare_moves(positions, links, movement.ids[arrived].tolist(), nearby)
+            prepare_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            store.commit_moves(batch)
+            write_times.append(time.perf_counter() - start)
+
+    budget_ms = 1000.0 / args.hz
+    steps = np.array(step_times) * 1000
+    print(f"{args.agents} agents on {side:.0f}x{side:.0f}, {args.ticks} ticks, budget {budget_ms:.1f}ms")
+    print(f"step: mean {steps.mean():.2f}ms, p99 {np.percentile(steps, 99):.2f}ms, "
+          f"max sustained {1000.0 / steps.mean():.0f} Hz "
+          f"({'holds' if np.percentile(steps, 99) <= budget_ms else 'misses'} {args.hz:g} Hz)")
+    if write_times:
+        for label, times in (
+            ("relink", relink_times),
+            ("prepare_moves", prepare_times),
+            ("commit_moves (event loop)", write_times),
+        ):
+            times = np.array(times) * 1000
+            print(f"{label}: mean {times.mean():.2f}ms, p99 {np.percentile(times, 99):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
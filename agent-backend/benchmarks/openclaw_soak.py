@@ -0,0 +1,181 @@
+"""
+OpenClaw Integration Soak Test
+
+Starts the gateway simulator and the backend as subprocesses, connects the
+backend to the simulator and samples it for the whole run:
+
+- poll latency: duration of the backend's gateway polls (from
+  ``/api/openclaw/status``), plus poll errors
+- memory: resident set size of the backend process
+- staleness: how far the newest change visible in ``/api/openclaw/agents``
+  trails the simulator's latest change
+
+A summary with percentiles and the memory growth rate is printed at the end.
+
+Usage:
+    python -m benchmarks.openclaw_soak --agents 100000 --sessions 500 --duration 7200
+    python -m benchmarks.openclaw_soak --duration 120 --error-rate 0.05 --slow-rate 0.02
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process in MB (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def wait_healthy(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout:.0f}s")
+
+
+def summarize(name: str, values: List[float], unit: str) -> str:
+    if not values:
+        return f"{name}: no samples"
+    data = np.array(values)
+    return (f"{name}: p50 {np.percentile(data, 50):.1f}{unit}, p95 {np.percentile(data, 95):.1f}{unit}, "
+            f"max {data.max():.1f}{unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--change-rate", type=float, default=0.05)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=5000.0)
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Backend poll interval in seconds")
+    parser.add_argument("--duration", type=float, default=300.0, help="Soak duration in seconds")
+    parser.add_argument("--sample-interval", type=float, default=10.0)
+    parser.add_argument("--gateway-port", type=int, default=18790)
+    parser.add_argument("--backend-port", type=int, default=8100)
+    args = parser.parse_args()
+
+    gateway_url = f"http://127.0.0.1:{args.gateway_port}"
+    backend_url = f"http://127.0.0.1:{args.backend_port}"
+
+    simulator = subprocess.Popen(
+        [
+            sys.executable, "-m", "integrations.openclaw_simulator",
+            "--port", str(args.gateway_port),
+            "--agents", str(args.agents),
+            "--sessions", str(args.sessions),
+            "--change-rate", str(args.change_rate),
+            "--latency-ms", str(args.latency_ms),
+            "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate),
+            "--slow-rate", str(args.slow_rate),
+            "--slow-ms", str(args.slow_ms),
+            "--seed", "0",
+        ],
+        cwd=BACKEND_DIR
+    )
+    # The soak targets the integration; keep the movement stage out of the numbers
+    backend = subprocess.Popen(
+        [sys.executable, "main.py", "--host", "127.0.0.1", "--port", str(args.backend_port)],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "AGENT_MOVEMENT_HZ": os.environ.get("AGENT_MOVEMENT_HZ", "0")},
+        stdout=subprocess.DEVNULL
+    )
+
+    poll_ms: List[float] = []
+    staleness: List[float] = []
+    memory: List[tuple] = []
+    try:
+        wait_healthy(f"{gateway_url}/health", 120)
+        wait_healthy(f"{backend_url}/api/health", 60)
+
+        with httpx.Client(timeout=60.0) as client:
+            client.post(
+                f"{backend_url}/api/openclaw/connect",
+                json={"gateway_url": gateway_url, "poll_interval": args.poll_interval}
+            ).raise_for_status()
+
+            started = time.monotonic()
+            seen_polls = 0
+            while time.monotonic() - started < args.duration:
+                time.sleep(args.sample_interval)
+                elapsed = time.monotonic() - started
+
+                poll = client.get(f"{backend_url}/api/openclaw/status").json().get("poll") or {}
+                if poll.get("polls", 0) > seen_polls:
+                    seen_polls = poll["polls"]
+                    poll_ms.append(poll["last_poll_ms"])
+
+                simulated = client.get(f"{gateway_url}/simulator/stats").json()
+                lag = None
+                response = client.get(f"{backend_url}/api/openclaw/agents", params={"fields": "id,updated_at"})
+                if response.status_code == 200:
+                    updates = [agent["updated_at"] or 0.0 for agent in response.json()]
+                    if updates:
+                        lag = max(0.0, simulated["last_change_at"] - max(updates))
+                        staleness.append(lag)
+
+                rss = rss_mb(backend.pid)
+                if rss is not None:
+                    memory.append((elapsed, rss))
+
+                print(
+                    f"[{elapsed:7.0f}s] polls {poll.get('polls', 0)} errors {poll.get('poll_errors', 0)} "
+                    f"last poll {poll.get('last_poll_ms', 0.0):.0f}ms "
+                    f"staleness {'n/a' if lag is None else f'{lag:.2f}s'} "
+                    f"rss {'n/a' if rss is None else f'{rss:.0f}MB'}",
+                    flush=True
+                )
+
+            final_poll = client.get(f"{backend_url}/api/openclaw/status").json().get("poll") or {}
+            final_sim = client.get(f"{gateway_url}/simulator/stats").json()
+    finally:
+        backend.terminate()
+        simulator.terminate()
+        backend.wait()
+        simulator.wait()
+
+    print()
+    print(f"{args.agents} agents in {args.sessions} sessions, change rate {args.change_rate:g}/s, "
+          f"poll interval {args.poll_interval:g}s, {args.duration:.0f}s")
+    print(f"gateway: {final_sim['requests']} session requests, {final_sim['errors']} injected errors, "
+          f"{final_sim['slow']} slow responses")
+    print(f"polls: {final_poll.get('polls', 0)} ok, {final_poll.get('poll_errors', 0)} failed, "
+          f"mean {final_poll.get('mean_poll_ms', 0.0):.0f}ms, max {final_poll.get('max_poll_ms', 0.0):.0f}ms")
+    print(summarize("sampled poll latency", poll_ms, "ms"))
+    print(summarize("staleness", staleness, "s"))
+    if len(memory) >= 2:
+        times = np.array([t for t, _ in memory])
+        rss = np.array([m for _, m in memory])
+        slope = np.polyfit(times, rss, 1)[0] * 3600 if np.ptp(times) > 0 else 0.0
+        print(f"backend rss: start {rss[0]:.0f}MB, end {rss[-1]:.0f}MB, peak {rss.max():.0f}MB, "
+              f"trend {slope:+.1f}MB/h")
+
+
+if __name__ == "__main__":
+    main()
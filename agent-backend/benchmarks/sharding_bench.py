@@ -0,0 +1,86 @@
+"""
+Sharded Simulation Scaling Benchmark
+
+Runs decision ticks (the checkpointed agent cycle, act included) over a
+uniformly spread population with 1, 2, 4, ... shard processes (up to the
+core count) and reports ticks and agent cycles per second and the speedup
+over a single shard. A clustered run then shows how often the
+shards rebalance when most agents crowd into one region.
+
+Usage:
+    python -m benchmarks.sharding_bench --agents 50000 --ticks 10
+"""
+
+import argparse
+import os
+import random
+import time
+
+from agents.sharding import ShardedSimulation
+
+
+def _population(count: int, width: float, height: float, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        {"id": i, "position": [rng.uniform(0, width), rng.uniform(0, height)], "state": "idle"}
+        for i in range(count)
+    ]
+
+
+def run(shards: int, agents, ticks: int) -> float:
+    """Run one configuration and return ticks per second"""
+    with ShardedSimulation(agents, shards=shards) as sim:
+        sim.step()  # warm-up: worker imports
+        start = time.perf_counter()
+        for _ in range(ticks):
+            sim.step()
+        return ticks / (time.perf_counter() - start)
+
+
+def run_clustered(shards: int, agents, ticks: int, width: float):
+    """Pull agents toward one edge over several ticks and count rebalances"""
+    rng = random.Random(1)
+    with ShardedSimulation(agents, shards=shards) as sim:
+        for _ in range(ticks):
+            sim.apply_updates({
+                agent["id"]: {"position": [rng.uniform(0, width * 0.1), agent["position"][1]]}
+                for agent in rng.sample(agents, len(agents) // ticks)
+            })
+            sim.step()
+        return sim.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=50000)
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--width", type=float, default=2000.0)
+    parser.add_argument("--height", type=float, default=500.0)
+    parser.add_argument("--max-shards", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    agents = _population(args.agents, args.width, args.height)
+    print(f"{args.agents} agents on {args.width:g}x{args.height:g}, {args.ticks} ticks per run")
+    print(f"{'shards':>7} {'ticks/s':>10} {'cycles/s':>10} {'speedup':>8} {'efficiency':>11}")
+    baseline = None
+    shards = 1
+    while shards <= args.max_shards:
+        rate = run(shards, agents, args.ticks)
+        baseline = baseline or rate
+        speedup = rate / baseline
+        print(
+            f"{shards:>7} {rate:>10.3f} {rate * args.agents:>10.0f} "
+            f"{speedup:>7.2f}x {speedup / shards:>10.0%}"
+        )
+        shards *= 2
+
+    if args.max_shards > 1:
+        stats = run_clustered(args.max_shards, agents, args.ticks, args.width)
+        print(
+            f"clustered: {stats.rebalances} rebalances, {stats.migrations} migrations, "
+            f"final shard sizes {stats.shard_sizes}"
+        )
+
+
+if __name__ == "__main__":
+    main()
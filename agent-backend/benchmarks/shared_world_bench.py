@@ -0,0 +1,181 @@
+"""
+Shared World Request Throughput Benchmark
+
+Serves a seeded world from 1, 2, 4, ... worker processes (up to the core
+count) while a writer PATCHes agent positions at a fixed rate, and measures
+the read requests per second the server answers (GET /api/agents/{id} and
+/api/stats) with their latency. Every request pays for its worker applying
+the versions it has not seen yet, so this covers publishing, syncing and
+serving rather than decoding alone.
+
+The load comes from separate client processes on the same machine; on a box
+with few cores they compete with the workers, so compare runs on the same
+machine only.
+
+Usage:
+    python -m benchmarks.shared_world_bench --agents 20000 --seconds 5
+"""
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import random
+import signal
+import time
+
+import httpx
+
+
+def _serve(agent_count: int, port: int, workers: int):
+    # Background stages would compete with the requests being measured
+    os.environ["AGENT_MOVEMENT_HZ"] = "0"
+    os.environ["AGENT_MESSAGE_HZ"] = "0"
+    import main
+
+    # About eight neighbors per agent
+    side = max(1, int(agent_count ** 0.5))
+    for i in range(agent_count):
+        main.agents_db.add({"id": 1000 + i, "position": [3.0 * (i % side), 3.0 * (i // side)], "state": "idle"})
+    main.serve(host="127.0.0.1", port=port, workers=workers)
+
+
+async def _wait_ready(base_url: str, timeout: float = 120.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+async def _read_load(base_url: str, agent_count: int, concurrency: int, seconds: float):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async def reader(client: httpx.AsyncClient, rng: random.Random):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            if rng.random() < 0.9:
+                url = f"{base_url}/api/agents/{1000 + rng.randrange(agent_count)}"
+            else:
+                url = f"{base_url}/api/stats"
+            started = time.perf_counter()
+            response = await client.get(url)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        await asyncio.gather(*(reader(client, random.Random(n)) for n in range(concurrency)))
+    return latencies, errors
+
+
+def _client(base_url: str, agent_count: int, concurrency: int, seconds: float, start, results):
+    start.wait()
+    results.put(asyncio.run(_read_load(base_url, agent_count, concurrency, seconds)))
+
+
+async def _write_load(base_url: str, agent_count: int, rate: float, seconds: float) -> int:
+    rng = random.Random(-1)
+    side = max(1, int(agent_count ** 0.5))
+    writes = 0
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            agent_id = 1000 + rng.randrange(agent_count)
+            position = [rng.uniform(0, 3.0 * side), rng.uniform(0, 3.0 * side)]
+            await client.patch(f"{base_url}/api/agents/{agent_id}", json={"position": position})
+            writes += 1
+            await asyncio.sleep(max(0.0, 1.0 / rate - (time.perf_counter() - started)))
+    return writes
+
+
+def run(workers: int, agent_count: int, seconds: float, write_rate: float,
+        clients: int, concurrency: int, port: int) -> dict:
+    """Run one configuration and return throughput and latency figures"""
+    base_url = f"http://127.0.0.1:{port}"
+    ctx = mp.get_context("spawn")
+    server = ctx.Process(target=_serve, args=(agent_count, port, workers))
+    server.start()
+    try:
+        asyncio.run(_wait_ready(base_url))
+        # Let every worker finish loading the world before measuring
+        time.sleep(2.0)
+
+        start = ctx.Barrier(clients + 1)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(target=_client, args=(base_url, agent_count, concurrency, seconds, start, results))
+            for _ in range(clients)
+        ]
+        for proc in procs:
+            proc.start()
+        start.wait()
+        writes = asyncio.run(_write_load(base_url, agent_count, write_rate, seconds))
+
+        latencies, errors = [], 0
+        for _ in procs:
+            client_latencies, client_errors = results.get()
+            latencies += client_latencies
+            errors += client_errors
+        for proc in procs:
+            proc.join()
+    finally:
+        os.kill(server.pid, signal.SIGINT)
+        server.join(timeout=30)
+        if server.is_alive():
+            server.kill()
+
+    latencies.sort()
+    return {
+        "reads_per_s": len(latencies) / seconds,
+        "writes_per_s": writes / seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-rate", type=float, default=20.0, help="PATCH requests per second")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=2, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="Open requests per client")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(
+        f"{args.agents} agents, {args.write_rate:g} writes/s, {args.clients}x{args.concurrency} "
+        f"readers, {args.seconds:g}s per run"
+    )
+    print(f"{'workers':>8} {'reads/s':>10} {'writes/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'speedup':>8}")
+    baseline = None
+    workers = 1
+    while workers <= args.max_workers:
+        result = run(
+            workers, args.agents, args.seconds, args.write_rate,
+            args.clients, args.concurrency, args.port
+        )
+        baseline = baseline or result["reads_per_s"]
+        print(
+            f"{workers:>8} {result['reads_per_s']:>10.1f} {result['writes_per_s']:>9.1f} "
+            f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+            f"{result['reads_per_s'] / baseline:>7.2f}x"
+        )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,27 @@
-"""Integration modules for Agent Marketplace Backend"""
+"""Integration modules for Agent Marketplace Backend
 
-from .openclaw import (
-    OpenClawGatewayClient,
-    OpenClawAgent,
-    OpenClawSession,
-    OpenClawIntegration,
-    OpenClawAgentState,
-    get_integration,
-    shutdown_integration
-)
+Exports are resolved lazily so the httpx-based clients are only imported
+when an integration is actually used.
+"""
 
-__all__ = [
-    "OpenClawGatewayClient",
-    "OpenClawAgent",
-    "OpenClawSession",
-    "OpenClawIntegration",
-    "OpenClawAgentState",
-    "get_integration",
-    "shutdown_integration"
-]
+import importlib
+
+_EXPORTS = {
+    "OpenClawGatewayClient": ".openclaw",
+    "OpenClawAgent": ".openclaw",
+    "OpenClawSession": ".openclaw",
+    "OpenClawIntegration": ".openclaw",
+    "OpenClawAgentState": ".openclaw",
+    "get_integration": ".openclaw",
+    "shutdown_integration": ".openclaw",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -12,6 +12,7 @@ This module provides:
 
 import asyncio
 import json
+import time
 from typing import Dict, List, Optional, Any, Callable
 from dataclasses import dataclass, field
 from enum import Enum
@@ -40,6 +41,7 @@ class OpenClawAgent:
     reasoning: Optional[str] = None
     nearby_agents: List[str] = field(default_factory=list)
     last_updated: float = 0.0
+    session: str = ""
 
 
 @dataclass
@@ -150,13 +152,34 @@ class OpenClawGatewayClient:
                     model=session_data.get("model", ""),
                     updated_at=session_data.get("updated_at", 0)
                 )
+                session.agents = [
+                    self._parse_agent(agent_data, session)
+                    for agent_data in session_data.get("agents", [])
+                ]
                 sessions.append(session)
             
             return sessions
             
         except httpx.HTTPStatusError as e:
+            # Propagate so a failed poll is not mistaken for an empty gateway
             print(f"Failed to get sessions: {e}")
-            return []
+            raise
+    
+    def _parse_agent(self, agent_data: Dict[str, Any], session: OpenClawSession) -> OpenClawAgent:
+        """Build an agent from its session entry; model defaults to the session's"""
+        agent_id = str(agent_data.get("id", ""))
+        return OpenClawAgent(
+            id=agent_id,
+            name=agent_data.get("name", agent_id),
+            state=agent_data.get("state", "idle"),
+            position=list(agent_data.get("position", [0.0, 0.0])),
+            model=agent_data.get("model") or session.model,
+            channel=agent_data.get("channel", ""),
+            reasoning=agent_data.get("reasoning"),
+            nearby_agents=[str(a) for a in agent_data.get("nearby_agents", [])],
+            last_updated=agent_data.get("updated_at", session.updated_at),
+            session=session.key
+        )
     
     async def get_active_agents(self) -> List[OpenClawAgent]:
         """
@@ -196,13 +219,17 @@ class OpenClawGatewayClient:
         """
         return {
             "id": int(agent.id) if agent.id.isdigit() else hash(agent.id) % 1000,
+            # The numeric id above can collide; this one is the Gateway's own
+            "openclaw_id": agent.id,
             "position": agent.position,
             "state": self._map_state(agent.state),
             "nearby_agents": [int(a) if a.isdigit() else hash(a) % 1000 for a in agent.nearby_agents],
             "reasoning": agent.reasoning,
             "name": agent.name,
             "model": agent.model,
-            "channel": agent.channel
+            "channel": agent.channel,
+            "session": agent.session,
+            "updated_at": agent.last_updated
         }
     
     def _map_state(self, openclaw_state: str) -> str:
@@ -243,6 +270,15 @@ class OpenClawIntegration:
         self._running = False
         self._poll_task: Optional[asyncio.Task] = None
         
+        # Poll health, reported by poll_stats()
+        self.polls = 0
+        self.poll_errors = 0
+        self.last_poll_ms = 0.0
+        self.max_poll_ms = 0.0
+        self.total_poll_ms = 0.0
+        self.last_poll_at = 0.0
+        self.last_agent_count = 0
+        
     async def start(self) -> bool:
         """Start the integration and begin polling"""
         connected = await self.client.connect()
@@ -267,6 +303,7 @@ class OpenClawIntegration:
     async def _poll_loop(self):
         """Background polling loop for agent updates"""
         while self._running:
+            started = time.perf_counter()
             try:
                 agents = await self.client.get_active_agents()
                 visualization_agents = [
@@ -276,12 +313,33 @@ class OpenClawIntegration:
                 
                 if self.on_agents_update:
                     self.on_agents_update(visualization_agents)
+                
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.polls += 1
+                self.last_poll_ms = elapsed_ms
+                self.max_poll_ms = max(self.max_poll_ms, elapsed_ms)
+                self.total_poll_ms += elapsed_ms
+                self.last_poll_at = time.time()
+                self.last_agent_count = len(visualization_agents)
                     
             except Exception as e:
+                self.poll_errors += 1
                 print(f"Error polling agents: {e}")
             
             await asyncio.sleep(self.poll_interval)
     
+    def poll_stats(self) -> Dict[str, Any]:
+        """Successful poll count and durations, errors and time of the last poll"""
+        return {
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "last_poll_ms": self.last_poll_ms,
+            "mean_poll_ms": self.total_poll_ms / self.polls if self.polls else 0.0,
+            "max_poll_ms": self.max_poll_ms,
+            "last_poll_at": self.last_poll_at,
+            "agent_count": self.last_agent_count
+        }
+    
     async def get_agents_for_visualization(self) -> List[Dict[str, Any]]:
         """Get current agents in visualization format"""
         agents = await self.client.get_active_agents()
@@ -297,14 +355,16 @@ _integration: Optional[OpenClawIntegration] = None
 
 async def get_integration(
     gateway_url: str = "http://localhost:18789",
-    poll_interval: float = 5.0
+    poll_interval: float = 5.0,
+    on_agents_update: Optional[Callable[[List[Dict]], None]] = None
 ) -> OpenClawIntegration:
     """Get or create the OpenClaw integration singleton"""
     global _integration
     if _integration is None:
         _integration = OpenClawIntegration(
             gateway_url=gateway_url,
-            poll_interval=poll_interval
+            poll_interval=poll_interval,
+            on_agents_update=on_agents_update
         )
         await _integration.start()
     return _integration
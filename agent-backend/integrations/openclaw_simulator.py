@@ -0,0 +1,245 @@
+"""
+OpenClaw Gateway Simulator
+
+A stand-in for the OpenClaw Gateway serving the two endpoints the
+integration uses (``/health`` and ``/api/v1/sessions``) from a synthetic
+population, so the integration can be load- and soak-tested without a live
+gateway.
+
+- Populations of any size (100k agents is fine) spread across sessions,
+  with stable numeric agent ids.
+- A fraction of the agents changes state and position every second; each
+  changed agent gets a fresh ``updated_at`` so consumers can measure how far
+  behind the gateway they are.
+- Fault injection on the sessions endpoint: base latency with jitter, error
+  responses and occasional very slow responses.
+
+``/simulator/stats`` reports the population generation, the time of the
+latest change and the injected faults.
+
+Usage:
+    python -m integrations.openclaw_simulator --agents 100000 --sessions 500 --change-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+STATES = ("idle", "working", "thinking", "communicating", "error")
+MODELS = ("claude-sonnet", "claude-haiku", "claude-opus", "gpt-4o", "llama-3")
+CHANNELS = ("slack", "discord", "web", "cli")
+KINDS = ("chat", "task", "cron")
+
+
+@dataclass
+class SimulatorConfig:
+    """Population shape, change rate and injected faults"""
+    agents: int = 1000
+    sessions: int = 10
+    # Fraction of all agents that change per second
+    change_rate: float = 0.05
+    world_size: float = 100.0
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # Probabilities per sessions request
+    error_rate: float = 0.0
+    slow_rate: float = 0.0
+    slow_ms: float = 5000.0
+    seed: Optional[int] = None
+
+
+class SyntheticPopulation:
+    """
+    Sessions and agents in the Gateway's JSON shape.
+
+    Changes are applied lazily: ``advance`` applies as many changes as the
+    change rate allows for the time elapsed since the previous call. The
+    serialized payload is cached until the next change.
+    """
+
+    def __init__(self, config: SimulatorConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        now = time.time()
+
+        session_count = max(1, config.sessions)
+        self.sessions: List[Dict[str, Any]] = [
+            {
+                "id": f"sess-{index}",
+                "key": f"session-{index}",
+                "kind": self._rng.choice(KINDS),
+                "model": self._rng.choice(MODELS),
+                "updated_at": now,
+                "agents": [],
+            }
+            for index in range(session_count)
+        ]
+
+        self._agents: List[Dict[str, Any]] = []
+        self._agent_sessions: List[Dict[str, Any]] = []
+        for index in range(config.agents):
+            session = self.sessions[index % session_count]
+            agent = {
+                "id": str(index + 1),
+                "name": f"agent-{index + 1}",
+                "state": self._rng.choice(STATES),
+                "position": [
+                    self._rng.uniform(0, config.world_size),
+                    self._rng.uniform(0, config.world_size),
+                ],
+                "channel": self._rng.choice(CHANNELS),
+                "reasoning": f"Working through step {self._rng.randint(1, 50)} of the plan",
+                "nearby_agents": [],
+                "updated_at": now,
+            }
+            session["agents"].append(agent)
+            self._agents.append(agent)
+            self._agent_sessions.append(session)
+
+        self.generation = 0
+        self.changes = 0
+        self.last_change_at = now
+        self._last_advance = now
+        self._carry = 0.0
+        self._payload: Optional[bytes] = None
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Apply the changes due since the last call; returns how many"""
+        now = time.time() if now is None else now
+        with self._lock:
+            due = (now - self._last_advance) * self.config.change_rate * len(self._agents) + self._carry
+            self._last_advance = now
+            count = int(due)
+            self._carry = due - count
+            if count == 0 or not self._agents:
+                return 0
+
+            size = self.config.world_size
+            for _ in range(count):
+                index = self._rng.randrange(len(self._agents))
+                agent = self._agents[index]
+                agent["state"] = self._rng.choice(STATES)
+                x, y = agent["position"]
+                agent["position"] = [
+                    min(size, max(0.0, x + self._rng.uniform(-1, 1))),
+                    min(size, max(0.0, y + self._rng.uniform(-1, 1))),
+                ]
+                agent["updated_at"] = now
+                self._agent_sessions[index]["updated_at"] = now
+
+            self.changes += count
+            self.generation += 1
+            self.last_change_at = now
+            self._payload = None
+            return count
+
+    def payload(self) -> bytes:
+        """The ``/api/v1/sessions`` response body for the current generation"""
+        with self._lock:
+            if self._payload is None:
+                self._payload = json.dumps({"sessions": self.sessions}).encode()
+            return self._payload
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "agents": len(self._agents),
+            "sessions": len(self.sessions),
+            "generation": self.generation,
+            "changes": self.changes,
+            "last_change_at": self.last_change_at,
+        }
+
+
+def create_app(config: SimulatorConfig) -> FastAPI:
+    """Build the simulator's FastAPI app for a configuration"""
+    app = FastAPI(title="OpenClaw Gateway Simulator")
+    population = SyntheticPopulation(config)
+    rng = random.Random(config.seed)
+    faults = {"requests": 0, "errors": 0, "slow": 0}
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        if request.url.path != "/api/v1/sessions":
+            return await call_next(request)
+
+        faults["requests"] += 1
+        if rng.random() < config.error_rate:
+            faults["errors"] += 1
+            return JSONResponse({"error": "injected failure"}, status_code=503)
+
+        if rng.random() < config.slow_rate:
+            faults["slow"] += 1
+            delay_ms = config.slow_ms
+        else:
+            delay_ms = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+        return await call_next(request)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", **population.stats()}
+
+    @app.get("/api/v1/sessions")
+    async def sessions():
+        # Serializing a large population takes a while; keep /health responsive
+        def build():
+            population.advance()
+            return population.payload()
+
+        body = await asyncio.get_running_loop().run_in_executor(None, build)
+        return Response(content=body, media_type="application/json")
+
+    @app.get("/simulator/stats")
+    async def simulator_stats():
+        population.advance()
+        return {**population.stats(), **faults, "config": asdict(config)}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenClaw Gateway simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18789)
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--change-rate", type=float, default=0.05, help="Fraction of agents changing per second")
+    parser.add_argument("--world-size", type=float, default=100.0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 503 per sessions request")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Probability of a slow sessions response")
+    parser.add_argument("--slow-ms", type=float, default=5000.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = SimulatorConfig(
+        agents=args.agents,
+        sessions=args.sessions,
+        change_rate=args.change_rate,
+        world_size=args.world_size,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
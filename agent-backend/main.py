@@ -1,25 +1,91 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from startup import profiler, LazySubsystem
+
+with profiler.measure("fastapi", "import"):
+    from fastapi import FastAPI, HTTPException, Query, Request, Header, Depends
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import StreamingResponse
+    from pydantic import BaseModel
+
 from typing import List, Optional
+from contextlib import contextmanager, asynccontextmanager
+import asyncio
+import functools
+import json
+import logging
+import math
+import os
+import time
 import uuid
-import httpx
 
-# Import the LangGraph agent engine
-from agents.engine import AgentState, run_agent_cycle
+from models.schemas import AgentStateEnum, Position2D
+from admission import SingleFlight, AdmissionController, AdmissionRejected, INTERACTIVE, LANES
 
-# Import OpenClaw integration
-from integrations.openclaw import (
-    OpenClawGatewayClient,
-    get_integration,
-    shutdown_integration,
-    OpenClawAgentState
+with profiler.measure("agent_store", "import"):
+    from agents.store import AgentStore
+    from agents.world import (
+        SharedWorld, RecordTable, StampedValue, attach_from_env, encode_sections,
+        decode_sections, WORLD_SHM_ENV
+    )
+    from agents.recording import WorldRecorder, WorldReplay
+    from agents.messaging import MessageBus, set_message_bus
+    from agents.aggregates import FieldCounts
+    from agents.spatial import SpatialGrid
+    from agents.viewport import LODS, parse_fields, project, build_view
+
+# The LangGraph engine and the OpenClaw integration (httpx) are loaded on
+# first use; the decision graph is precompiled in the background at startup
+graph_engine = LazySubsystem(
+    "graph_engine",
+    "agents.engine",
+    init=lambda engine: engine.get_compiled_graph(checkpointed=True)
 )
+openclaw = LazySubsystem("openclaw", "integrations.openclaw")
+movement_stage = LazySubsystem("movement", "agents.movement")
+simulation_stage = LazySubsystem("simulation", "agents.sharding")
+
+# Log through uvicorn's handler so messages show up next to the server's own
+logger = logging.getLogger("uvicorn.error")
+
+# Loops started at startup and cancelled at shutdown
+_background_tasks: List[asyncio.Task] = []
+
+
+def _log_task_exit(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+
+def start_background(coro, name: str):
+    """Run a coroutine for the lifetime of the server, logging if it fails"""
+    task = asyncio.create_task(coro, name=name)
+    task.add_done_callback(_log_task_exit)
+    _background_tasks.append(task)
+
+
+@asynccontextmanager
+async def lifespan(app: "FastAPI"):
+    """Start the background subsystems and stop them on shutdown"""
+    profiler.mark_ready()
+    start_background(warm_subsystems(), "warm_subsystems")
+    start_movement()
+    start_simulation()
+    start_messaging()
+    start_recording()
+    try:
+        yield
+    finally:
+        for task in _background_tasks:
+            task.cancel()
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+        _background_tasks.clear()
+        stop_recording()
+
 
 app = FastAPI(
     title="Agent Marketplace Backend",
     description="FastAPI backend for multi-agent system visualization with LangGraph integration",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -38,12 +104,24 @@ class AgentStateModel(BaseModel):
     state: str
     reasoning: Optional[str] = None
     nearby_agents: List[int] = []
+    target: Optional[List[float]] = None
 
 class AgentDecisionRequest(BaseModel):
     agent_id: int
     position: List[float]
     nearby_agents: List[int] = []
 
+class AgentUpdateRequest(BaseModel):
+    position: Optional[Position2D] = None
+    state: Optional[AgentStateEnum] = None
+    # Point the server-side movement stage steers the agent to; null clears it
+    target: Optional[Position2D] = None
+
+class AgentMessageRequest(BaseModel):
+    body: str
+    # Direct message recipient; omitted broadcasts to the sender's neighbors
+    recipient: Optional[int] = None
+
 class AgentDecisionResponse(BaseModel):
     agent_id: int
     action: str
@@ -60,15 +138,197 @@ class TaskResponse(BaseModel):
     status: str
     task: dict
 
-# In-memory agent store (for demo)
-agents_db = {
-    1: {"id": 1, "position": [-2, 0], "state": "idle", "nearby_agents": [2, 3]},
-    2: {"id": 2, "position": [0, 0], "state": "working", "nearby_agents": [1, 3]},
-    3: {"id": 3, "position": [2, 0], "state": "communicating", "nearby_agents": [1, 2]},
-}
+def _forget_agent(agent_id: int):
+    """Release per-agent state held outside the store"""
+    message_bus.remove_agent(agent_id)
+    if graph_engine.loaded:
+        engine = graph_engine.get()
+        engine.reset_agent_state(engine.agent_thread_id(agent_id))
+
+
+# In-memory agent store (for demo); nearby_agents is derived from positions
+with profiler.measure("agent_store", "init"):
+    agents_db = AgentStore([
+        {"id": 1, "position": [-2, 0], "state": "idle"},
+        {"id": 2, "position": [0, 0], "state": "working"},
+        {"id": 3, "position": [2, 0], "state": "communicating"},
+    ], on_remove=_forget_agent)
+
+# Agent mailboxes; broadcasts reach the neighbors found by the spatial grid
+message_bus = MessageBus(
+    neighbors=lambda agent_id: agents_db[agent_id]["nearby_agents"] if agent_id in agents_db else (),
+    exists=lambda agent_id: agent_id in agents_db
+)
+set_message_bus(message_bus)
 
 # Task store
 tasks_db = {}
+# Ids of tasks created or changed since the world was last published
+_changed_tasks = set()
+
+# Latest OpenClaw agents published by the poller, shared across workers
+_openclaw_snapshot: Optional[dict] = None
+# Id of the current Gateway connection, shared across workers; a poller whose
+# connection is no longer current stops (disconnect or reconnect elsewhere)
+_openclaw_connection: Optional[str] = None
+
+# Histograms served by /api/stats, updated with every mutation
+TASK_COUNTED_FIELDS = ("status", "task_type", "priority")
+OPENCLAW_COUNTED_FIELDS = ("session", "model", "state")
+task_counts = FieldCounts(TASK_COUNTED_FIELDS)
+openclaw_counts = FieldCounts(OPENCLAW_COUNTED_FIELDS)
+
+
+def _openclaw_records(agents: List[dict]) -> dict:
+    # Keyed on the Gateway's agent id: the numeric visualization id of a
+    # non-numeric agent is a hash modulo 1000 and collides
+    return {(agent.get("session"), agent["openclaw_id"]): agent for agent in agents}
+
+
+# Spatial index over the OpenClaw snapshot, keyed by position in its list
+openclaw_grid = SpatialGrid()
+
+
+def _index_openclaw_agents(agents: List[dict]):
+    global openclaw_grid
+    grid = SpatialGrid()
+    for index, agent in enumerate(agents):
+        grid.insert(index, agent["position"])
+    openclaw_grid = grid
+
+# Shared-memory world, set when running with several worker processes
+with profiler.measure("shared_world", "init"):
+    _shared_world: Optional[SharedWorld] = attach_from_env()
+_world_version = 0
+agents_db.track_changes = _shared_world is not None
+
+# This process's mirror of the published world. Each agent and task record is
+# encoded once per change, so a publish costs what the mutation touched, and
+# a reader decodes only the records stamped after the version it is at
+_agent_table = RecordTable()
+_task_table = RecordTable()
+_world_meta = StampedValue()
+_openclaw_published = StampedValue()
+
+
+def _publish_world(world: SharedWorld, full: bool = False) -> int:
+    """
+    Publish the local changes (or with ``full`` everything) as the next
+    version of the shared world. Call with the world's writer lock held.
+    """
+    stamp = world.version + 2
+    if full:
+        changed_agents, removed_agents = set(agents_db), set()
+        changed_tasks = set(tasks_db)
+    else:
+        changed_agents, removed_agents = agents_db.take_changes()
+        changed_tasks = set(_changed_tasks)
+    _changed_tasks.clear()
+    
+    for agent_id in removed_agents:
+        _agent_table.discard(agent_id, stamp)
+    for agent_id in changed_agents:
+        if agent_id in agents_db:
+            _agent_table.put(agent_id, agents_db[agent_id], stamp)
+    for task_id in changed_tasks:
+        _task_table.put(task_id, tasks_db[task_id], stamp)
+    _world_meta.set({**agents_db.marks(), "openclaw_connection": _openclaw_connection}, stamp)
+    _openclaw_published.set(_openclaw_snapshot, stamp)
+    
+    return world.write(encode_sections({
+        "agents": _agent_table.encode(),
+        "tasks": _task_table.encode(),
+        "meta": _world_meta.encode(),
+        "openclaw": _openclaw_published.encode()
+    }))
+
+
+def sync_world():
+    """
+    Apply what other workers published since this worker's version.
+    
+    Versions in between are skipped, not replayed: only records stamped
+    after our version are decoded, and the stores and histograms are
+    updated per record rather than rebuilt. The OpenClaw histograms come
+    counted with their snapshot.
+    """
+    global _world_version, _openclaw_snapshot, _openclaw_connection
+    if _shared_world is None or _shared_world.version == _world_version:
+        return
+    
+    version, payload = _shared_world.read_raw()
+    if version == _world_version or not payload:
+        return
+    sections = decode_sections(payload)
+    since = _world_version
+    
+    agents, agent_ids = _agent_table.apply(sections["agents"], since)
+    removed = set(agents_db) - set(agent_ids) if agent_ids is not None else ()
+    agents_db.apply_changes(agents.values(), removed)
+    
+    tasks, task_ids = _task_table.apply(sections["tasks"], since)
+    if task_ids is not None:
+        for task_id in set(tasks_db) - set(task_ids):
+            del tasks_db[task_id]
+            task_counts.remove(task_id)
+    for task_id, task in tasks.items():
+        tasks_db[task_id] = task
+        task_counts.set(task_id, task)
+    
+    if _world_meta.apply(sections["meta"], since):
+        agents_db.load_marks(_world_meta.value)
+        _openclaw_connection = _world_meta.value["openclaw_connection"]
+    if _openclaw_published.apply(sections["openclaw"], since):
+        _openclaw_snapshot = _openclaw_published.value
+        # The publisher ships its histograms; recounting the whole snapshot
+        # on every poll would cost each reader as much as the poller
+        if _openclaw_snapshot:
+            openclaw_counts.load(_openclaw_snapshot["counts"])
+        else:
+            openclaw_counts.sync({})
+        _index_openclaw_agents(_openclaw_snapshot["agents"] if _openclaw_snapshot else [])
+    _world_version = version
+
+
+@contextmanager
+def world_write():
+    """
+    Wrap a mutation of the world stores.
+    
+    With a shared world this holds the writer lock, applies the mutation on
+    top of the latest published version and publishes the result.
+    """
+    global _world_version
+    if _shared_world is None:
+        yield
+        _world_version += 1
+        return
+    
+    with _shared_world.writer():
+        sync_world()
+        yield
+        _world_version = _publish_world(_shared_world)
+
+
+@app.middleware("http")
+async def sync_shared_world(request, call_next):
+    sync_world()
+    return await call_next(request)
+
+
+async def warm_subsystems():
+    """
+    Precompile the decision graph once the server is up.
+    
+    Runs in a worker thread so requests are accepted immediately; a
+    decision request arriving first simply waits for the same load.
+    """
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, graph_engine.get)
+    except Exception:
+        logger.exception("Warming up the decision graph failed; it will load on first use")
+        return
+    logger.info(profiler.summary())
 
 @app.get("/")
 async def root():
@@ -83,18 +343,80 @@ async def root():
 async def health():
     return {"status": "healthy", "langgraph": "enabled"}
 
-@app.get("/api/agents", response_model=List[AgentStateModel])
-async def list_agents():
-    """Get all agents and their states"""
-    return [
-        AgentStateModel(
-            id=agent_id,
-            position=agent["position"],
-            state=agent["state"],
-            nearby_agents=agent.get("nearby_agents", [])
+@app.get("/api/startup")
+async def startup_report():
+    """Import and initialization cost per subsystem"""
+    return {
+        **profiler.report(),
+        "loaded": {
+            graph_engine.name: graph_engine.loaded,
+            openclaw.name: openclaw.loaded
+        }
+    }
+
+AGENT_FIELDS = tuple(AgentStateModel.model_fields)
+
+
+def viewport_query(
+    min_x: Optional[float] = Query(None, description="Left edge of the view"),
+    min_y: Optional[float] = Query(None, description="Bottom edge of the view"),
+    max_x: Optional[float] = Query(None, description="Right edge of the view"),
+    max_y: Optional[float] = Query(None, description="Top edge of the view"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,position,state"),
+    lod: Optional[str] = Query(None, description=f"Level of detail: one of {list(LODS)}"),
+    cluster_size: Optional[float] = Query(None, gt=0, description="Cluster cell size in world units")
+) -> dict:
+    """Shared query parameters of the agent list endpoints"""
+    bounds = (min_x, min_y, max_x, max_y)
+    if any(v is None for v in bounds) and any(v is not None for v in bounds):
+        raise HTTPException(status_code=400, detail="min_x, min_y, max_x and max_y must be given together")
+    bbox = None if min_x is None else bounds
+    # Infinite bounds are fine (an unbounded side); NaN compares false everywhere
+    if bbox is not None and any(math.isnan(v) for v in bbox):
+        raise HTTPException(status_code=400, detail="Bounding box values must be numbers, not NaN")
+    if cluster_size is not None and not math.isfinite(cluster_size):
+        raise HTTPException(status_code=400, detail="cluster_size must be finite")
+    if bbox is not None and (min_x > max_x or min_y > max_y):
+        raise HTTPException(status_code=400, detail="Empty bounding box: min must not exceed max")
+    return {"bbox": bbox, "fields": fields, "lod": lod, "cluster_size": cluster_size}
+
+
+def _agent_view(records: List[dict], view: dict, allowed_fields: tuple):
+    """
+    Project records to the requested fields, or wrap them in a level-of-detail
+    view (individual agents or cluster aggregates) when ``lod`` is given.
+    """
+    try:
+        fields = parse_fields(view["fields"], allowed_fields) or list(allowed_fields)
+        if view["lod"] is None:
+            return [project(record, fields) for record in records]
+        return build_view(
+            records,
+            lod=view["lod"],
+            fields=fields,
+            bbox=view["bbox"],
+            cluster_size=view["cluster_size"]
         )
-        for agent_id, agent in agents_db.items()
-    ]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/agents")
+async def list_agents(view: dict = Depends(viewport_query)):
+    """
+    Get agents and their states.
+    
+    Pass `min_x`, `min_y`, `max_x`, `max_y` to return only agents inside that
+    box (looked up in the spatial index) and `fields=` to leave out heavy
+    fields. Without `lod` the response is a list of agents; with
+    `lod=agents|clusters|auto` it is an object holding either the agents or
+    per-cell cluster aggregates (`auto` clusters when the view is crowded).
+    """
+    if view["bbox"] is None:
+        records = list(agents_db.values())
+    else:
+        records = [agents_db[agent_id] for agent_id in agents_db.grid.query_box(*view["bbox"])]
+    return _agent_view(records, view, AGENT_FIELDS)
 
 @app.get("/api/agents/{agent_id}", response_model=AgentStateModel)
 async def get_agent(agent_id: int):
@@ -107,29 +429,159 @@ async def get_agent(agent_id: int):
         id=agent_id,
         position=agent["position"],
         state=agent["state"],
-        nearby_agents=agent.get("nearby_agents", [])
+        nearby_agents=agent.get("nearby_agents", []),
+        target=agent.get("target")
     )
 
+@app.patch("/api/agents/{agent_id}", response_model=AgentStateModel)
+async def update_agent(agent_id: int, update: AgentUpdateRequest):
+    """
+    Update an agent's position, state and/or movement target.
+    
+    The agent and its old and new neighbors are marked dirty so the
+    next recompute only re-decides agents whose surroundings changed.
+    """
+    if agent_id not in agents_db:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    with world_write():
+        agent = agents_db.update(
+            agent_id,
+            position=update.position,
+            state=update.state.value if update.state is not None else None
+        )
+        if "target" in update.model_fields_set:
+            agents_db.set_target(agent_id, update.target)
+    return AgentStateModel(
+        id=agent_id,
+        position=agent["position"],
+        state=agent["state"],
+        nearby_agents=agent.get("nearby_agents", []),
+        target=agent.get("target")
+    )
+
+def _decide_stored_agent(agent: dict) -> str:
+    """Run a checkpointed decision cycle for an agent in the store"""
+    engine = graph_engine.get()
+    result = engine.run_agent_cycle(
+        {
+            "agent_id": agent["id"],
+            "position": agent["position"],
+            "nearby_agents": agent["nearby_agents"]
+        },
+        thread_id=engine.agent_thread_id(agent["id"])
+    )
+    return result["action"]
+
+def _decide_batch(batch: List[dict], decisions: dict):
+    """Decide a batch of agents, filling ``decisions`` as it goes"""
+    for agent in batch:
+        decisions[agent["id"]] = _decide_stored_agent(agent)
+
+@app.post("/api/agents/recompute")
+async def recompute_agents():
+    """
+    Re-run decision cycles for dirty agents only.
+    
+    The dirty set is claimed under the world lock, decided on an executor
+    thread with the lock released, and the new states are applied under the
+    lock again; agents that could not be decided stay dirty.
+    
+    Returns the dirty-set size versus population for this pass
+    and cumulatively.
+    """
+    loop = asyncio.get_running_loop()
+    # Loads the engine on a worker thread if warm-up has not finished yet
+    await loop.run_in_executor(None, graph_engine.get)
+    
+    with world_write():
+        batch = agents_db.take_dirty()
+    decisions = {}
+    try:
+        await loop.run_in_executor(None, _decide_batch, batch, decisions)
+    finally:
+        with world_write():
+            result = agents_db.apply_decisions(batch, decisions)
+    return result
+
+@app.get("/api/agents/recompute/stats")
+async def recompute_stats():
+    """Cumulative dirty-set metrics and the currently pending dirty count"""
+    return {
+        **agents_db.stats.to_dict(),
+        "pending_dirty": len(agents_db.dirty),
+        "population": len(agents_db)
+    }
+
+# Identical concurrent decide requests share one graph execution, and
+# each client is rate limited with interactive requests ahead of bulk ones
+decide_flights = SingleFlight()
+decide_admission = AdmissionController()
+
 @app.post("/api/agents/decide", response_model=AgentDecisionResponse)
-async def decide_agent_action(request: AgentDecisionRequest):
+async def decide_agent_action(
+    request: AgentDecisionRequest,
+    http_request: Request,
+    x_request_priority: str = Header(INTERACTIVE),
+    x_client_id: Optional[str] = Header(None)
+):
     """
     Get the next action for an agent using LangGraph.
     
     This endpoint uses the LangGraph state machine to determine
     the agent's next action based on its current state and environment.
+    The state of agents in the store is checkpointed, so a cycle resumes
+    from the agent's previous action and skips stages whose inputs are
+    unchanged; other agent ids run a one-off cycle.
+    
+    Background refreshes should send `X-Request-Priority: bulk` so that
+    clicks (`interactive`, the default) are served first under load.
+    Rejected requests get a 429.
     """
-    # Create the agent state for LangGraph
-    agent_state = AgentState(
-        agent_id=request.agent_id,
-        position=request.position,
-        observations=[],
-        reasoning="Initial state",
-        action="idle",
-        nearby_agents=request.nearby_agents
-    )
+    lane = x_request_priority.lower()
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"X-Request-Priority must be one of {list(LANES)}")
+    # Rate limited per connection address; X-Client-Id only splits that
+    # address's allowance, so rotating it does not buy more requests
+    address = http_request.client.host if http_request.client else "unknown"
     
-    # Run the agent decision cycle through LangGraph
-    result = run_agent_cycle(agent_state)
+    # Only the environment inputs are supplied; everything else
+    # (previous action, reasoning, observations) comes from the checkpoint
+    agent_state = {
+        "agent_id": request.agent_id,
+        "position": request.position,
+        "nearby_agents": request.nearby_agents
+    }
+    
+    def run_cycle():
+        engine = graph_engine.get()
+        if request.agent_id not in agents_db:
+            # Only agents in the store keep checkpoints (released when they
+            # are removed); any other id gets a one-off cycle
+            return engine.run_agent_cycle(
+                {**agent_state, "observations": [], "reasoning": "", "action": "idle"}
+            )
+        thread_id = engine.agent_thread_id(request.agent_id)
+        result = engine.run_agent_cycle(agent_state, thread_id=thread_id)
+        if request.agent_id not in agents_db:
+            # Removed while the cycle ran, after its state was released
+            engine.reset_agent_state(thread_id)
+        return result
+    
+    async def execute():
+        async with decide_admission.slot(lane):
+            return await asyncio.get_running_loop().run_in_executor(None, run_cycle)
+    
+    # The lane is part of the key: a click never waits behind, or gets
+    # shed with, a bulk execution it would otherwise have joined
+    key = (lane, request.agent_id, tuple(request.position), tuple(request.nearby_agents))
+    try:
+        decide_admission.check(address, lane, client_id=x_client_id)
+        # Run the agent decision cycle through LangGraph; only the caller
+        # that asked for the execution slot can be shed by the gate
+        result = await decide_flights.run(key, execute, retry_on=(AdmissionRejected,))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
     
     return AgentDecisionResponse(
         agent_id=result["agent_id"],
@@ -138,6 +590,14 @@ async def decide_agent_action(request: AgentDecisionRequest):
         observations=result["observations"]
     )
 
+@app.get("/api/agents/decide/stats")
+async def decide_stats():
+    """Coalescing ratio and admission counters for the decide endpoint"""
+    return {
+        "coalescing": decide_flights.stats(),
+        "admission": decide_admission.stats()
+    }
+
 @app.post("/api/tasks", response_model=TaskResponse)
 async def create_task(task_data: TaskCreateRequest):
     """Create a new task for agents to complete"""
@@ -151,7 +611,10 @@ async def create_task(task_data: TaskCreateRequest):
         "created_at": str(uuid.uuid4())  # Placeholder for timestamp
     }
     
-    tasks_db[task_id] = task_dict
+    with world_write():
+        tasks_db[task_id] = task_dict
+        task_counts.set(task_id, task_dict)
+        _changed_tasks.add(task_id)
     
     return TaskResponse(
         task_id=task_id,
@@ -172,6 +635,634 @@ async def get_task(task_id: str):
     return tasks_db[task_id]
 
 
+@app.get("/api/stats")
+async def get_stats():
+    """
+    Aggregate counts for dashboards without downloading the lists.
+    
+    Agents by state, tasks by status/type/priority and OpenClaw agents by
+    session/model/state. The histograms are maintained on every mutation,
+    so this does not scan any records.
+    """
+    return {
+        "version": _world_version,
+        "agents": agents_db.counts.to_dict(),
+        "tasks": task_counts.to_dict(),
+        "openclaw": openclaw_counts.to_dict()
+    }
+
+
+@app.get("/api/world")
+async def get_world():
+    """Current world version with all agents and tasks"""
+    return {
+        "version": _world_version,
+        "agents": list(agents_db.values()),
+        "tasks": list(tasks_db.values())
+    }
+
+@app.get("/api/world/stream")
+async def stream_world(interval: float = Query(0.1, gt=0, le=10)):
+    """
+    Stream the world as server-sent events whenever its version changes.
+    
+    Works across worker processes: every worker sees versions published
+    by the others through the shared world.
+    """
+    async def events():
+        last_version = None
+        while True:
+            sync_world()
+            if _world_version != last_version:
+                last_version = _world_version
+                payload = {
+                    "version": _world_version,
+                    "agents": list(agents_db.values()),
+                    "tasks": list(tasks_db.values())
+                }
+                yield f"data: {json.dumps(payload)}\n\n"
+            await asyncio.sleep(interval)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+# ============================================================
+# Server-Side Movement
+# ============================================================
+
+# Movement ticks per second; 0 (the default) disables the movement stage.
+# The step holds 60 Hz for 20k agents on one core, but writing every moved
+# agent back into the store does not yet keep up at the publish rate below
+# with that many agents moving (benchmarks/movement_bench.py --write-back),
+# so the stage is opt-in until the server path does.
+MOVEMENT_HZ = float(os.environ.get("AGENT_MOVEMENT_HZ", "0"))
+
+# Positions are written back to the store (and, with several workers,
+# published to the shared world) at this rate while the step itself runs at
+# MOVEMENT_HZ. The step, the neighbor relink and preparing the store changes
+# run on a worker thread; only committing them runs on the event loop.
+MOVEMENT_PUBLISH_HZ = float(os.environ.get("AGENT_MOVEMENT_PUBLISH_HZ", "10"))
+
+_movement_stats = {
+    "ticks": 0,
+    "last_step_ms": 0.0,
+    "last_moved": 0,
+    "hz": MOVEMENT_HZ,
+    "publish_hz": MOVEMENT_PUBLISH_HZ,
+    "publishes": 0,
+    "last_prepare_ms": 0.0,
+    "last_commit_ms": 0.0,
+    "stale_publishes": 0,
+    "errors": 0
+}
+
+
+async def _movement_loop():
+    """
+    Advance all agents toward their targets every tick and write the moved
+    positions back to the store at the publish rate.
+    
+    A publish is prepared on a worker thread from a copy of the arrays
+    while the ticks go on, and committed by the first tick after it is
+    ready. Changes made outside this loop (PATCHes, possibly on another
+    worker) win over the loop's own: the arrays are reloaded from the store,
+    only agents whose stored position is still what the loop last loaded or
+    wrote keep their moved position, and a publish prepared against the
+    store before the change is dropped.
+    """
+    loop = asyncio.get_running_loop()
+    movement = await loop.run_in_executor(None, movement_stage.get)
+    system = movement.MovementSystem()
+    # Already loaded by the movement stage; kept out of the import-time path
+    import numpy as np
+    interval = 1.0 / MOVEMENT_HZ
+    publish_every = max(1, round(MOVEMENT_HZ / MOVEMENT_PUBLISH_HZ)) if MOVEMENT_PUBLISH_HZ > 0 else 1
+    
+    synced_version = None
+    base = pending = None
+    arrived_targets = {}
+    # (future, version, rows, positions, arrived, started) of the publish being prepared
+    preparing = None
+    ticks_since_publish = 0
+    failing = 0
+    
+    def rebase():
+        """Reload the arrays from the store, keeping unpublished moves it did not override"""
+        nonlocal synced_version, base, pending, preparing
+        ours = {}
+        if pending is not None:
+            rows = np.flatnonzero(pending)
+            ours = dict(zip(
+                system.ids[rows].tolist(),
+                zip(system.positions[rows].tolist(), base[rows].tolist())
+            ))
+        system.load(agents_db.values())
+        synced_version = _world_version
+        base = system.positions.copy()
+        pending = np.zeros(len(system), dtype=bool)
+        # Its rows and positions refer to the arrays just replaced
+        preparing = None
+        for row, agent_id in enumerate(system.ids.tolist()):
+            moved = ours.get(agent_id)
+            if moved is not None and base[row].tolist() == moved[1]:
+                system.positions[row] = moved[0]
+                pending[row] = True
+    
+    def prepare(ids, rows, before, after, arrived_at):
+        # Reads the store from a worker thread; committed only if it is unchanged
+        links, nearby = movement.relink(ids, rows, before, after, agents_db.neighbor_radius)
+        positions = dict(zip(ids[rows].tolist(), after[rows].tolist()))
+        arrived = [
+            agent_id for agent_id, target in arrived_at.items()
+            if agent_id in positions and (agents_db.get(agent_id) or {}).get("target") == target
+        ]
+        return agents_db.prepare_moves(positions, links, arrived, nearby)
+    
+    def start_publish():
+        nonlocal preparing
+        rows = np.flatnonzero(pending)
+        after = system.positions.copy()
+        arrived_at = dict(arrived_targets)
+        future = loop.run_in_executor(
+            None, prepare, system.ids, rows, base.copy(), after, arrived_at
+        )
+        preparing = (future, synced_version, rows, after, arrived_at, time.perf_counter())
+    
+    def finish_publish():
+        nonlocal preparing, synced_version
+        future, version, rows, after, arrived_at, prepare_started = preparing
+        preparing = None
+        batch = future.result()
+        _movement_stats["last_prepare_ms"] = (time.perf_counter() - prepare_started) * 1000
+        
+        current = False
+        sync_world()
+        if _world_version == version:
+            started = time.perf_counter()
+            with world_write():
+                # Another worker may have published while taking the lock
+                current = _world_version == version
+                if current:
+                    agents_db.commit_moves(batch)
+            _movement_stats["last_commit_ms"] = (time.perf_counter() - started) * 1000
+        if not current:
+            # The next tick reloads and publishes again
+            _movement_stats["stale_publishes"] += 1
+            return
+        
+        # Our own write is the new baseline
+        synced_version = _world_version
+        base[rows] = after[rows]
+        unchanged = (system.positions[rows] == after[rows]).all(axis=1)
+        pending[rows[unchanged]] = False
+        for agent_id, target in arrived_at.items():
+            if arrived_targets.get(agent_id) == target:
+                del arrived_targets[agent_id]
+        _movement_stats["publishes"] += 1
+    
+    while True:
+        started = time.perf_counter()
+        moved_count = 0
+        try:
+            if preparing is not None and preparing[0].done():
+                finish_publish()
+            sync_world()
+            if synced_version != _world_version:
+                # Agents were added, moved or retargeted outside this loop
+                rebase()
+            
+            moved, arrived = await loop.run_in_executor(None, system.step, interval)
+            moved_count = int(moved.sum())
+            pending |= moved
+            for row in np.flatnonzero(arrived).tolist():
+                arrived_targets[int(system.ids[row])] = system.targets[row].tolist()
+            
+            ticks_since_publish += 1
+            if ticks_since_publish >= publish_every and pending.any() and preparing is None:
+                start_publish()
+                ticks_since_publish = 0
+            failing = 0
+        except Exception:
+            _movement_stats["errors"] += 1
+            failing += 1
+            # Log the first failure and then about once a second while it persists
+            if failing == 1 or failing % max(1, int(MOVEMENT_HZ)) == 0:
+                logger.exception("Movement tick failed (%d in a row); reloading from the store", failing)
+            synced_version = None
+            pending = preparing = None
+        
+        _movement_stats["ticks"] += 1
+        _movement_stats["last_step_ms"] = (time.perf_counter() - started) * 1000
+        _movement_stats["last_moved"] = moved_count
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+def start_movement():
+    if MOVEMENT_HZ <= 0:
+        return
+    # With several workers only one of them runs the movement stage
+    if _shared_world is not None and not _shared_world.claim("movement"):
+        return
+    start_background(_movement_loop(), "movement")
+
+
+@app.get("/api/movement/stats")
+async def movement_stats():
+    """Tick count and cost of the server-side movement stage in this process"""
+    return _movement_stats
+
+
+# ============================================================
+# Sharded Simulation
+# ============================================================
+
+# Decision ticks per second over the sharded simulation; 0 (the default)
+# disables it. Every tick runs the agent cycle for all agents, spread over
+# AGENT_SIM_SHARDS shard processes, and writes changed states back to the store
+SIM_HZ = float(os.environ.get("AGENT_SIM_HZ", "0"))
+SIM_SHARDS = int(os.environ.get("AGENT_SIM_SHARDS", str(os.cpu_count() or 1)))
+
+_simulation_stats = {
+    "hz": SIM_HZ,
+    "shards": SIM_SHARDS,
+    "ticks": 0,
+    "last_tick_ms": 0.0,
+    "last_changed": 0,
+    "state_changes": 0,
+    "messages": 0,
+    "errors": 0
+}
+
+
+def _simulation_diff(known: dict):
+    """
+    Store changes the shards have not seen: (updates, added, removed).
+
+    ``known`` maps agent id to the (position, state) the shards hold and is
+    brought up to date.
+    """
+    updates, added = {}, []
+    for agent_id, record in agents_db.items():
+        seen = known.get(agent_id)
+        if seen is None:
+            added.append(record)
+        elif seen != (record["position"], record["state"]):
+            updates[agent_id] = {"position": record["position"], "state": record["state"]}
+        else:
+            continue
+        known[agent_id] = (list(record["position"]), record["state"])
+    removed = [agent_id for agent_id in known if agent_id not in agents_db]
+    for agent_id in removed:
+        del known[agent_id]
+    return updates, added, removed
+
+
+async def _simulation_loop():
+    """
+    Run a decision tick over every agent in the sharded simulation.
+    
+    Before each tick the shards get the agents added, removed, moved or
+    changed in the store since the last one; after it the changed states are
+    written back (unless the agent's state changed in the store meanwhile)
+    and the messages the cycles sent go on this process's bus.
+    """
+    loop = asyncio.get_running_loop()
+    sharding = await loop.run_in_executor(None, simulation_stage.get)
+    known = {}
+    sim = await loop.run_in_executor(None, functools.partial(
+        sharding.ShardedSimulation, [],
+        shards=SIM_SHARDS,
+        neighbor_radius=agents_db.neighbor_radius
+    ))
+    interval = 1.0 / SIM_HZ
+    synced_version = None
+    failing = 0
+    
+    def feed(updates, added, removed):
+        sim.remove(removed)
+        sim.add(added)
+        sim.apply_updates(updates)
+    
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                sync_world()
+                if synced_version != _world_version:
+                    await loop.run_in_executor(None, feed, *_simulation_diff(known))
+                    synced_version = _world_version
+                
+                result = await loop.run_in_executor(None, sim.step)
+                
+                applied = 0
+                if result["states"]:
+                    with world_write():
+                        external = _world_version != synced_version
+                        for agent_id, state in result["states"].items():
+                            record = agents_db.get(agent_id)
+                            seen = known.get(agent_id)
+                            if record is None or seen is None or record["state"] != seen[1]:
+                                # Changed in the store meanwhile; the next tick sees it
+                                continue
+                            agents_db.update(agent_id, state=state)
+                            known[agent_id] = (seen[0], state)
+                            applied += 1
+                    synced_version = None if external else _world_version
+                for sender, recipient, body in result["messages"]:
+                    if recipient is None:
+                        message_bus.broadcast(sender, body)
+                    else:
+                        message_bus.send(sender, recipient, body)
+                
+                _simulation_stats["ticks"] += 1
+                _simulation_stats["last_tick_ms"] = result["tick_ms"]
+                _simulation_stats["last_changed"] = applied
+                _simulation_stats["state_changes"] += applied
+                _simulation_stats["messages"] += len(result["messages"])
+                _simulation_stats["sharding"] = {
+                    "rebalances": sim.stats.rebalances,
+                    "migrations": sim.stats.migrations,
+                    "shard_sizes": sim.stats.shard_sizes,
+                    "halo_sizes": sim.stats.halo_sizes
+                }
+                failing = 0
+            except Exception:
+                _simulation_stats["errors"] += 1
+                failing += 1
+                if failing == 1 or failing % 60 == 0:
+                    logger.exception("Simulation tick failed (%d in a row)", failing)
+                # Resend everything: the shards may have missed part of a feed
+                await loop.run_in_executor(None, sim.remove, list(known))
+                known.clear()
+                synced_version = None
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+    finally:
+        await loop.run_in_executor(None, sim.close)
+
+
+def start_simulation():
+    if SIM_HZ <= 0:
+        return
+    # With several workers only one of them runs the simulation
+    if _shared_world is not None and not _shared_world.claim("simulation"):
+        return
+    start_background(_simulation_loop(), "simulation")
+
+
+@app.get("/api/simulation/stats")
+async def simulation_stats():
+    """Tick count, cost, state changes and shard balance of the sharded simulation in this process"""
+    return _simulation_stats
+
+
+# ============================================================
+# Inter-Agent Messaging
+# ============================================================
+
+# Message deliveries per second. Every worker delivers the messages its own
+# requests and agent cycles sent
+MESSAGE_HZ = float(os.environ.get("AGENT_MESSAGE_HZ", "10"))
+
+# With several workers the mailboxes live in a shared segment of their own,
+# published like the world (one record per changed mailbox) but versioned
+# separately, so deliveries do not look like world changes to the stages
+# that watch the world version
+MAIL_SHM_ENV = "AGENT_MAIL_SHM"
+with profiler.measure("shared_world", "init"):
+    _shared_mail: Optional[SharedWorld] = attach_from_env(MAIL_SHM_ENV)
+_mail_version = 0
+message_bus.track_changes = _shared_mail is not None
+_mailbox_table = RecordTable()
+_mail_meta = StampedValue()
+
+
+def _publish_mail(world: SharedWorld, full: bool = False) -> int:
+    """Publish the changed (or with ``full`` all) mailboxes; call with the writer lock held"""
+    stamp = world.version + 2
+    if full:
+        changed, removed = message_bus.mailbox_ids, set()
+    else:
+        changed, removed = message_bus.take_changes()
+    for agent_id in removed:
+        # Another worker may have given a re-added agent a new mailbox
+        if agent_id not in agents_db:
+            _mailbox_table.discard(agent_id, stamp)
+    for agent_id in changed:
+        record = message_bus.mailbox_record(agent_id)
+        if record is not None:
+            _mailbox_table.put(agent_id, record, stamp)
+    _mail_meta.set({"tick": message_bus.tick}, stamp)
+    return world.write(encode_sections({
+        "mailboxes": _mailbox_table.encode(),
+        "meta": _mail_meta.encode()
+    }))
+
+
+def sync_mail():
+    """Apply the mailbox changes other workers published since our version"""
+    global _mail_version
+    if _shared_mail is None or _shared_mail.version == _mail_version:
+        return
+    version, payload = _shared_mail.read_raw()
+    if version == _mail_version or not payload:
+        return
+    sections = decode_sections(payload)
+    mailboxes, agent_ids = _mailbox_table.apply(sections["mailboxes"], _mail_version)
+    removed = message_bus.mailbox_ids - set(agent_ids) if agent_ids is not None else ()
+    message_bus.apply_mailboxes(mailboxes, removed)
+    if _mail_meta.apply(sections["meta"], _mail_version):
+        message_bus.tick = _mail_meta.value["tick"]
+    _mail_version = version
+
+
+@contextmanager
+def mail_write():
+    """
+    Wrap a mutation of the mailboxes (delivering, receiving).
+    
+    With several workers this holds the mail segment's writer lock, applies
+    the mutation on top of the latest published mailboxes and publishes it.
+    """
+    global _mail_version
+    if _shared_mail is None:
+        yield
+        return
+    with _shared_mail.writer():
+        sync_mail()
+        yield
+        _mail_version = _publish_mail(_shared_mail)
+
+
+async def _message_loop():
+    """Deliver queued messages to mailboxes once per tick"""
+    interval = 1.0 / MESSAGE_HZ
+    while True:
+        started = time.perf_counter()
+        sync_world()
+        # Idle workers leave the shared mailboxes alone
+        if _shared_mail is None or message_bus.pending or message_bus.has_changes:
+            with mail_write():
+                message_bus.deliver()
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+def start_messaging():
+    if MESSAGE_HZ > 0:
+        start_background(_message_loop(), "messaging")
+
+
+@app.get("/api/agents/{agent_id}/messages")
+async def get_agent_messages(agent_id: int, limit: Optional[int] = Query(None, ge=1)):
+    """Messages in an agent's mailbox, oldest first, without removing them"""
+    if agent_id not in agents_db:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    sync_mail()
+    return [message.to_dict() for message in message_bus.peek(agent_id)[:limit]]
+
+
+@app.post("/api/agents/{agent_id}/messages/receive")
+async def receive_agent_messages(agent_id: int, limit: Optional[int] = Query(None, ge=1)):
+    """Remove and return messages from an agent's mailbox, oldest first"""
+    if agent_id not in agents_db:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    with mail_write():
+        messages = message_bus.receive(agent_id, limit)
+    return [message.to_dict() for message in messages]
+
+
+@app.post("/api/agents/{agent_id}/messages")
+async def send_agent_message(agent_id: int, message: AgentMessageRequest):
+    """Queue a message from an agent for the next delivery tick"""
+    if agent_id not in agents_db:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if message.recipient is None:
+        message_bus.broadcast(agent_id, message.body)
+    else:
+        message_bus.send(agent_id, message.recipient, message.body)
+    sync_mail()
+    return {"queued": True, "tick": message_bus.tick + 1}
+
+
+@app.get("/api/messages/stats")
+async def message_stats():
+    """
+    Throughput, queue depth and overflow drops of this process's message
+    bus; the mailbox figures cover the mailboxes shared by all workers.
+    """
+    sync_mail()
+    return message_bus.stats()
+
+
+# ============================================================
+# World Recording and Replay
+# ============================================================
+
+# Recording is enabled by pointing AGENT_RECORDING_DIR at a directory
+RECORDING_DIR = os.environ.get("AGENT_RECORDING_DIR")
+RECORD_INTERVAL = float(os.environ.get("AGENT_RECORD_INTERVAL", "1.0"))
+
+_recorder: Optional[WorldRecorder] = None
+
+
+async def _record_loop():
+    """Append the local and OpenClaw agents to the recording every interval"""
+    failing = 0
+    while True:
+        try:
+            sync_world()
+            openclaw_agents = _openclaw_snapshot["agents"] if _openclaw_snapshot else []
+            _recorder.record(time.time(), agents_db.values(), openclaw_agents)
+            failing = 0
+        except Exception:
+            # E.g. the wall clock stepped back; skip the tick and keep recording
+            failing += 1
+            if failing == 1 or failing % 60 == 0:
+                logger.exception("Recording tick failed (%d in a row)", failing)
+        await asyncio.sleep(RECORD_INTERVAL)
+
+
+def start_recording():
+    global _recorder
+    if not RECORDING_DIR:
+        return
+    try:
+        _recorder = WorldRecorder(RECORDING_DIR)
+    except RuntimeError as e:
+        # Another worker process is already recording this world
+        logger.info("World recording disabled in this process: %s", e)
+        return
+    start_background(_record_loop(), "recording")
+
+
+def stop_recording():
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def _open_replay() -> WorldReplay:
+    # Only written chunks are served: flushing here would cut a chunk per
+    # request, and only the recording worker could do it anyway
+    if not RECORDING_DIR:
+        raise HTTPException(status_code=404, detail="Recording is not enabled (set AGENT_RECORDING_DIR)")
+    try:
+        return WorldReplay(RECORDING_DIR)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No recording found")
+
+
+@app.get("/api/replay")
+async def get_replay_info():
+    """
+    Time range, chunk and frame counts of the recording.
+    
+    Ticks show up once their chunk of ``frames_per_chunk`` ticks is written.
+    """
+    replay = _open_replay()
+    try:
+        return replay.info()
+    finally:
+        replay.close()
+
+
+@app.get("/api/replay/frame")
+async def get_replay_frame(t: float = Query(..., description="Unix timestamp to seek to")):
+    """The world as recorded at (or just before) a timestamp"""
+    replay = _open_replay()
+    try:
+        frame = replay.frame_at(t)
+    finally:
+        replay.close()
+    if frame is None:
+        raise HTTPException(status_code=404, detail="Recording is empty")
+    return frame
+
+
+@app.get("/api/replay/stream")
+async def stream_replay(
+    start: Optional[float] = Query(None, description="Unix timestamp to start from"),
+    end: Optional[float] = None,
+    speed: float = Query(1.0, gt=0, le=1000),
+    follow: bool = False
+):
+    """
+    Stream recorded frames as server-sent events, paced at the chosen speed.
+    
+    With follow=true the stream continues into ticks recorded after it started.
+    """
+    replay = _open_replay()
+    
+    async def events():
+        try:
+            async for frame in replay.stream(start=start, speed=speed, end=end, follow=follow):
+                yield f"data: {json.dumps(frame)}\n\n"
+        finally:
+            replay.close()
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 # ============================================================
 # OpenClaw Integration Endpoints
 # ============================================================
@@ -185,6 +1276,7 @@ class OpenClawConfig(BaseModel):
 class OpenClawAgentModel(BaseModel):
     """Agent data from OpenClaw in visualization format"""
     id: int
+    openclaw_id: Optional[str] = None
     position: List[float]
     state: str
     nearby_agents: List[int] = []
@@ -192,6 +1284,8 @@ class OpenClawAgentModel(BaseModel):
     name: Optional[str] = None
     model: Optional[str] = None
     channel: Optional[str] = None
+    session: Optional[str] = None
+    updated_at: Optional[float] = None
 
 
 class OpenClawStatusResponse(BaseModel):
@@ -199,10 +1293,40 @@ class OpenClawStatusResponse(BaseModel):
     connected: bool
     gateway_url: str
     agent_count: int
+    poll: Optional[dict] = None
 
 
-# Store OpenClaw integration instance
+# Store OpenClaw integration instance and the connection it polls for
 _openclaw_integration = None
+_openclaw_local_connection: Optional[str] = None
+
+
+async def _stop_openclaw_poller(connection: Optional[str] = None):
+    """Stop this worker's poller (only if it still polls for ``connection``)"""
+    global _openclaw_integration, _openclaw_local_connection
+    if connection is not None and connection != _openclaw_local_connection:
+        return
+    if openclaw.loaded:
+        await openclaw.get().shutdown_integration()
+    _openclaw_integration = None
+    _openclaw_local_connection = None
+
+
+def _publish_openclaw_agents(connection: str, agents: List[dict]):
+    """Poll callback: share the latest OpenClaw agents with every worker"""
+    global _openclaw_snapshot
+    with world_write():
+        if _openclaw_connection != connection:
+            # Disconnected (possibly through another worker): stop polling
+            start_background(_stop_openclaw_poller(connection), "openclaw-stop")
+            return
+        openclaw_counts.sync(_openclaw_records(agents))
+        _openclaw_snapshot = {
+            "gateway_url": _openclaw_integration.gateway_url if _openclaw_integration else "",
+            "agents": agents,
+            "counts": openclaw_counts.to_dict()
+        }
+        _index_openclaw_agents(agents)
 
 
 @app.post("/api/openclaw/connect")
@@ -213,14 +1337,22 @@ async def connect_openclaw(config: OpenClawConfig):
     This endpoint establishes a connection to the OpenClaw Gateway
     and begins polling for agent states.
     """
-    global _openclaw_integration
+    global _openclaw_integration, _openclaw_local_connection, _openclaw_connection
     
     try:
+        # Replace any connection; a poller on another worker stops on its next poll
+        await _stop_openclaw_poller()
+        connection = uuid.uuid4().hex
+        with world_write():
+            _openclaw_connection = connection
+        
         # Create and start integration
-        _openclaw_integration = await get_integration(
+        _openclaw_integration = await openclaw.get().get_integration(
             gateway_url=config.gateway_url,
-            poll_interval=config.poll_interval
+            poll_interval=config.poll_interval,
+            on_agents_update=functools.partial(_publish_openclaw_agents, connection)
         )
+        _openclaw_local_connection = connection
         
         return {
             "status": "connected",
@@ -239,12 +1371,17 @@ async def disconnect_openclaw():
     """
     Disconnect from OpenClaw Gateway.
     
-    Stops polling and closes the connection.
+    Stops polling and closes the connection. With several workers the
+    worker holding the poller stops once it sees the cleared connection.
     """
-    global _openclaw_integration
+    global _openclaw_snapshot, _openclaw_connection
     
-    await shutdown_integration()
-    _openclaw_integration = None
+    await _stop_openclaw_poller()
+    with world_write():
+        _openclaw_connection = None
+        _openclaw_snapshot = None
+        openclaw_counts.sync({})
+        _index_openclaw_agents([])
     
     return {
         "status": "disconnected",
@@ -261,8 +1398,19 @@ async def get_openclaw_status():
     
     connected = _openclaw_integration is not None and _openclaw_integration.client.is_connected
     
+    # Another worker holds the connection: report what it last published
+    if not connected and _openclaw_snapshot is not None:
+        return OpenClawStatusResponse(
+            connected=True,
+            gateway_url=_openclaw_snapshot["gateway_url"],
+            agent_count=len(_openclaw_snapshot["agents"])
+        )
+    
     agent_count = 0
-    if connected and _openclaw_integration:
+    if connected and _openclaw_snapshot is not None:
+        # Count from the last poll instead of fetching every session again
+        agent_count = len(_openclaw_snapshot["agents"])
+    elif connected and _openclaw_integration:
         try:
             agents = await _openclaw_integration.client.get_active_agents()
             agent_count = len(agents)
@@ -272,20 +1420,34 @@ async def get_openclaw_status():
     return OpenClawStatusResponse(
         connected=connected,
         gateway_url=_openclaw_integration.client.gateway_url if _openclaw_integration else "",
-        agent_count=agent_count
+        agent_count=agent_count,
+        poll=_openclaw_integration.poll_stats() if _openclaw_integration else None
     )
 
 
-@app.get("/api/openclaw/agents", response_model=List[OpenClawAgentModel])
-async def get_openclaw_agents():
+OPENCLAW_AGENT_FIELDS = tuple(OpenClawAgentModel.model_fields)
+
+
+@app.get("/api/openclaw/agents")
+async def get_openclaw_agents(view: dict = Depends(viewport_query)):
     """
     Get agents from OpenClaw Gateway in visualization format.
     
     Returns a list of agents with their current state, position,
     and other information suitable for the visualization.
+    Agents come from the latest poll (shared by every worker); the Gateway
+    is only queried directly before the first poll has completed.
+    Supports the same viewport, `fields=` and `lod` parameters as
+    `/api/agents`.
     """
     global _openclaw_integration
     
+    if _openclaw_snapshot is not None:
+        agents = _openclaw_snapshot["agents"]
+        if view["bbox"] is not None:
+            agents = [agents[index] for index in openclaw_grid.query_box(*view["bbox"])]
+        return _agent_view(agents, view, OPENCLAW_AGENT_FIELDS)
+    
     if not _openclaw_integration or not _openclaw_integration.client.is_connected:
         raise HTTPException(
             status_code=503,
@@ -294,12 +1456,18 @@ async def get_openclaw_agents():
     
     try:
         agents = await _openclaw_integration.get_agents_for_visualization()
-        return agents
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch agents: {str(e)}"
         )
+    if view["bbox"] is not None:
+        min_x, min_y, max_x, max_y = view["bbox"]
+        agents = [
+            agent for agent in agents
+            if min_x <= agent["position"][0] <= max_x and min_y <= agent["position"][1] <= max_y
+        ]
+    return _agent_view(agents, view, OPENCLAW_AGENT_FIELDS)
 
 
 @app.get("/api/openclaw/sessions")
@@ -360,6 +1528,37 @@ async def sync_demo_to_openclaw():
     }
 
 
-if __name__ == "__main__":
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = 1):
+    """Run the server; more than one worker serves a shared-memory world"""
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    
+    if workers > 1:
+        # Workers import this module fresh and attach to the world by name;
+        # they start from what this process publishes
+        world = SharedWorld.create()
+        _publish_world(world, full=True)
+        os.environ[WORLD_SHM_ENV] = world.name
+        mail = SharedWorld.create()
+        _publish_mail(mail, full=True)
+        os.environ[MAIL_SHM_ENV] = mail.name
+        try:
+            uvicorn.run("main:app", host=host, port=port, workers=workers)
+        finally:
+            mail.close()
+            world.close()
+    else:
+        uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Agent Marketplace Backend")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Worker processes; more than one serves a shared-memory world"
+    )
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
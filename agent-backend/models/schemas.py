@@ -1,7 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, FiniteFloat, conlist
 from typing import List, Optional
 from enum import Enum
 
+# An [x, y] world coordinate; NaN and infinities are rejected
+Position2D = conlist(FiniteFloat, min_length=2, max_length=2)
+
 class AgentStateEnum(str, Enum):
     idle = "idle"
     working = "working"
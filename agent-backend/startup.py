@@ -0,0 +1,131 @@
+"""
+Startup Profiling and Lazy Subsystem Loading
+
+Keeps cold starts cheap: heavy subsystems (the LangGraph engine, the OpenClaw
+integration and its httpx client) are imported on first use instead of at
+module import, and every import/initialization step is timed so the startup
+report shows where cold-start time goes.
+
+Usage:
+    from startup import profiler, LazySubsystem
+
+    with profiler.measure("fastapi", "import"):
+        from fastapi import FastAPI
+
+    engine = LazySubsystem("graph_engine", "agents.engine")
+    engine.get().run_agent_cycle(state)
+"""
+
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+
+class StartupProfiler:
+    """Records per-subsystem import and initialization timings"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.ready_at: Optional[float] = None
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._order: List[str] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, subsystem: str, phase: str):
+        """Time a block and add it to the subsystem's phase total"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                if subsystem not in self._timings:
+                    self._timings[subsystem] = {}
+                    self._order.append(subsystem)
+                phases = self._timings[subsystem]
+                phases[phase] = phases.get(phase, 0.0) + elapsed
+
+    def mark_ready(self):
+        """Record the moment the server started accepting requests"""
+        if self.ready_at is None:
+            self.ready_at = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        """Startup timings in milliseconds"""
+        with self._lock:
+            subsystems = {
+                name: {
+                    **{f"{phase}_ms": round(seconds * 1000, 2)
+                       for phase, seconds in self._timings[name].items()},
+                    "total_ms": round(sum(self._timings[name].values()) * 1000, 2),
+                }
+                for name in self._order
+            }
+        return {
+            "time_to_ready_ms": (
+                round((self.ready_at - self.started_at) * 1000, 2)
+                if self.ready_at is not None else None
+            ),
+            "subsystems": subsystems,
+        }
+
+    def summary(self) -> str:
+        """One-line human readable report"""
+        report = self.report()
+        parts = [
+            f"{name} {timings['total_ms']:.0f}ms"
+            for name, timings in report["subsystems"].items()
+        ]
+        ready = report["time_to_ready_ms"]
+        prefix = f"ready in {ready:.0f}ms" if ready is not None else "not ready"
+        return f"Startup {prefix}: " + ", ".join(parts)
+
+
+# Shared profiler for the server process
+profiler = StartupProfiler()
+
+
+class LazySubsystem:
+    """
+    A module imported (and optionally initialized) on first use.
+
+    ``get()`` is thread-safe, so a background warm-up and a request that
+    arrives first never import or initialize the subsystem twice.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        module: str,
+        init: Optional[Callable[[ModuleType], Any]] = None,
+        startup_profiler: StartupProfiler = profiler
+    ):
+        self.name = name
+        self.module_name = module
+        self._init = init
+        self._profiler = startup_profiler
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def get(self) -> ModuleType:
+        """Import and initialize the subsystem if needed, then return the module"""
+        if self._module is not None:
+            return self._module
+
+        with self._lock:
+            if self._module is None:
+                with self._profiler.measure(self.name, "import"):
+                    module = importlib.import_module(self.module_name)
+                if self._init is not None:
+                    with self._profiler.measure(self.name, "init"):
+                        self._init(module)
+                self._module = module
+        return self._module
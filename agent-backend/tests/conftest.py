@@ -0,0 +1,19 @@
+"""Shared fixtures for the backend tests"""
+
+import os
+
+# Keep the background stages out of tests that start the app
+os.environ.setdefault("AGENT_MOVEMENT_HZ", "0")
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client for the app, with its lifespan started"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,193 @@
+"""Admission control lanes and request coalescing"""
+
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, SingleFlight, BULK, INTERACTIVE
+
+
+def test_bulk_requests_leave_the_reserve_to_interactive():
+    admission = AdmissionController(rate=0.0, burst=4, bulk_reserve=0.5, address_clients=1)
+    admission.check("c", BULK)
+    admission.check("c", BULK)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.check("c", BULK)
+    assert rejected.value.reason == "rate_limited"
+    admission.check("c", INTERACTIVE)
+    admission.check("c", INTERACTIVE)
+    with pytest.raises(AdmissionRejected):
+        admission.check("c", INTERACTIVE)
+    assert admission.stats()["shed"] == {INTERACTIVE: 1, BULK: 1}
+
+
+def test_rotating_client_ids_share_the_address_allowance():
+    admission = AdmissionController(rate=0.0, burst=2, address_clients=2)
+    for n in range(4):
+        admission.check("10.0.0.1", INTERACTIVE, client_id=f"rotated-{n}")
+    with pytest.raises(AdmissionRejected):
+        admission.check("10.0.0.1", INTERACTIVE, client_id="rotated-4")
+    # Other addresses are unaffected
+    admission.check("10.0.0.2", INTERACTIVE, client_id="rotated-0")
+
+
+def test_one_client_cannot_drain_its_address():
+    admission = AdmissionController(rate=0.0, burst=2, address_clients=2)
+    admission.check("10.0.0.1", INTERACTIVE, client_id="greedy")
+    admission.check("10.0.0.1", INTERACTIVE, client_id="greedy")
+    with pytest.raises(AdmissionRejected):
+        admission.check("10.0.0.1", INTERACTIVE, client_id="greedy")
+    # The rejected request was not charged to the address
+    admission.check("10.0.0.1", INTERACTIVE, client_id="other")
+    admission.check("10.0.0.1", INTERACTIVE, client_id="other")
+
+
+def test_released_slots_go_to_interactive_waiters_first():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1)
+        order = []
+        release = asyncio.Event()
+
+        async def job(name, lane, hold=None):
+            async with admission.slot(lane):
+                order.append(name)
+                if hold is not None:
+                    await hold.wait()
+
+        holder = asyncio.create_task(job("holder", INTERACTIVE, release))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(job("bulk-1", BULK)),
+            asyncio.create_task(job("bulk-2", BULK)),
+            asyncio.create_task(job("click", INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert admission.stats()["waiting"] == {INTERACTIVE: 1, BULK: 2}
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return order, admission.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["holder", "click", "bulk-1", "bulk-2"]
+    assert stats["active"] == 0
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1)
+        release = asyncio.Event()
+
+        async def job(lane, hold=None):
+            async with admission.slot(lane):
+                if hold is not None:
+                    await hold.wait()
+
+        holder = asyncio.create_task(job(INTERACTIVE, release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(job(BULK))
+        handed_over = asyncio.create_task(job(BULK))
+        await asyncio.sleep(0)
+
+        # Cancelled while still queued
+        waiting.cancel()
+        # Cancelled right after the slot was handed to it
+        release.set()
+        await holder
+        handed_over.cancel()
+        await asyncio.gather(waiting, handed_over, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        stats = admission.stats()
+        async with admission.slot(BULK):
+            pass
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert stats["waiting"] == {INTERACTIVE: 0, BULK: 0}
+
+
+def test_full_bulk_queue_sheds_bulk_only():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_bulk_waiting=1)
+        release = asyncio.Event()
+
+        async def job(lane, hold=None):
+            async with admission.slot(lane):
+                if hold is not None:
+                    await hold.wait()
+
+        holder = asyncio.create_task(job(INTERACTIVE, release))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(job(BULK)), asyncio.create_task(job(INTERACTIVE))]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await job(BULK)
+        release.set()
+        await asyncio.gather(holder, *queued)
+        return rejected.value, admission.stats()
+
+    rejected, stats = asyncio.run(scenario())
+    assert (rejected.lane, rejected.reason) == (BULK, "queue_full")
+    assert stats["shed"] == {INTERACTIVE: 0, BULK: 1}
+
+
+def test_single_flight_shares_one_execution():
+    async def scenario():
+        flights = SingleFlight()
+        runs = []
+
+        async def compute():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.run("key", compute) for _ in range(5)))
+        return results, runs, flights.stats()
+
+    results, runs, stats = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert len(runs) == 1
+    assert stats["coalesced"] == 4 and stats["in_flight"] == 0
+
+
+def test_single_flight_retry_on_only_fails_the_owner():
+    async def scenario():
+        flights = SingleFlight()
+        attempts = []
+
+        async def compute():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise AdmissionRejected(BULK, "queue_full")
+            return "ok"
+
+        owner = asyncio.create_task(flights.run("key", compute, retry_on=(AdmissionRejected,)))
+        await asyncio.sleep(0)
+        joiners = [flights.run("key", compute, retry_on=(AdmissionRejected,)) for _ in range(3)]
+        results = await asyncio.gather(owner, *joiners, return_exceptions=True)
+        return results, attempts
+
+    results, attempts = asyncio.run(scenario())
+    assert isinstance(results[0], AdmissionRejected)
+    assert results[1:] == ["ok"] * 3
+    assert len(attempts) == 2
+
+
+def test_single_flight_caller_cancellation_does_not_cancel_the_execution():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        first = asyncio.create_task(flights.run("key", compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.run("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, flights.executions
+
+    assert asyncio.run(scenario()) == ("done", 1)
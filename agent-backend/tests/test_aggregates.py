@@ -0,0 +1,93 @@
+"""Incrementally maintained counts and the /api/stats endpoint"""
+
+import uuid
+
+from agents.aggregates import FieldCounts
+
+
+def test_counts_follow_set_and_remove():
+    counts = FieldCounts(("status", "priority"))
+    counts.set("t1", {"status": "created", "priority": 1})
+    counts.set("t2", {"status": "created", "priority": 2})
+    counts.set("t1", {"status": "done", "priority": 1})
+    assert counts.to_dict() == {
+        "total": 2,
+        "status": {"created": 1, "done": 1},
+        "priority": {"1": 1, "2": 1},
+    }
+
+    counts.remove("t2")
+    counts.remove("missing")
+    assert counts.to_dict() == {"total": 1, "status": {"done": 1}, "priority": {"1": 1}}
+    assert counts.count("priority", 1) == 1
+
+
+def test_sync_matches_a_rebuild():
+    counts = FieldCounts(("state",))
+    counts.sync({1: {"state": "idle"}, 2: {"state": "working"}})
+    records = {2: {"state": "idle"}, 3: {"state": "error"}}
+    counts.sync(records)
+    assert counts.to_dict() == FieldCounts.from_records(("state",), records.items()).to_dict()
+
+
+def test_loaded_counts_are_served_until_the_next_sync():
+    source = FieldCounts(("state",))
+    source.sync({1: {"state": "idle"}, 2: {"state": "idle"}, 3: {"state": "error"}})
+    counts = FieldCounts(("state",))
+    counts.load(source.to_dict())
+    assert counts.to_dict() == source.to_dict()
+    assert len(counts) == 3
+
+    records = {3: {"state": "working"}}
+    counts.sync(records)
+    assert counts.to_dict() == FieldCounts.from_records(("state",), records.items()).to_dict()
+
+
+def test_workers_take_openclaw_counts_from_the_snapshot(monkeypatch):
+    import main
+    from agents.world import RecordTable, SharedWorld, StampedValue
+
+    world = SharedWorld.create(name=f"test-counts-{uuid.uuid4().hex[:12]}", size=1 << 22)
+    try:
+        # Histograms that no recount of the (empty) agent list would give
+        counts = {"total": 2, "session": {"s1": 2}, "model": {"m": 2}, "state": {"idle": 2}}
+        monkeypatch.setattr(main, "_openclaw_snapshot", {"gateway_url": "", "agents": [], "counts": counts})
+        for name in ("_agent_table", "_task_table"):
+            monkeypatch.setattr(main, name, RecordTable())
+        for name in ("_world_meta", "_openclaw_published"):
+            monkeypatch.setattr(main, name, StampedValue())
+        main._publish_world(world, full=True)
+
+        # Another worker, starting from nothing
+        monkeypatch.setattr(main, "_shared_world", world)
+        monkeypatch.setattr(main, "_world_version", 0)
+        monkeypatch.setattr(main, "_openclaw_published", StampedValue())
+        monkeypatch.setattr(main, "openclaw_counts", FieldCounts(main.OPENCLAW_COUNTED_FIELDS))
+        main.sync_world()
+        assert main.openclaw_counts.to_dict() == counts
+    finally:
+        world.close()
+
+
+def test_stats_endpoint_tracks_mutations(client):
+    before = client.get("/api/stats").json()
+    client.post("/api/tasks", json={"task_type": "survey", "description": "map the area", "priority": 3})
+    client.patch("/api/agents/1", json={"state": "error"})
+    after = client.get("/api/stats").json()
+
+    assert after["tasks"]["total"] == before["tasks"]["total"] + 1
+    assert after["tasks"]["task_type"]["survey"] == before["tasks"]["task_type"].get("survey", 0) + 1
+    assert after["tasks"]["priority"]["3"] >= 1
+    assert after["agents"]["state"]["error"] >= 1
+    assert after["agents"]["total"] == before["agents"]["total"]
+    assert after["version"] > before["version"]
+
+
+def test_openclaw_records_do_not_collide_on_mapped_ids():
+    import main
+
+    agents = [
+        {"id": hash(str(uuid.uuid4())) % 1000, "openclaw_id": str(uuid.uuid4()), "session": "s1"}
+        for _ in range(200)
+    ]
+    assert len(main._openclaw_records(agents)) == 200
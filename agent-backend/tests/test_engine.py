@@ -0,0 +1,77 @@
+"""Checkpointed agent cycles keep one checkpoint per agent"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import engine
+
+
+def _state(agent_id: int, nearby):
+    return {
+        "agent_id": agent_id,
+        "position": [0.0, 0.0],
+        "observations": [],
+        "reasoning": "",
+        "action": "idle",
+        "nearby_agents": nearby,
+    }
+
+
+def _checkpoints(thread_id: str) -> int:
+    return len(list(engine.get_checkpointer().list({"configurable": {"thread_id": thread_id}})))
+
+
+def test_cycles_keep_only_the_latest_checkpoint():
+    thread_id = engine.agent_thread_id(9001)
+    try:
+        for cycle in range(6):
+            engine.run_agent_cycle(_state(9001, list(range(cycle))), thread_id=thread_id)
+        assert _checkpoints(thread_id) == 1
+
+        # Partial input resumes from the saved state
+        result = engine.run_agent_cycle({"agent_id": 9001, "nearby_agents": [1, 2]}, thread_id=thread_id)
+        assert result["position"] == [0.0, 0.0]
+        assert _checkpoints(thread_id) == 1
+    finally:
+        engine.reset_agent_state(thread_id)
+    assert _checkpoints(thread_id) == 0
+
+
+def test_concurrent_cycles_on_one_thread():
+    thread_id = engine.agent_thread_id(9002)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda n: engine.run_agent_cycle(_state(9002, [n % 3]), thread_id=thread_id),
+                range(40)
+            ))
+        assert all(result["agent_id"] == 9002 for result in results)
+        assert _checkpoints(thread_id) == 1
+    finally:
+        engine.reset_agent_state(thread_id)
+
+
+def test_decide_only_checkpoints_agents_in_the_store(client):
+    for agent_id in range(50_000, 50_005):
+        response = client.post("/api/agents/decide", json={"agent_id": agent_id, "position": [0, 0]})
+        assert response.status_code == 200
+        thread_id = engine.agent_thread_id(agent_id)
+        assert _checkpoints(thread_id) == 0
+        assert thread_id not in engine._thread_locks
+
+    assert client.post("/api/agents/decide", json={"agent_id": 2, "position": [0, 0]}).status_code == 200
+    assert _checkpoints(engine.agent_thread_id(2)) == 1
+
+
+def test_removed_agents_release_their_checkpoint(client):
+    import main
+
+    with main.world_write():
+        main.agents_db.add({"id": 7001, "position": [500, 500], "state": "idle"})
+    assert client.post("/api/agents/decide", json={"agent_id": 7001, "position": [500, 500]}).status_code == 200
+    thread_id = engine.agent_thread_id(7001)
+    assert _checkpoints(thread_id) == 1
+
+    with main.world_write():
+        main.agents_db.remove(7001)
+    assert _checkpoints(thread_id) == 0
+    assert thread_id not in engine._thread_locks
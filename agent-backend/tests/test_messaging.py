@@ -0,0 +1,153 @@
+"""Mailbox ring buffer and MessageBus delivery"""
+
+import random
+from collections import deque
+
+import pytest
+
+from agents.messaging import Mailbox, Message, MessageBus
+
+
+def _message(n: int) -> Message:
+    return Message(sender=0, recipient=1, body=str(n), tick=n)
+
+
+def _bodies(messages):
+    return [message.body for message in messages]
+
+
+def test_mailbox_wraps_around_and_drops_oldest():
+    mailbox = Mailbox(3)
+    assert all(mailbox.push(_message(n)) for n in range(3))
+    assert not mailbox.push(_message(3))
+    assert not mailbox.push(_message(4))
+    assert mailbox.dropped == 2
+    assert len(mailbox) == 3
+    assert _bodies(mailbox.peek()) == ["2", "3", "4"]
+
+
+def test_mailbox_drain_with_limit_across_the_wrap():
+    mailbox = Mailbox(4)
+    for n in range(6):
+        mailbox.push(_message(n))
+    assert _bodies(mailbox.drain(3)) == ["2", "3", "4"]
+    mailbox.push(_message(6))
+    mailbox.push(_message(7))
+    assert _bodies(mailbox.peek()) == ["5", "6", "7"]
+    assert _bodies(mailbox.drain()) == ["5", "6", "7"]
+    assert len(mailbox) == 0
+    assert mailbox.drain() == []
+
+
+def test_mailbox_matches_a_bounded_deque():
+    rng = random.Random(0)
+    mailbox, model = Mailbox(5), deque(maxlen=5)
+    for n in range(500):
+        if rng.random() < 0.7:
+            mailbox.push(_message(n))
+            model.append(str(n))
+        else:
+            limit = rng.randint(1, 6)
+            expected = [model.popleft() for _ in range(min(limit, len(model)))]
+            assert _bodies(mailbox.drain(limit)) == expected
+        assert _bodies(mailbox.peek()) == list(model)
+
+
+def test_mailbox_rejects_zero_capacity():
+    with pytest.raises(ValueError):
+        Mailbox(0)
+
+
+def test_messages_arrive_on_the_next_delivery():
+    neighbors = {1: [2, 3], 2: [1], 3: [1]}
+    bus = MessageBus(neighbors=lambda agent_id: neighbors[agent_id], exists=lambda agent_id: agent_id in neighbors)
+    bus.send(1, 2, "direct")
+    bus.broadcast(1, "everyone")
+    bus.send(1, 99, "nobody")
+    assert bus.receive(2) == []
+
+    assert bus.deliver() == 3
+    assert _bodies(bus.receive(2)) == ["direct", "everyone"]
+    [message] = bus.peek(3)
+    assert message.broadcast and message.tick == 1
+    assert bus.undeliverable == 1
+    assert bus.receive(2) == []
+
+
+def test_broadcasts_that_reach_nobody_are_undeliverable():
+    neighbors = {1: [2], 2: [1], 3: []}
+    bus = MessageBus(neighbors=lambda agent_id: neighbors.get(agent_id, ()))
+    bus.broadcast(3, "alone")
+    bus.broadcast(42, "unknown sender")
+    bus.broadcast(1, "heard")
+    assert bus.deliver() == 1
+    assert bus.undeliverable == 2
+    assert bus.stats()["mailboxes"] == 1
+
+
+def test_mailboxes_replicate_between_buses():
+    neighbors = {1: [2, 3], 2: [1], 3: [1]}
+    source = MessageBus(mailbox_capacity=2, neighbors=lambda agent_id: neighbors[agent_id], track_changes=True)
+    replica = MessageBus(mailbox_capacity=2, track_changes=True)
+
+    def replicate():
+        changed, removed = source.take_changes()
+        replica.apply_mailboxes(
+            {agent_id: source.mailbox_record(agent_id) for agent_id in changed}, removed
+        )
+        assert not replica.has_changes
+
+    for n in range(3):
+        source.send(2, 1, str(n))
+    source.broadcast(1, "hi")
+    source.deliver()
+    assert source.take_changes() == ({1, 2, 3}, set())
+    for agent_id in (1, 2, 3):
+        replica.apply_mailboxes({agent_id: source.mailbox_record(agent_id)})
+    assert _bodies(replica.peek(1)) == ["1", "2"]
+    assert replica.stats()["queued_in_mailboxes"] == 4
+    assert replica.peek(3)[0].broadcast
+
+    # Reading and removal are changes too
+    source.receive(1)
+    source.receive(1)
+    source.remove_agent(3)
+    source.send(1, 2, "again")
+    source.deliver()
+    replicate()
+    for agent_id in (1, 2, 3):
+        assert replica.peek(agent_id) == source.peek(agent_id)
+    assert replica.mailbox_ids == source.mailbox_ids == {1, 2}
+
+    # Reading an empty mailbox is not
+    source.receive(1)
+    assert not source.has_changes
+
+
+def test_mailbox_overflow_and_removal_are_counted():
+    bus = MessageBus(mailbox_capacity=2)
+    for n in range(5):
+        bus.send(1, 2, str(n))
+    bus.deliver()
+    assert _bodies(bus.peek(2)) == ["3", "4"]
+    assert bus.stats()["dropped_overflow"] == 3
+
+    bus.remove_agent(2)
+    assert bus.peek(2) == []
+    assert bus.stats()["mailboxes"] == 0
+
+
+def test_reading_messages_does_not_consume_them(client):
+    import main
+
+    main.message_bus.receive(2)
+    assert client.post("/api/agents/1/messages", json={"body": "hello", "recipient": 2}).status_code == 200
+    main.message_bus.deliver()
+
+    first = client.get("/api/agents/2/messages").json()
+    assert [message["body"] for message in first] == ["hello"]
+    assert client.get("/api/agents/2/messages").json() == first
+
+    assert client.post("/api/agents/2/messages/receive").json() == first
+    assert client.get("/api/agents/2/messages").json() == []
+    assert client.get("/api/agents/999/messages").status_code == 404
@@ -0,0 +1,154 @@
+"""MovementSystem separation, stepping and store write-back"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from agents.movement import MovementSystem, relink
+from agents.store import AgentStore
+
+
+def _brute_force_separation(system: MovementSystem) -> np.ndarray:
+    positions = system.positions
+    radius = system.separation_radius
+    accel = np.zeros_like(positions)
+    for i in range(len(positions)):
+        for j in range(i + 1, len(positions)):
+            delta = positions[i] - positions[j]
+            dist = float(np.hypot(*delta))
+            if dist >= radius:
+                continue
+            magnitude = system.separation_strength * (radius - dist) / radius
+            if dist < 1e-9:
+                delta, dist = np.array([1.0, 0.0]), 1.0
+            push = magnitude / dist
+            accel[i] += delta * push
+            accel[j] -= delta * push
+    return accel
+
+
+def _load(system: MovementSystem, positions, targets=None):
+    system.load([
+        {"id": i, "position": list(position), "target": None if targets is None else targets[i]}
+        for i, position in enumerate(positions)
+    ])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_separation_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    system = MovementSystem(separation_radius=0.8)
+    # Dense enough for many pairs, including negative coordinates and cell edges
+    positions = rng.uniform(-4, 4, size=(300, 2))
+    positions[:20, 0] = np.round(positions[:20, 0] / 0.8) * 0.8
+    _load(system, positions)
+    np.testing.assert_allclose(system.separation(), _brute_force_separation(system), atol=1e-9)
+
+
+def test_separation_of_coincident_agents_pushes_apart():
+    system = MovementSystem()
+    _load(system, [[1.0, 1.0], [1.0, 1.0]])
+    accel = system.separation()
+    np.testing.assert_allclose(accel, [[system.separation_strength, 0.0], [-system.separation_strength, 0.0]])
+
+
+def test_agents_arrive_and_targets_clear():
+    system = MovementSystem(separation_radius=0)
+    _load(system, [[0.0, 0.0], [5.0, 5.0]], targets=[[1.0, 0.0], None])
+    arrived_ids = []
+    for _ in range(600):
+        moved, arrived = system.step(1 / 60)
+        arrived_ids.extend(system.ids[arrived].tolist())
+    assert arrived_ids == [0]
+    assert system.positions[0].tolist() == [1.0, 0.0]
+    assert system.positions[1].tolist() == [5.0, 5.0]
+    assert not system.has_target.any()
+
+
+def test_reload_keeps_velocities_of_known_agents():
+    system = MovementSystem(separation_radius=0)
+    _load(system, [[0.0, 0.0]], targets=[[10.0, 0.0]])
+    system.step(0.1)
+    velocity = system.velocities[0].copy()
+    system.load([{"id": 5, "position": [3.0, 3.0]}, {"id": 0, "position": [0.1, 0.0], "target": [10.0, 0.0]}])
+    assert system.velocities[1].tolist() == velocity.tolist()
+    assert system.velocities[0].tolist() == [0.0, 0.0]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_relinked_write_back_matches_per_agent_updates(seed):
+    rng = np.random.default_rng(seed)
+    # Shuffled, non-contiguous ids so row order and id order differ
+    ids = rng.permutation(600) * 3 + 1
+    records = [
+        {"id": int(agent_id), "position": rng.uniform(-30, 30, 2).tolist(),
+         "target": rng.uniform(-30, 30, 2).tolist()}
+        for agent_id in ids
+    ]
+    expected = AgentStore(records, track_changes=True)
+    batched = AgentStore(records, track_changes=True)
+    for store in (expected, batched):
+        store.recompute_dirty(lambda agent: None)
+        store.take_changes()
+    system = MovementSystem()
+    system.load(records)
+
+    for _ in range(10):
+        before = system.positions.copy()
+        moved, arrived = system.step(0.5)
+        positions = system.positions_for(moved)
+        for agent_id, position in positions.items():
+            expected.update(agent_id, position=position)
+        links, nearby = relink(
+            system.ids, np.flatnonzero(moved), before, system.positions, batched.neighbor_radius
+        )
+        batched.move_many(positions, links=links, nearby=nearby)
+
+        assert dict(batched.items()) == dict(expected.items())
+        assert batched.dirty == expected.dirty
+        assert batched.take_changes() == expected.take_changes()
+        for center in rng.uniform(-30, 30, size=(5, 2)).tolist():
+            assert sorted(batched.grid.query_radius(center, 5.0)) == sorted(expected.grid.query_radius(center, 5.0))
+
+
+def test_server_movement_writes_positions_back(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "MOVEMENT_HZ", 60.0)
+    monkeypatch.setattr(main, "MOVEMENT_PUBLISH_HZ", 20.0)
+    start = list(main.agents_db[1]["position"])
+    assert client.patch("/api/agents/1", json={"target": [-2.0, 6.0]}).status_code == 200
+
+    async def run_until_arrived():
+        task = asyncio.create_task(main._movement_loop())
+        try:
+            while main.agents_db[1].get("target") is not None:
+                await asyncio.sleep(0.05)
+                if task.done():
+                    task.result()
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    try:
+        asyncio.run(asyncio.wait_for(run_until_arrived(), timeout=60))
+        assert main._movement_stats["errors"] == 0
+        assert main._movement_stats["publishes"] > 0
+        assert main.agents_db[1]["position"] == [-2.0, 6.0]
+        for agent_id, record in main.agents_db.items():
+            assert record["nearby_agents"] == sorted(main.agents_db.grid.query_radius(
+                record["position"], main.agents_db.neighbor_radius, exclude=agent_id
+            ))
+    finally:
+        client.patch("/api/agents/1", json={"position": start, "target": None})
+
+
+@pytest.mark.parametrize("target", [[], [1], [0, "inf"], ["nan", 1], [1, 2, 3]])
+def test_invalid_targets_are_rejected(client, target):
+    assert client.patch("/api/agents/2", json={"target": target}).status_code == 422
+
+
+def test_targets_are_set_and_cleared(client):
+    assert client.patch("/api/agents/2", json={"target": [4, 4]}).json()["target"] == [4, 4]
+    assert client.patch("/api/agents/2", json={"target": None}).json()["target"] is None
@@ -0,0 +1,82 @@
+"""Synthetic OpenClaw gateway and its fault injection"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from integrations.openclaw import OpenClawGatewayClient
+from integrations.openclaw_simulator import SimulatorConfig, SyntheticPopulation, create_app
+
+
+def test_population_shape():
+    population = SyntheticPopulation(SimulatorConfig(agents=250, sessions=7, seed=1))
+    sessions = json.loads(population.payload())["sessions"]
+    assert len(sessions) == 7
+    agents = [agent for session in sessions for agent in session["agents"]]
+    assert len(agents) == 250
+    assert len({agent["id"] for agent in agents}) == 250
+    assert all(0 <= v <= 100 for agent in agents for v in agent["position"])
+
+
+def test_changes_follow_the_rate():
+    population = SyntheticPopulation(SimulatorConfig(agents=1000, change_rate=0.05, seed=2))
+    start = population.last_change_at
+    payload = population.payload()
+
+    # 1000 agents at 5% per second: 25 changes in half a second, carry kept
+    assert population.advance(start + 0.5) == 25
+    assert population.advance(start + 0.51) == 0
+    assert population.advance(start + 0.53) == 1
+    assert population.payload() != payload
+    stats = population.stats()
+    assert stats["changes"] == 26 and stats["last_change_at"] == start + 0.53
+
+    changed = [
+        agent for session in json.loads(population.payload())["sessions"]
+        for agent in session["agents"] if agent["updated_at"] > start
+    ]
+    assert 1 <= len(changed) <= 26
+
+
+def test_payload_parses_with_the_integration_client():
+    app = create_app(SimulatorConfig(agents=40, sessions=4, seed=3))
+
+    async def fetch():
+        client = OpenClawGatewayClient("http://gateway")
+        client._http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        client._connected = True
+        try:
+            return [client.map_agent_to_visualization(agent) for agent in await client.get_active_agents()]
+        finally:
+            await client.disconnect()
+
+    agents = asyncio.run(fetch())
+    assert len(agents) == 40
+    assert {agent["session"] for agent in agents} == {f"session-{i}" for i in range(4)}
+    assert all(agent["openclaw_id"] == str(agent["id"]) for agent in agents)
+
+
+@pytest.mark.parametrize("config, status", [
+    (SimulatorConfig(agents=10, error_rate=1.0), 503),
+    (SimulatorConfig(agents=10, error_rate=0.0), 200),
+])
+def test_injected_errors(config, status):
+    with TestClient(create_app(config)) as client:
+        assert client.get("/api/v1/sessions").status_code == status
+        assert client.get("/health").status_code == 200
+        stats = client.get("/simulator/stats").json()
+    assert stats["requests"] == 1
+    assert stats["errors"] == (1 if status == 503 else 0)
+
+
+def test_slow_responses_are_delayed_and_counted():
+    config = SimulatorConfig(agents=10, slow_rate=1.0, slow_ms=50, seed=4)
+    with TestClient(create_app(config)) as client:
+        started = time.perf_counter()
+        assert client.get("/api/v1/sessions").status_code == 200
+        assert time.perf_counter() - started >= 0.05
+        assert client.get("/simulator/stats").json()["slow"] == 1
@@ -0,0 +1,186 @@
+"""WorldRecorder chunking and WorldReplay seeking"""
+
+import asyncio
+import json
+import os
+import struct
+import zlib
+
+import pytest
+
+from agents.recording import WorldRecorder, WorldReplay, FRAMES_FILE, INDEX_FILE
+
+
+def _agents(tick: int):
+    return [{"id": i, "position": [float(tick), float(i)], "state": "working" if i % 2 else "idle"}
+            for i in range(3)]
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """A recording of ticks at t = 100, 101, ... 149 in chunks of 7 frames"""
+    path = str(tmp_path / "world")
+    recorder = WorldRecorder(path, frames_per_chunk=7)
+    for tick in range(50):
+        recorder.record(100.0 + tick, _agents(tick), [{"id": 1, "position": [0.0, 0.0], "state": "idle"}])
+    recorder.close()
+    replay = WorldReplay(path)
+    yield replay
+    replay.close()
+
+
+def test_chunks_and_info(recording):
+    info = recording.info()
+    assert info["chunks"] == 8
+    assert info["frames"] == 50
+    assert (info["start_time"], info["end_time"]) == (100.0, 149.0)
+
+
+@pytest.mark.parametrize("t, tick", [
+    (100.0, 0), (106.0, 6), (107.0, 7), (106.5, 6), (148.9, 48), (149.0, 49),
+    (50.0, 0), (1e12, 49),
+])
+def test_frame_at_seeks_within_and_across_chunks(recording, t, tick):
+    frame = recording.frame_at(t)
+    assert frame["t"] == 100.0 + tick
+    local = [agent for agent in frame["agents"] if agent["source"] == "local"]
+    assert [agent["position"] for agent in local] == [[float(tick), float(i)] for i in range(3)]
+    assert [agent["state"] for agent in local] == ["idle", "working", "idle"]
+    assert [agent["source"] for agent in frame["agents"]].count("openclaw") == 1
+
+
+def test_frames_in_a_range(recording):
+    times = [frame["t"] for frame in recording.frames(start=105.5, end=121.0)]
+    assert times == [100.0 + tick for tick in range(6, 22)]
+
+
+def test_replay_sees_chunks_written_after_opening(tmp_path):
+    path = str(tmp_path / "live")
+    recorder = WorldRecorder(path, frames_per_chunk=2)
+    replay = WorldReplay(path)
+    try:
+        recorder.record(1.0, _agents(0))
+        replay.refresh()
+        assert replay.frame_at(1.0) is None
+
+        recorder.record(2.0, _agents(1))
+        replay.refresh()
+        assert replay.frame_at(5.0)["t"] == 2.0
+    finally:
+        replay.close()
+        recorder.close()
+
+
+def test_recorder_rejects_time_going_backwards_and_second_writer(tmp_path):
+    path = str(tmp_path / "world")
+    recorder = WorldRecorder(path)
+    try:
+        recorder.record(10.0, _agents(0))
+        with pytest.raises(ValueError):
+            recorder.record(9.0, _agents(1))
+        with pytest.raises(RuntimeError):
+            WorldRecorder(path)
+    finally:
+        recorder.close()
+
+
+def test_stream_yields_frames_in_order(recording):
+    async def collect():
+        return [frame["t"] async for frame in recording.stream(start=140.0, speed=1000.0)]
+
+    assert asyncio.run(collect()) == [100.0 + tick for tick in range(40, 50)]
+
+
+def test_openclaw_agents_keep_their_gateway_identity(tmp_path):
+    path = str(tmp_path / "world")
+    # Both map to the same numeric visualization id
+    openclaw_agents = [
+        {"id": 7, "openclaw_id": "alpha", "session": "s1", "position": [1.0, 1.0], "state": "working"},
+        {"id": 7, "openclaw_id": "beta", "session": "s2", "position": [2.0, 2.0], "state": "idle"},
+    ]
+    recorder = WorldRecorder(path, frames_per_chunk=2)
+    for tick in range(3):
+        recorder.record(float(tick), _agents(tick), openclaw_agents)
+    recorder.close()
+
+    replay = WorldReplay(path)
+    try:
+        for t in (0.0, 2.0):
+            agents = replay.frame_at(t)["agents"]
+            assert all("openclaw_id" not in agent for agent in agents if agent["source"] == "local")
+            assert [
+                (agent["id"], agent["session"], agent["openclaw_id"], agent["state"])
+                for agent in agents if agent["source"] == "openclaw"
+            ] == [(7, "s1", "alpha", "working"), (7, "s2", "beta", "idle")]
+    finally:
+        replay.close()
+
+
+def test_reopening_cuts_a_torn_tail(tmp_path):
+    path = str(tmp_path / "world")
+    recorder = WorldRecorder(path, frames_per_chunk=2)
+    for tick in range(4):
+        recorder.record(float(tick), _agents(tick))
+    recorder.close()
+    index_size = os.path.getsize(os.path.join(path, INDEX_FILE))
+    frames_size = os.path.getsize(os.path.join(path, FRAMES_FILE))
+
+    # A crash mid-flush: chunk bytes without an index record, and a partial record
+    with open(os.path.join(path, FRAMES_FILE), "ab") as frames:
+        frames.write(b"\x00" * 100)
+    with open(os.path.join(path, INDEX_FILE), "ab") as index:
+        index.write(b"\x01" * 10)
+
+    recorder = WorldRecorder(path, frames_per_chunk=2)
+    assert os.path.getsize(os.path.join(path, INDEX_FILE)) == index_size
+    assert os.path.getsize(os.path.join(path, FRAMES_FILE)) == frames_size
+    recorder.record(4.0, _agents(4))
+    recorder.record(5.0, _agents(5))
+    recorder.close()
+
+    replay = WorldReplay(path)
+    try:
+        assert replay.info()["frames"] == 6
+        assert [frame["t"] for frame in replay.frames()] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    finally:
+        replay.close()
+
+
+def test_reopening_drops_records_of_chunks_missing_from_frames(tmp_path):
+    path = str(tmp_path / "world")
+    recorder = WorldRecorder(path, frames_per_chunk=1)
+    for tick in range(3):
+        recorder.record(float(tick), _agents(tick))
+    recorder.close()
+    with open(os.path.join(path, INDEX_FILE), "rb") as index:
+        second_chunk_end = struct.unpack("<ddQQII", index.read(80)[40:])[2:4]
+    os.truncate(os.path.join(path, FRAMES_FILE), sum(second_chunk_end) - 1)
+
+    WorldRecorder(path).close()
+    replay = WorldReplay(path)
+    try:
+        assert [frame["t"] for frame in replay.frames()] == [0.0]
+    finally:
+        replay.close()
+
+
+def test_chunks_without_agent_keys_still_replay(tmp_path):
+    # The layout before OpenClaw identities were recorded
+    path = tmp_path / "old"
+    path.mkdir()
+    header = json.dumps({"states": ["idle"]}).encode()
+    columns = [
+        struct.pack("<d", 5.0), struct.pack("<II", 0, 1), bytes([1]),
+        struct.pack("<q", 42), struct.pack("<f", 1.5), struct.pack("<f", 2.5), bytes([0]),
+    ]
+    data = zlib.compress(struct.pack("<I", len(header)) + header + b"".join(columns))
+    (path / FRAMES_FILE).write_bytes(data)
+    (path / INDEX_FILE).write_bytes(struct.pack("<ddQQII", 5.0, 5.0, 0, len(data), 1, 1))
+
+    replay = WorldReplay(str(path))
+    try:
+        assert replay.frame_at(5.0)["agents"] == [
+            {"id": 42, "position": [1.5, 2.5], "state": "idle", "source": "openclaw"}
+        ]
+    finally:
+        replay.close()
@@ -0,0 +1,177 @@
+"""Sharded simulation halos, migration and rebalancing"""
+
+import asyncio
+import random
+
+import pytest
+
+from agents.sharding import ShardedSimulation, strip_edges
+
+
+RADIUS = 5.0
+
+
+def _agents(count: int, seed: int = 0, x_range=(0.0, 100.0)):
+    rng = random.Random(seed)
+    return [
+        {"id": i, "position": [rng.uniform(*x_range), rng.uniform(0, 100)], "state": "idle"}
+        for i in range(count)
+    ]
+
+
+def _brute_force_neighbors(records):
+    neighbors = {}
+    for record in records:
+        x, y = record["position"]
+        neighbors[record["id"]] = sorted(
+            other["id"] for other in records
+            if other["id"] != record["id"]
+            and (other["position"][0] - x) ** 2 + (other["position"][1] - y) ** 2 <= RADIUS ** 2
+        )
+    return neighbors
+
+
+def _decision(nearby):
+    # What reason_node decides for a neighborhood
+    return "idle" if not nearby else "working" if len(nearby) == 1 else "communicating"
+
+
+def test_strip_edges_are_increasing_and_balanced():
+    assert strip_edges([float(x) for x in range(8)], 4) == [2.0, 4.0, 6.0]
+    assert strip_edges([], 3) == [float("inf")] * 2
+    assert strip_edges([1.0] * 10, 3) == [float("inf")] * 2
+
+
+def test_strip_edges_split_the_rest_when_many_share_one_x():
+    xs = [0.0] * 300 + [float(x) for x in range(1, 101)]
+    edges = strip_edges(xs, 4)
+    assert edges == sorted(set(edges))
+    # The crowd at x=0 fills one strip, the rest is split three ways
+    assert edges[0] == 1.0
+    assert [sum(1 for x in xs if low <= x < high) for low, high in
+            zip([float("-inf")] + edges, edges + [float("inf")])] == [300, 33, 33, 34]
+
+
+@pytest.fixture
+def sharded():
+    simulations = []
+
+    def make(agents, **kwargs):
+        sim = ShardedSimulation(agents, neighbor_radius=RADIUS, **kwargs)
+        simulations.append(sim)
+        return sim
+
+    yield make
+    for sim in simulations:
+        sim.close()
+
+
+def test_neighbors_across_strips_match_one_process(sharded):
+    agents = _agents(600, x_range=(0.0, 60.0))
+    sim = sharded(agents, shards=4, rebalance_threshold=None)
+    sim.step()
+    snapshot = sim.snapshot()
+    assert len(snapshot) == len(agents)
+    expected = _brute_force_neighbors(snapshot)
+    assert {record["id"]: record["nearby_agents"] for record in snapshot} == expected
+    assert any(size > 0 for size in sim.stats.halo_sizes)
+
+
+def test_updates_migrate_agents_between_strips(sharded):
+    sim = sharded(_agents(200), shards=3, rebalance_threshold=None)
+    sim.apply_updates({i: {"position": [99.0, 50.0]} for i in range(20)})
+    sim.step()
+    assert sim.stats.migrations > 0
+    snapshot = sim.snapshot()
+    assert {record["id"] for record in snapshot} == set(range(200))
+    assert {record["id"]: record["nearby_agents"] for record in snapshot} == _brute_force_neighbors(snapshot)
+
+
+def test_crowd_at_one_x_does_not_rebalance_every_tick(sharded):
+    rng = random.Random(1)
+    agents = [
+        {"id": i, "position": [0.0 if i < 300 else rng.uniform(1, 100), rng.uniform(0, 100)]}
+        for i in range(400)
+    ]
+    sim = sharded(agents, shards=4)
+    for _ in range(5):
+        assert not sim.step()["rebalanced"]
+    assert sim.stats.rebalances == 0
+    assert sim.stats.shard_sizes == [300, 33, 33, 34]
+
+    # Once the crowd spreads out a rebalance helps and happens once
+    sim.apply_updates({i: {"position": [i / 30, 50.0]} for i in range(300)})
+    sim.step()
+    assert sim.stats.rebalances == 1
+    assert max(sim.stats.shard_sizes) == 100
+
+
+def test_step_reports_states_and_messages_of_the_real_cycle(sharded):
+    # A trio within reach of each other (communicating, so act broadcasts)
+    # and a loner, split across two strips
+    agents = [
+        {"id": 1, "position": [0.0, 0.0]},
+        {"id": 2, "position": [2.0, 0.0]},
+        {"id": 3, "position": [4.0, 0.0]},
+        {"id": 4, "position": [90.0, 90.0], "state": "working"},
+    ]
+    sim = sharded(agents, shards=2, rebalance_threshold=None)
+    result = sim.step()
+    assert result["states"] == {1: "communicating", 2: "communicating", 3: "communicating", 4: "idle"}
+    assert sorted(sender for sender, recipient, _ in result["messages"] if recipient is None) == [1, 2, 3]
+
+    # Unchanged states are not reported again, but act still runs
+    result = sim.step()
+    assert result["states"] == {}
+    assert len(result["messages"]) == 3
+
+
+def test_added_and_removed_agents_join_and_leave_the_tick(sharded):
+    sim = sharded(_agents(50), shards=2)
+    sim.remove([0, 1, 999])
+    sim.add([{"id": 100, "position": [50.0, 50.0]}, {"id": 2, "position": [1.0, 1.0]}])
+    sim.step()
+    snapshot = sim.snapshot()
+    assert sorted(record["id"] for record in snapshot) == sorted(set(range(2, 50)) | {100})
+    assert {record["id"]: record["position"] for record in snapshot}[2] == [1.0, 1.0]
+    assert sum(sim.stats.shard_sizes) == 49
+    assert {record["id"]: record["nearby_agents"] for record in snapshot} == _brute_force_neighbors(snapshot)
+
+
+def test_server_simulation_writes_states_back_and_routes_messages(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "SIM_HZ", 20.0)
+    monkeypatch.setattr(main, "SIM_SHARDS", 2)
+    original = {agent_id: record["state"] for agent_id, record in main.agents_db.items()}
+
+    async def run_ticks():
+        task = asyncio.create_task(main._simulation_loop())
+        try:
+            while main._simulation_stats["ticks"] < 2:
+                await asyncio.sleep(0.05)
+                if task.done():
+                    task.result()
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    try:
+        asyncio.run(asyncio.wait_for(run_ticks(), timeout=60))
+        assert main._simulation_stats["errors"] == 0
+        # Every decision matches a one-process cycle on the store's neighborhoods
+        for record in main.agents_db.values():
+            assert record["state"] == _decision(record["nearby_agents"])
+        communicating = {
+            agent_id for agent_id, record in main.agents_db.items() if record["state"] == "communicating"
+        }
+        assert main._simulation_stats["messages"] >= 2 * len(communicating)
+        # Broadcasts reach the neighbors' mailboxes through this process's bus
+        main.message_bus.deliver()
+        for agent_id in communicating:
+            senders = {message.sender for message in main.message_bus.peek(agent_id)}
+            assert set(main.agents_db[agent_id]["nearby_agents"]) & communicating <= senders
+    finally:
+        for agent_id, state in original.items():
+            if agent_id in main.agents_db:
+                main.agents_db.update(agent_id, state=state)
@@ -0,0 +1,70 @@
+"""Startup profiling and lazy subsystem loading"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from startup import LazySubsystem, StartupProfiler
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_profiler_sums_phases_per_subsystem():
+    profiler = StartupProfiler()
+    for _ in range(2):
+        with profiler.measure("store", "import"):
+            time.sleep(0.001)
+    with profiler.measure("store", "init"):
+        pass
+    profiler.mark_ready()
+
+    report = profiler.report()
+    store = report["subsystems"]["store"]
+    assert store["import_ms"] >= 2.0
+    assert store["total_ms"] >= store["import_ms"]
+    assert report["time_to_ready_ms"] is not None
+    assert profiler.summary().startswith("Startup ready in")
+
+
+def test_lazy_subsystem_imports_and_initializes_once():
+    sys.modules.pop("colorsys", None)
+    profiler = StartupProfiler()
+    inits = []
+    subsystem = LazySubsystem("colors", "colorsys", init=inits.append, startup_profiler=profiler)
+    assert not subsystem.loaded
+    assert "colorsys" not in sys.modules
+
+    threads = [threading.Thread(target=subsystem.get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert subsystem.loaded
+    assert subsystem.get() is sys.modules["colorsys"]
+    assert inits == [sys.modules["colorsys"]]
+    assert set(profiler.report()["subsystems"]["colors"]) == {"import_ms", "init_ms", "total_ms"}
+
+
+def test_importing_main_leaves_heavy_subsystems_unloaded():
+    # A fresh interpreter: other tests may have loaded them already
+    code = (
+        "import sys, main; "
+        "print(sorted(m for m in ('langgraph', 'httpx', 'agents.engine', 'integrations.openclaw') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        cwd=BACKEND_DIR, env={**os.environ, "AGENT_MOVEMENT_HZ": "0"}
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_startup_report_endpoint(client):
+    report = client.get("/api/startup").json()
+    assert report["time_to_ready_ms"] is not None
+    assert "agent_store" in report["subsystems"]
+    assert set(report["loaded"]) == {"graph_engine", "openclaw"}
@@ -0,0 +1,190 @@
+"""AgentStore neighborhoods and dirty tracking"""
+
+import pytest
+
+from agents.store import AgentStore
+
+
+def _store():
+    # 1 - 2 - 3 in a row, 4 far away
+    return AgentStore([
+        {"id": 1, "position": [0, 0], "state": "idle"},
+        {"id": 2, "position": [4, 0], "state": "idle"},
+        {"id": 3, "position": [8, 0], "state": "idle"},
+        {"id": 4, "position": [100, 100], "state": "idle"},
+    ], neighbor_radius=5.0)
+
+
+def _settled():
+    store = _store()
+    store.recompute_dirty(lambda agent: None)
+    assert store.dirty == set()
+    return store
+
+
+def test_neighbors_follow_positions():
+    store = _store()
+    assert store[2]["nearby_agents"] == [1, 3]
+    assert store[4]["nearby_agents"] == []
+
+    store.update(4, position=[2, 2])
+    assert store[4]["nearby_agents"] == [1, 2]
+    assert store[1]["nearby_agents"] == [2, 4]
+
+    store.remove(2)
+    assert store[1]["nearby_agents"] == [4]
+    assert store[3]["nearby_agents"] == []
+
+
+def test_new_agents_are_dirty():
+    assert _store().dirty == {1, 2, 3, 4}
+
+
+def test_state_change_dirties_the_neighborhood_only():
+    store = _settled()
+    store.update(1, state="working")
+    assert store.dirty == {1, 2}
+
+
+def test_move_dirties_old_and_new_neighbors():
+    store = _settled()
+    store.update(3, position=[99, 100])
+    # Old neighbor 2, new neighbor 4
+    assert store.dirty == {2, 3, 4}
+
+
+def test_unchanged_update_and_target_do_not_dirty():
+    store = _settled()
+    store.update(1, position=[0, 0], state="idle")
+    store.set_target(1, [50, 50])
+    assert store.dirty == set()
+    assert store[1]["target"] == [50, 50]
+
+
+def test_removal_dirties_neighbors_and_reports_the_id():
+    removed = []
+    store = _settled()
+    store.on_remove = removed.append
+    store.remove(2)
+    store.remove(2)
+    assert store.dirty == {1, 3}
+    assert removed == [2]
+
+
+def test_recompute_runs_dirty_agents_and_propagates_changes():
+    store = _settled()
+    store.update(4, state="working")
+    decided = []
+
+    def decide(agent):
+        decided.append(agent["id"])
+        return "communicating" if agent["id"] == 4 else None
+
+    result = store.recompute_dirty(decide)
+    assert decided == [4]
+    assert result["recomputed"] == 1 and result["population"] == 4
+    assert result["state_changes"] == 1
+    # 4 has no neighbors, so nothing else needs deciding
+    assert result["pending_dirty"] == 0
+    assert store.counts.count("state", "communicating") == 1
+    assert store.stats.to_dict()["passes"] == 2
+
+
+def test_move_many_clears_targets_of_arrived_agents():
+    store = _settled()
+    store.set_target(1, [1, 0])
+    store.set_target(3, [9, 0])
+    store.move_many({1: [1, 0], 3: [8.5, 0], 99: [0, 0]}, arrived=[1])
+    assert store[1]["position"] == [1, 0] and store[1]["target"] is None
+    assert store[3]["target"] == [9, 0]
+    assert store.dirty == {1, 2, 3}
+
+
+def test_move_many_relinks_a_batch_like_single_updates():
+    expected, batched = _settled(), _settled()
+    moves = {1: [5, 0], 2: [40, 0], 4: [7, 2]}
+    for agent_id, position in moves.items():
+        expected.update(agent_id, position=position)
+    batched.move_many(moves)
+    assert dict(batched.items()) == dict(expected.items())
+    assert batched[3]["nearby_agents"] == [1, 4]
+    assert batched.dirty == expected.dirty == {1, 2, 3, 4}
+
+
+def test_snapshot_round_trip():
+    store = _store()
+    store.update(1, state="working")
+    copy = AgentStore()
+    copy.load_snapshot(store.to_snapshot())
+    assert dict(copy.items()) == dict(store.items())
+    assert copy.dirty == store.dirty
+    assert copy.counts.to_dict() == store.counts.to_dict()
+    assert copy.grid.query_radius([4, 0], 5.0) == store.grid.query_radius([4, 0], 5.0)
+
+
+@pytest.mark.parametrize("body", [
+    {"position": [1]},
+    {"position": [1, 2, 3]},
+    {"position": ["nan", 0]},
+    {"state": "dancing"},
+])
+def test_invalid_agent_updates_are_rejected(client, body):
+    assert client.patch("/api/agents/3", json=body).status_code == 422
+
+
+def test_valid_agent_update_marks_neighbors(client):
+    import main
+
+    response = client.patch("/api/agents/3", json={"position": [2, 1], "state": "working"})
+    assert response.status_code == 200
+    agent = response.json()
+    assert (agent["position"], agent["state"]) == ([2, 1], "working")
+    assert {3, *agent["nearby_agents"]} <= main.agents_db.dirty
+
+    stats = client.get("/api/agents/recompute/stats").json()
+    assert stats["pending_dirty"] == len(main.agents_db.dirty)
+
+
+def test_failed_recompute_keeps_the_undecided_agents_dirty():
+    store = _store()
+    decided = []
+
+    def decide(agent):
+        if len(decided) == 2:
+            raise RuntimeError("engine unavailable")
+        decided.append(agent["id"])
+        return "working"
+
+    with pytest.raises(RuntimeError):
+        store.recompute_dirty(decide)
+    assert all(store[agent_id]["state"] == "working" for agent_id in decided)
+    # Undecided agents stay dirty (decided ones may be re-dirtied by neighbors)
+    assert {1, 2, 3, 4} - set(decided) <= store.dirty
+    assert store.stats.last_dirty == 2
+
+
+def test_decisions_apply_to_the_current_records():
+    store = _settled()
+    store.update(1, state="working")
+    batch = store.take_dirty()
+    assert store.dirty == set()
+    assert sorted(agent["id"] for agent in batch) == [1, 2]
+
+    # The store moves on while the batch is decided elsewhere
+    store.update(2, position=[3, 0])
+    result = store.apply_decisions(batch, {1: "idle", 2: None})
+    assert store[1]["state"] == "idle" and store[2]["position"] == [3, 0]
+    assert result["recomputed"] == 2 and result["state_changes"] == 1
+    # Dirtied by the move, and by 1's state change
+    assert store.dirty == {1, 2, 3}
+
+
+def test_recompute_endpoint_decides_the_dirty_set(client):
+    import main
+
+    with main.world_write():
+        main.agents_db.mark_dirty(1)
+    result = client.post("/api/agents/recompute").json()
+    assert result["recomputed"] >= 1
+    assert result["population"] == len(main.agents_db)
+    assert 1 not in main.agents_db.dirty or result["state_changes"] > 0
@@ -0,0 +1,88 @@
+"""Field projection, clustering and viewport queries"""
+
+import pytest
+
+from agents.viewport import build_view, cluster, parse_fields, project
+
+
+RECORDS = [
+    {"id": 1, "position": [0.5, 0.5], "state": "idle", "reasoning": "long text"},
+    {"id": 2, "position": [1.5, 0.5], "state": "working", "reasoning": "long text"},
+    {"id": 3, "position": [0.2, 0.9], "state": "working", "reasoning": "long text"},
+    {"id": 4, "position": [-0.5, 3.5], "state": "idle", "reasoning": "long text"},
+]
+
+
+def test_parse_fields_keeps_id_and_rejects_unknown_names():
+    assert parse_fields(None, ("id", "state")) is None
+    assert parse_fields("state, position", ("id", "state", "position")) == ["id", "state", "position"]
+    with pytest.raises(ValueError):
+        parse_fields("state,secret", ("id", "state"))
+
+
+def test_project_drops_heavy_fields():
+    assert project(RECORDS[0], ["id", "state"]) == {"id": 1, "state": "idle"}
+
+
+def test_clusters_aggregate_cells():
+    clusters = {tuple(entry["cell"]): entry for entry in cluster(RECORDS, 1.0)}
+    assert set(clusters) == {(0, 0), (1, 0), (-1, 3)}
+
+    origin = clusters[(0, 0)]
+    assert origin["count"] == 2
+    assert origin["states"] == {"idle": 1, "working": 1}
+    assert origin["center"] == pytest.approx([0.35, 0.7])
+    assert origin["bounds"] == [0.0, 0.0, 1.0, 1.0]
+    assert clusters[(-1, 3)]["bounds"] == [-1.0, 3.0, 0.0, 4.0]
+
+
+def test_auto_lod_switches_to_clusters_when_crowded():
+    agents = build_view(RECORDS, lod="auto", fields=["id"], max_agents=10)
+    assert agents == {"lod": "agents", "count": 4, "agents": [{"id": i} for i in (1, 2, 3, 4)]}
+
+    clusters = build_view(RECORDS, lod="auto", bbox=(-1, 0, 2, 4), max_agents=3)
+    assert clusters["lod"] == "clusters"
+    assert clusters["cluster_size"] == pytest.approx(4 / 32)
+    assert sum(entry["count"] for entry in clusters["clusters"]) == 4
+
+    with pytest.raises(ValueError):
+        build_view(RECORDS, lod="tiles")
+
+
+def test_cluster_size_without_a_finite_view_uses_the_records_extent():
+    view = build_view(RECORDS, lod="clusters", bbox=(float("-inf"), 0, float("inf"), 4))
+    assert view["cluster_size"] == pytest.approx(3 / 32)
+
+
+def test_viewport_culls_and_projects(client):
+    import main
+
+    inside = client.get("/api/agents", params={"min_x": -100, "min_y": -100, "max_x": 100, "max_y": 100,
+                                               "fields": "id,state"}).json()
+    assert all(set(agent) == {"id", "state"} for agent in inside)
+    expected = [agent_id for agent_id, agent in main.agents_db.items()
+                if all(-100 <= v <= 100 for v in agent["position"])]
+    assert sorted(agent["id"] for agent in inside) == sorted(expected)
+
+
+def test_unbounded_viewport_returns_everything(client):
+    import main
+
+    params = {"min_x": "-inf", "min_y": "-inf", "max_x": "inf", "max_y": "inf"}
+    response = client.get("/api/agents", params=params)
+    assert response.status_code == 200
+    assert len(response.json()) == len(main.agents_db)
+
+    clusters = client.get("/api/agents", params={**params, "lod": "clusters"}).json()
+    assert clusters["count"] == len(main.agents_db)
+
+
+@pytest.mark.parametrize("params", [
+    {"min_x": "nan", "min_y": 0, "max_x": 1, "max_y": 1},
+    {"min_x": 0, "min_y": 0},
+    {"min_x": 5, "min_y": 0, "max_x": 1, "max_y": 1},
+    {"fields": "id,password"},
+    {"lod": "tiles"},
+])
+def test_bad_viewports_are_rejected(client, params):
+    assert client.get("/api/agents", params=params).status_code == 400
@@ -0,0 +1,199 @@
+"""SharedWorld seqlock reads and incremental record tables"""
+
+import json
+import multiprocessing as mp
+import uuid
+
+import pytest
+
+from agents.store import AgentStore
+from agents.world import (
+    SharedWorld, RecordTable, StampedValue, encode_sections, decode_sections
+)
+
+
+def _payload(n: int) -> bytes:
+    # Payload length varies so a torn read cannot decode as valid
+    return json.dumps({"n": n, "items": list(range(n % 97)), "check": n * 7}).encode()
+
+
+def _write_versions(name: str, count: int):
+    world = SharedWorld.attach(name)
+    try:
+        for n in range(1, count + 1):
+            world.write(_payload(n))
+    finally:
+        world.close()
+
+
+@pytest.fixture
+def world():
+    world = SharedWorld.create(name=f"test-world-{uuid.uuid4().hex[:12]}", size=1 << 20)
+    yield world
+    world.close()
+
+
+def test_read_before_first_write_is_empty(world):
+    assert world.read_raw() == (0, b"")
+
+
+def test_write_then_read_from_other_handle(world):
+    version = world.write(b"first")
+    reader = SharedWorld.attach(world.name)
+    try:
+        assert version % 2 == 0
+        assert reader.read_raw() == (version, b"first")
+        assert world.write(b"") == version + 2
+        assert reader.read_raw() == (version + 2, b"")
+    finally:
+        reader.close()
+
+
+def test_oversized_payload_is_rejected(world):
+    with pytest.raises(ValueError):
+        world.write(b"x" * (world.capacity + 1))
+    assert world.version == 0
+
+
+def test_read_raw_never_returns_a_torn_payload(world):
+    world.write(_payload(0))
+    writer = mp.get_context("spawn").Process(target=_write_versions, args=(world.name, 3000))
+    writer.start()
+
+    reader = SharedWorld.attach(world.name)
+    seen = set()
+    try:
+        while writer.is_alive() or not seen:
+            version, payload = reader.read_raw()
+            snapshot = json.loads(payload)
+            assert version % 2 == 0
+            assert snapshot["check"] == snapshot["n"] * 7
+            assert snapshot["items"] == list(range(snapshot["n"] % 97))
+            seen.add(snapshot["n"])
+    finally:
+        writer.join(timeout=30)
+        reader.close()
+
+    assert writer.exitcode == 0
+    assert len(seen) > 1
+    assert json.loads(world.read_raw()[1])["n"] == 3000
+
+
+def test_sections_round_trip():
+    sections = decode_sections(encode_sections({"a": b"one", "empty": b"", "b": b"\x00\x01"}))
+    assert {name: bytes(data) for name, data in sections.items()} == {
+        "a": b"one", "empty": b"", "b": b"\x00\x01"
+    }
+
+
+def _section(table: RecordTable) -> memoryview:
+    return memoryview(table.encode())
+
+
+def test_record_table_reader_decodes_only_newer_records():
+    writer, reader = RecordTable(), RecordTable()
+    writer.put(1, {"id": 1, "v": "a"}, 2)
+    writer.put(2, {"id": 2, "v": "b"}, 2)
+    changed, keys = reader.apply(_section(writer), 0)
+    assert changed == {1: {"id": 1, "v": "a"}, 2: {"id": 2, "v": "b"}}
+    assert keys == [1, 2]
+
+    writer.put(2, {"id": 2, "v": "c"}, 4)
+    changed, keys = reader.apply(_section(writer), 2)
+    assert changed == {2: {"id": 2, "v": "c"}}
+    # No insert or removal since version 2
+    assert keys is None
+
+
+def test_record_table_reports_membership_changes():
+    writer, reader = RecordTable(), RecordTable()
+    for key in ("a", "b", "c"):
+        writer.put(key, {"key": key}, 2)
+    reader.apply(_section(writer), 0)
+
+    writer.discard("b", 4)
+    writer.put("d", {"key": "d"}, 4)
+    changed, keys = reader.apply(_section(writer), 2)
+    assert changed == {"d": {"key": "d"}}
+    assert keys == ["a", "c", "d"]
+
+    # The reader's mirror can publish the same table in turn
+    reader.put("a", {"key": "a", "x": 1}, 6)
+    changed, keys = writer.apply(_section(reader), 4)
+    assert changed == {"a": {"key": "a", "x": 1}}
+    assert keys is None
+
+
+def test_reader_far_behind_sees_every_change():
+    writer, reader = RecordTable(), RecordTable()
+    writer.put(1, {"id": 1}, 2)
+    reader.apply(_section(writer), 0)
+    for stamp in (4, 6, 8):
+        writer.put(stamp, {"id": stamp}, stamp)
+    writer.put(1, {"id": 1, "n": 1}, 8)
+    changed, keys = reader.apply(_section(writer), 2)
+    assert set(changed) == {1, 4, 6, 8}
+    assert keys == [1, 4, 6, 8]
+
+
+def test_stamped_value_only_changes_on_a_new_value():
+    writer, reader = StampedValue(), StampedValue()
+    writer.set({"dirty": [1]}, 2)
+    assert reader.apply(memoryview(writer.encode()), 0)
+    assert reader.value == {"dirty": [1]}
+
+    writer.set({"dirty": [1]}, 4)
+    assert writer.stamp == 2
+    assert not reader.apply(memoryview(writer.encode()), 2)
+
+    writer.set(None, 6)
+    assert reader.apply(memoryview(writer.encode()), 4)
+    assert reader.value is None
+
+
+def _publish(store: AgentStore, table: RecordTable, stamp: int) -> memoryview:
+    changed, removed = store.take_changes()
+    for agent_id in removed:
+        table.discard(agent_id, stamp)
+    for agent_id in changed:
+        table.put(agent_id, store[agent_id], stamp)
+    return _section(table)
+
+
+def test_store_changes_replicate_through_a_table():
+    source = AgentStore(
+        [{"id": i, "position": [i * 3.0, 0.0], "state": "idle"} for i in range(1, 6)],
+        track_changes=True
+    )
+    replica, removed_ids = AgentStore(), []
+    replica.on_remove = removed_ids.append
+    source_table, replica_table = RecordTable(), RecordTable()
+
+    def replicate(stamp: int, since: int):
+        changed, keys = replica_table.apply(_publish(source, source_table, stamp), since)
+        removed = set(replica) - set(keys) if keys is not None else ()
+        replica.apply_changes(changed.values(), removed)
+
+    replicate(2, 0)
+    source.update(3, position=[20.0, 0.0], state="working")
+    source.set_target(1, [9.0, 9.0])
+    source.remove(5)
+    source.add({"id": 6, "position": [1.0, 1.0], "state": "error"})
+    changed, _ = source.take_changes()
+    # The moved agent, its old and new neighbors, the new agent and its neighbors
+    assert changed == {1, 2, 3, 4, 6}
+    for agent_id in changed:
+        source_table.put(agent_id, source[agent_id], 4)
+    source_table.discard(5, 4)
+    replica_changed, keys = replica_table.apply(_section(source_table), 2)
+    replica.apply_changes(replica_changed.values(), set(replica) - set(keys))
+
+    assert dict(replica.items()) == dict(source.items())
+    assert replica.counts.to_dict() == source.counts.to_dict()
+    assert removed_ids == [5]
+    for center in ([1.0, 1.0], [20.0, 0.0], [12.0, 0.0]):
+        assert sorted(replica.grid.query_radius(center, 5.0)) == sorted(source.grid.query_radius(center, 5.0))
+
+    # Nothing changed: nothing is re-encoded or decoded
+    replicate(6, 4)
+    assert replica_table.apply(_section(source_table), 6) == ({}, None)